@@ -0,0 +1,52 @@
+import time
+import argparse
+
+import numpy as np
+
+from liguard.algo.non_nn.DHistDPP import calc_DHistDPP_params
+
+"""
+Benchmarks the construction of the DHistDPP background model against the previous per-ray implementation, which called `np.histogram` once per ray through `np.apply_along_axis`.
+
+Usage: python benchmarks/bench_DHistDPP.py [--frames 60] [--points 65536]
+"""
+
+def calc_DHistDPP_params_per_ray(point_cloud_set, number_of_points_per_frame, lidar_range_in_unit_length, bins_per_unit_length):
+    # previous implementation, kept as the reference
+    number_of_frames = len(point_cloud_set)
+    point_cloud_set = np.array(point_cloud_set, dtype=np.float32)
+    distances_per_point = np.linalg.norm(point_cloud_set[:, :,:3], ord=2, axis=2).transpose()
+    bins_per_point = int(lidar_range_in_unit_length * bins_per_unit_length)
+    bins = np.linspace(0, lidar_range_in_unit_length, bins_per_point+1)
+    histograms_per_point = np.apply_along_axis(lambda x: np.histogram(x, bins_per_point, range=(0, lidar_range_in_unit_length))[0], axis=1, arr=distances_per_point)
+    normalized_histogram_per_point = histograms_per_point.astype(np.float32) / number_of_frames
+    return dict(bins=bins, bins_per_point=bins_per_point, normalized_histogram_per_point=normalized_histogram_per_point, number_of_points_per_frame=number_of_points_per_frame)
+
+def main():
+    parser = argparse.ArgumentParser(description='DHistDPP background model construction benchmark.')
+    parser.add_argument('--frames', type=int, default=60, help='Number of gathered frames.')
+    parser.add_argument('--points', type=int, default=65536, help='Number of points per frame.')
+    parser.add_argument('--range', type=float, default=100, help='Lidar range in unit length.')
+    parser.add_argument('--bins_per_unit_length', type=int, default=2, help='Number of bins per unit length.')
+    args = parser.parse_args()
+
+    # synthetic structured frames: a static background with noise and some points out of range
+    rng = np.random.default_rng(0)
+    background = rng.uniform(-args.range, args.range, size=(args.points, 3)).astype(np.float32)
+    point_cloud_set = [np.hstack([background + rng.normal(0, 0.05, size=background.shape).astype(np.float32), np.ones((args.points, 1), dtype=np.float32)]) for _ in range(args.frames)]
+
+    tic = time.perf_counter()
+    params = calc_DHistDPP_params(point_cloud_set, args.points, args.range, args.bins_per_unit_length)
+    vectorized_time = time.perf_counter() - tic
+    print(f'vectorized: {vectorized_time:.2f} s')
+
+    tic = time.perf_counter()
+    reference_params = calc_DHistDPP_params_per_ray(point_cloud_set, args.points, args.range, args.bins_per_unit_length)
+    per_ray_time = time.perf_counter() - tic
+    print(f'per-ray:    {per_ray_time:.2f} s')
+
+    identical = all(np.array_equal(params[key], reference_params[key]) for key in params)
+    print(f'speedup:    {per_ray_time / vectorized_time:.1f}x, identical params: {identical}')
+
+if __name__ == '__main__':
+    main()
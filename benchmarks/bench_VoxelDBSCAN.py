@@ -0,0 +1,53 @@
+import time
+import argparse
+
+import numpy as np
+import open3d as o3d
+
+from liguard.algo.non_nn.VoxelDBSCAN import voxel_dbscan
+
+"""
+Benchmarks the voxel-grid DBSCAN against Open3D's `cluster_dbscan` on a synthetic roadside frame, and checks that both give the same labels.
+
+Usage: python benchmarks/bench_VoxelDBSCAN.py [--points 130000] [--eps 0.5] [--min_samples 5] [--workers 1]
+"""
+
+def make_roadside_frame(number_of_points: int, extent: float, rng: np.random.Generator):
+    # half of the points on a noisy ground plane, some objects, and scattered points
+    ground = np.c_[rng.uniform(-extent, extent, (number_of_points // 2, 2)), rng.normal(-2, 0.05, number_of_points // 2)]
+    objects = np.vstack([rng.normal(0, [1.5, 0.8, 0.6], (number_of_points // 200, 3)) + [*rng.uniform(-extent * 0.8, extent * 0.8, 2), -1] for _ in range(100)])
+    scattered = rng.uniform(-extent, extent, (number_of_points - len(ground) - len(objects), 3))
+    return np.vstack([ground, objects, scattered]).astype(np.float32)
+
+def best_time(func, repeats: int):
+    times = []
+    for _ in range(repeats):
+        tic = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - tic)
+    return min(times), result
+
+def main():
+    parser = argparse.ArgumentParser(description='Voxel-grid DBSCAN benchmark.')
+    parser.add_argument('--points', type=int, default=130000, help='Number of points per frame.')
+    parser.add_argument('--extent', type=float, default=25, help='Half side of the frame in unit length.')
+    parser.add_argument('--eps', type=float, default=0.5, help='Maximum radius to search.')
+    parser.add_argument('--min_samples', type=int, default=5, help='Minimum number of points to consider a cluster valid.')
+    parser.add_argument('--workers', type=int, default=1, help='Number of threads of the voxel-grid DBSCAN.')
+    parser.add_argument('--repeats', type=int, default=5, help='Number of runs, the best time is reported.')
+    args = parser.parse_args()
+
+    point_cloud = make_roadside_frame(args.points, args.extent, np.random.default_rng(0))
+
+    voxel_time, labels = best_time(lambda: voxel_dbscan(point_cloud, args.eps, args.min_samples, workers=args.workers), args.repeats)
+    print(f'voxel-grid: {voxel_time:.3f} s')
+
+    pcd = o3d.geometry.PointCloud()
+    pcd.points = o3d.utility.Vector3dVector(point_cloud)
+    o3d_time, o3d_labels = best_time(lambda: np.array(pcd.cluster_dbscan(eps=args.eps, min_points=args.min_samples, print_progress=False)), args.repeats)
+    print(f'open3d:     {o3d_time:.3f} s')
+
+    print(f'speedup:    {o3d_time / voxel_time:.1f}x, clusters: {labels.max() + 1}, identical labels: {np.array_equal(labels, o3d_labels)}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+import time
+import argparse
+
+import numpy as np
+import open3d as o3d
+
+from liguard.pcd.utils import points_in_boxes
+
+"""
+Benchmarks the batched `points_in_boxes` kernel against one Open3D `OrientedBoundingBox` per box, as `remove_less_point_labels` and `create_per_object_pcdet_dataset` used to do, and checks that both find the same points.
+
+Usage: python benchmarks/bench_points_in_boxes.py [--points 120000] [--boxes 200]
+"""
+
+def make_frame(number_of_points: int, number_of_boxes: int, extent: float, rng: np.random.Generator):
+    # scattered points, and vehicle sized boxes with random yaws, some with roll and pitch too
+    point_cloud = np.c_[rng.uniform([-extent, -extent, -3], [extent, extent, 3], (number_of_points, 3)), np.ones(number_of_points)].astype(np.float32)
+    xyz_center = rng.uniform([-extent * 0.9, -extent * 0.9, -2], [extent * 0.9, extent * 0.9, 2], (number_of_boxes, 3))
+    xyz_extent = rng.uniform([1, 1, 1], [6, 3, 3], (number_of_boxes, 3))
+    xyz_euler_angles = np.zeros((number_of_boxes, 3))
+    xyz_euler_angles[:, 2] = rng.uniform(-np.pi, np.pi, number_of_boxes)
+    xyz_euler_angles[:number_of_boxes // 10, :2] = rng.uniform(-0.3, 0.3, (number_of_boxes // 10, 2))
+    return point_cloud, xyz_center, xyz_extent, xyz_euler_angles
+
+def open3d_points_in_boxes(point_cloud, xyz_center, xyz_extent, xyz_euler_angles):
+    indices = []
+    for center, extent, euler_angles in zip(xyz_center, xyz_extent, xyz_euler_angles):
+        R = o3d.geometry.OrientedBoundingBox.get_rotation_matrix_from_xyz(euler_angles)
+        rotated_bbox = o3d.geometry.OrientedBoundingBox(center, R, extent)
+        indices.append(np.sort(rotated_bbox.get_point_indices_within_bounding_box(o3d.utility.Vector3dVector(point_cloud[:, 0:3]))))
+    return indices
+
+def best_time(func, repeats: int):
+    times = []
+    for _ in range(repeats):
+        tic = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - tic)
+    return min(times), result
+
+def main():
+    parser = argparse.ArgumentParser(description='Points in oriented boxes benchmark.')
+    parser.add_argument('--points', type=int, default=120000, help='Number of points per frame.')
+    parser.add_argument('--boxes', type=int, default=200, help='Number of boxes per frame.')
+    parser.add_argument('--extent', type=float, default=50, help='Half side of the frame in unit length.')
+    parser.add_argument('--repeats', type=int, default=5, help='Number of runs of the kernel, the best time is reported.')
+    args = parser.parse_args()
+
+    frame = make_frame(args.points, args.boxes, args.extent, np.random.default_rng(0))
+
+    kernel_time, indices = best_time(lambda: points_in_boxes(*frame, return_indices=True), args.repeats)
+    print(f'points_in_boxes: {kernel_time:.4f} s')
+
+    # a single run, it is slow
+    o3d_time, o3d_indices = best_time(lambda: open3d_points_in_boxes(*frame), 1)
+    print(f'open3d per box:  {o3d_time:.4f} s')
+
+    identical = all(np.array_equal(a, b) for a, b in zip(indices, o3d_indices))
+    print(f'speedup:         {o3d_time / kernel_time:.1f}x, points in boxes: {sum(len(i) for i in indices)}, identical indices: {identical}')
+
+if __name__ == '__main__':
+    main()
@@ -6,7 +6,7 @@ algo_type = AlgoType.camera
 
 import numpy as np
 
-@algo_func(required_data=['current_point_cloud_numpy', 'current_calib_data'])
+@algo_func(required_data=['current_point_cloud_numpy', 'current_calib_data'], stateless=True)
 def project_point_cloud_points(data_dict: dict, cfg_dict: dict, logger: Logger):
     """
     Projects the points from a point cloud onto an image.
@@ -30,24 +30,15 @@ def project_point_cloud_points(data_dict: dict, cfg_dict: dict, logger: Logger):
     # standard code snippet ends here
     #########################################################################################################################
     
-    # Extract required calibration data
-    Tr_velo_to_cam = data_dict['current_calib_data']['Tr_velo_to_cam']
-    
-    if 'R0_rect' in data_dict['current_calib_data']:
-        R0_rect = data_dict['current_calib_data']['R0_rect']
-    else:
-        R0_rect = np.eye(4,4)
-    
-    P2 = data_dict['current_calib_data']['P2']
-    
-    # Convert lidar coordinates to homogeneous coordinates
-    lidar_coords_Nx4 = np.hstack((data_dict['current_point_cloud_numpy'][:,:3], np.ones((data_dict['current_point_cloud_numpy'].shape[0], 1))))
+    # imports
+    from liguard.calib.utils import get_lidar_to_image, project_points_to_image
     
     # Project lidar points onto the image plane
-    pixel_coords = P2 @ R0_rect @ Tr_velo_to_cam @ lidar_coords_Nx4.T
+    lidar_coords = data_dict['current_point_cloud_numpy'][:, :3]
+    pixel_coords = project_points_to_image(lidar_coords, get_lidar_to_image(data_dict['current_calib_data'])).T
     
     # Compute lidar depths
-    lidar_depths = np.linalg.norm(lidar_coords_Nx4[:, :3], axis=1)
+    lidar_depths = np.linalg.norm(lidar_coords, axis=1)
     
     # Filter out points that are behind the camera
     front_pixel_coords = pixel_coords[:, pixel_coords[2] > 0]
@@ -75,13 +66,13 @@ def project_point_cloud_points(data_dict: dict, cfg_dict: dict, logger: Logger):
     # Update the image with the projected lidar points
     data_dict['current_image_numpy'][pixel_coords_valid[:, 1], pixel_coords_valid[:, 0]] = np.column_stack((pixel_depths_valid, np.zeros_like(pixel_depths_valid), np.zeros_like(pixel_depths_valid)))
 
-@algo_func(required_data=['current_image_numpy'])
+@algo_func(required_data=['current_image_numpy'], batchable=True)
 def UltralyticsYOLOv5(data_dict: dict, cfg_dict: dict, logger: Logger):
     """
-    Runs the Ultralytics YOLOv5 object detection algorithm on the current image.
+    Runs the Ultralytics YOLOv5 object detection algorithm on the current image. The decoded RGB image is given to the model, and all the images of a batch are run at once when a list of data dicts is given, one per frame.
 
     Args:
-        data_dict (dict): A dictionary containing the required data.
+        data_dict (dict | list): A dictionary containing the required data, or a list of them for a batch of frames.
         cfg_dict (dict): A dictionary containing configuration parameters.
         logger (gui.logger_gui.Logger): A logger object for logging messages and errors in GUI.
     """
@@ -91,53 +82,45 @@ def UltralyticsYOLOv5(data_dict: dict, cfg_dict: dict, logger: Logger):
     algo_name = inspect.stack()[0].function
     params = get_algo_params(cfg_dict, algo_type, algo_name, logger)
     
+    # a batch of frames is given as a list of data dicts
+    data_dicts = data_dict if isinstance(data_dict, list) else [data_dict]
+    
     # check if required data is present in data_dict
     for key in UltralyticsYOLOv5.required_data:
-        if key not in data_dict:
+        if any(key not in frame_data_dict for frame_data_dict in data_dicts):
             logger.log(f'{key} not found in data_dict', Logger.ERROR)
             return
     # standard code snippet ends here
     #########################################################################################################################
     
     # imports
-    import torch
+    from liguard.algo.models import get_model
+    from liguard.lbl.label_table import LabelTable
 
-    # algo name and keys used in algo
-    model_key = make_key(algo_name, 'model')
-    tgt_cls_key = make_key(algo_name, 'target_classes')
+    # the model is kept in the process-wide model registry, it's loaded and warmed up on first use unless it was preloaded when the pipeline was built
+    model = get_model(algo_name, cfg_dict, params)
+    vk_dict = {v.capitalize():k for (k,v) in model.names.items()}
+    target_classes = [vk_dict[key] for key in params['class_colors']]
+    
+    # the decoded RGB images of all the frames in a single forward pass, they aren't read from the disk again
+    results = model([frame_data_dict['current_image_numpy'] for frame_data_dict in data_dicts]).xywh
 
-    # check if model is already loaded
-    if model_key not in data_dict:
-        logger.log(f'Loading {params["model"]} model', Logger.INFO)
-        data_dict[model_key] = torch.hub.load('ultralytics/yolov5', params['model'], pretrained=True, _verbose=False)
-        vk_dict = {v.capitalize():k for (k,v) in data_dict[model_key].names.items()}
-        data_dict[tgt_cls_key] = [vk_dict[key] for key in params['class_colors']]
-        logger.log(f'Loaded YOLOv5 model with target classes: {data_dict[tgt_cls_key]}', Logger.INFO)
-    else:
-        result = data_dict[model_key](data_dict['current_image_path']).xywh[0].detach().cpu().numpy()
+    for frame_data_dict, result in zip(data_dicts, results):
+        result = result.detach().cpu().numpy()
         xywh = result[:, :4].astype(int)
         score = result[:, 4]
         obj_class = result[:, 5].astype(int)
 
-        idx = np.argwhere(np.isin(obj_class, data_dict[tgt_cls_key]))
-        
-        xywh = xywh[idx].reshape(-1, 4)
-        score = score[idx].reshape(-1)
-        obj_class = obj_class[idx].reshape(-1)
-
-        idx = np.argwhere(score >= params['score_threshold'])
-
-        xywh = xywh[idx]
-        score = score[idx]
-        obj_class = obj_class[idx]
+        # keep the target classes above the score threshold
+        keep = np.isin(obj_class, target_classes) & (score >= params['score_threshold'])
+        xywh, score, obj_class = xywh[keep], score[keep], obj_class[keep]
 
+        if 'current_label_list' not in frame_data_dict: frame_data_dict['current_label_list'] = LabelTable()
         for topleft_botright, scr, cls in zip(xywh, score, obj_class):
-            topleft_botright = topleft_botright.reshape(-1)
-            obj_class_str = data_dict[model_key].names[cls.item()].capitalize()
+            obj_class_str = model.names[cls.item()].capitalize()
             xy_center = topleft_botright[:2]
             xy_extent = topleft_botright[2:]
             rgb_color = np.array(params['class_colors'][obj_class_str], dtype=np.float32)
             bbox_2d = {'xy_center': xy_center, 'xy_extent': xy_extent, 'rgb_color': rgb_color, 'predicted': True, 'added_by': algo_name, 'confidence': scr.item()}
-            if 'current_label_list' not in data_dict: data_dict['current_label_list'] = []
             label = {'class': obj_class_str, 'bbox_2d':bbox_2d}
-            data_dict['current_label_list'].append(label)
\ No newline at end of file
+            frame_data_dict['current_label_list'].append(label)
@@ -5,9 +5,8 @@ from liguard.algo.utils import AlgoType, algo_func, get_algo_params, make_key
 algo_type = AlgoType.label
 
 import numpy as np
-import open3d as o3d
 
-@algo_func(required_data=['current_label_list'])
+@algo_func(required_data=['current_label_list'], stateless=True)
 def remove_out_of_bound_labels(data_dict: dict, cfg_dict: dict, logger: Logger):
     """
     Remove labels that are out of the specified bounding box.
@@ -39,11 +38,15 @@ def remove_out_of_bound_labels(data_dict: dict, cfg_dict: dict, logger: Logger):
         logger.log('Both use_lidar_range and use_image_size are False. No operation to perform.', Logger.WARNING)
         return
 
+    # imports
+    from liguard.algo.utils import get_crop_bounds
+    from liguard.lbl.label_table import LabelTable
+
     if use_lidar_range:
         if cfg_dict['proc']['lidar']['crop']['enabled']:
-            pcd_min_xyz = cfg_dict['proc']['lidar']['crop']['min_xyz']
-            pcd_max_xyz = cfg_dict['proc']['lidar']['crop']['max_xyz']
+            pcd_min_xyz, pcd_max_xyz = get_crop_bounds(cfg_dict)
         elif 'current_point_cloud_numpy' in data_dict:
+            # the range of the point cloud changes with every frame
             pcd_min_xyz = np.min(data_dict['current_point_cloud_numpy'][:, 0:3], axis=0)
             pcd_max_xyz = np.max(data_dict['current_point_cloud_numpy'][:, 0:3], axis=0)
         else:
@@ -58,40 +61,33 @@ def remove_out_of_bound_labels(data_dict: dict, cfg_dict: dict, logger: Logger):
             logger.log('use_image_size is True but current_image_numpy not found in data_dict.', Logger.ERROR)
             return
 
-    # Get label list and bounding box limits
-    lbl_list = data_dict['current_label_list']
+    # Get label table
+    lbl_table = LabelTable.from_list(data_dict['current_label_list'])
+    keep = np.ones(len(lbl_table), dtype=bool)
+    
+    if use_lidar_range:
+        # Check if the bounding box centers of all the labels are within the specified limits at once
+        bbox_3d_center = lbl_table.get_column('xyz_center')
+        inside = np.all((pcd_min_xyz <= bbox_3d_center) & (bbox_3d_center <= pcd_max_xyz), axis=1)
+        # labels without a bbox_3d aren't checked
+        keep &= inside | ~lbl_table.has_bbox_3d
     
-    output = []
-    for lbl_dict in lbl_list:
-        add_bbox_label = True
-        
-        if use_lidar_range and 'bbox_3d' in lbl_dict:
-            bbox_3d_center = lbl_dict['bbox_3d']['xyz_center']
-            # Check if the bounding box center is within the specified limits
-            x_condition = np.logical_and(pcd_min_xyz[0] <= bbox_3d_center[0], bbox_3d_center[0] <= pcd_max_xyz[0])
-            y_condition = np.logical_and(pcd_min_xyz[1] <= bbox_3d_center[1], bbox_3d_center[1] <= pcd_max_xyz[1])
-            z_condition = np.logical_and(pcd_min_xyz[2] <= bbox_3d_center[2], bbox_3d_center[2] <= pcd_max_xyz[2])
-            # If not within the limits, skip the label
-            if not (x_condition and y_condition and z_condition): add_bbox_label = False
-        
-        if use_image_size and 'bbox_2d' in lbl_dict:
-            bbox_2d_center = lbl_dict['bbox_2d']['xy_center']
-            bbox_2d_extent = lbl_dict['bbox_2d']['xy_extent']
-            bbox_min_xy = bbox_2d_center - bbox_2d_extent / 2.0
-            bbox_max_xy = bbox_2d_center + bbox_2d_extent / 2.0
-            # Check if the bounding box is within the specified limits
-            x_condition = np.logical_and(img_min_xy[0] <= bbox_min_xy[0], bbox_max_xy[0] <= img_max_xy[0])
-            y_condition = np.logical_and(img_min_xy[1] <= bbox_min_xy[1], bbox_max_xy[1] <= img_max_xy[1])
-            # If not within the limits, skip the label
-            if not (x_condition and y_condition): add_bbox_label = False
-        
-        # Add the label to the output list if it is within the limits
-        if add_bbox_label: output.append(lbl_dict)
+    if use_image_size:
+        # Check if the 2D bounding boxes of all the labels are within the specified limits at once, they're gathered from the label dicts
+        bbox_2d_indices = np.flatnonzero(lbl_table.has_bbox_2d)
+        bbox_2d_center = np.array([lbl_table[i]['bbox_2d']['xy_center'] for i in bbox_2d_indices], dtype=np.float64).reshape(-1, 2)
+        bbox_2d_extent = np.array([lbl_table[i]['bbox_2d']['xy_extent'] for i in bbox_2d_indices], dtype=np.float64).reshape(-1, 2)
+        bbox_min_xy = bbox_2d_center - bbox_2d_extent / 2.0
+        bbox_max_xy = bbox_2d_center + bbox_2d_extent / 2.0
+        keep[bbox_2d_indices] &= np.all((img_min_xy <= bbox_min_xy) & (bbox_max_xy <= img_max_xy), axis=1)
+    
+    # Keep the labels that are within the limits
+    output = lbl_table.mask(keep)
 
     # Update the label list in data_dict
     data_dict['current_label_list'] = output
 
-@algo_func(required_data=['current_label_list', 'current_point_cloud_numpy'])
+@algo_func(required_data=['current_label_list', 'current_point_cloud_numpy'], stateless=True)
 def remove_less_point_labels(data_dict: dict, cfg_dict: dict, logger: Logger):
     """
     Remove labels with fewer points than the specified threshold.
@@ -115,29 +111,19 @@ def remove_less_point_labels(data_dict: dict, cfg_dict: dict, logger: Logger):
     # standard code snippet ends here
     #########################################################################################################################
     
+    # imports
+    from liguard.lbl.label_table import LabelTable
+    from liguard.pcd.utils import points_in_boxes
+
     # Get label list and point cloud
-    lbl_list = data_dict['current_label_list']
+    lbl_table = LabelTable.from_list(data_dict['current_label_list'])
     point_cloud = data_dict['current_point_cloud_numpy']
-    
-    # define the output list
-    output = []
 
-    # iterate over the labels and check if the number of points in the bounding box is greater than the threshold
-    # if it is, add the label to the output list, otherwise skip it
-    for lbl_dict in lbl_list:
-        if 'bbox_3d' not in lbl_dict: continue
-        bbox_center = lbl_dict['bbox_3d']['xyz_center']
-        bbox_extent = lbl_dict['bbox_3d']['xyz_extent']
-        bbox_euler_angles = lbl_dict['bbox_3d']['xyz_euler_angles']
-        R = o3d.geometry.OrientedBoundingBox.get_rotation_matrix_from_xyz(bbox_euler_angles)
-        # create an OrientedBoundingBox object
-        try: rotated_bbox = o3d.geometry.OrientedBoundingBox(bbox_center, R, bbox_extent)
-        except:
-            logger.log('Failed to create OrientedBoundingBox object', Logger.ERROR)
-            continue
-        inside_points = rotated_bbox.get_point_indices_within_bounding_box(o3d.utility.Vector3dVector(point_cloud[:, 0:3]))
-        # check if the number of points inside the bounding box is greater than the threshold give in the configuration
-        if len(inside_points) >= params['min_points']: output.append(lbl_dict)
+    # count the points in the bounding boxes of all the labels at once, and keep the labels with at least the threshold given in the configuration
+    has_bbox_3d = lbl_table.has_bbox_3d
+    number_of_points = np.zeros(len(lbl_table), dtype=np.int64)
+    number_of_points[has_bbox_3d] = points_in_boxes(point_cloud, lbl_table.get_column('xyz_center')[has_bbox_3d], lbl_table.get_column('xyz_extent')[has_bbox_3d], lbl_table.get_column('xyz_euler_angles')[has_bbox_3d])
+    output = lbl_table.mask(has_bbox_3d & (number_of_points >= params['min_points']))
 
     # update the label list in data_dict
     data_dict['current_label_list'] = output
\ No newline at end of file
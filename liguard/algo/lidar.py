@@ -4,11 +4,13 @@ from liguard.gui.logger_gui import Logger
 from liguard.algo.utils import AlgoType, algo_func, get_algo_params, make_key
 algo_type = AlgoType.lidar
 
+# consecutive built-in processes and the single process the pipelines replace them with, see `fuse_processes`
+fused_processes = {('rotate', 'crop'): 'rotate_and_crop'}
+
 import os
-import sys
 import numpy as np
 
-@algo_func(required_data=['current_point_cloud_numpy'])
+@algo_func(required_data=['current_point_cloud_numpy'], stateless=True)
 def rotate(data_dict: dict, cfg_dict: dict, logger: Logger):
     """
     Rotate the point cloud data by the specified angles.
@@ -32,22 +34,19 @@ def rotate(data_dict: dict, cfg_dict: dict, logger: Logger):
     # standard code snippet ends here
     #########################################################################################################################
     
-    # get point cloud and rotation angles
+    # imports
+    from liguard.pcd.utils import calc_rotation_matrix
+
+    # get point cloud and rotation matrix
     pcd = data_dict['current_point_cloud_numpy']
-    angles = params['angles']
-    angles_rad = np.deg2rad(angles).astype(np.float32)
-    
-    # calculate rotation matrix
-    rotation_matrix = np.array([[np.cos(angles_rad[1]) * np.cos(angles_rad[2]), np.cos(angles_rad[1]) * np.sin(angles_rad[2]), -np.sin(angles_rad[1])],
-                                [np.sin(angles_rad[0]) * np.sin(angles_rad[1]) * np.cos(angles_rad[2]) - np.cos(angles_rad[0]) * np.sin(angles_rad[2]), np.sin(angles_rad[0]) * np.sin(angles_rad[1]) * np.sin(angles_rad[2]) + np.cos(angles_rad[0]) * np.cos(angles_rad[2]), np.sin(angles_rad[0]) * np.cos(angles_rad[1])],
-                                [np.cos(angles_rad[0]) * np.sin(angles_rad[1]) * np.cos(angles_rad[2]) + np.sin(angles_rad[0]) * np.sin(angles_rad[2]), np.cos(angles_rad[0]) * np.sin(angles_rad[1]) * np.sin(angles_rad[2]) - np.sin(angles_rad[0]) * np.cos(angles_rad[2]), np.cos(angles_rad[0]) * np.cos(angles_rad[1])]])
+    rotation_matrix = calc_rotation_matrix(params['angles'])
     
     # rotate the point cloud
     rotated_pcd = np.dot(pcd[:, :3], rotation_matrix.T)
     rotated_pcd = np.hstack((rotated_pcd, pcd[:, 3:]))
     data_dict['current_point_cloud_numpy'] = rotated_pcd
 
-@algo_func(required_data=['current_point_cloud_numpy'])
+@algo_func(required_data=['current_point_cloud_numpy'], stateless=True)
 def crop(data_dict: dict, cfg_dict: dict, logger: Logger):
     """
     Crop the point cloud data based on the specified limits.
@@ -85,7 +84,42 @@ def crop(data_dict: dict, cfg_dict: dict, logger: Logger):
     data_dict['current_point_cloud_numpy'] = pcd[x_condition & y_condition & z_condition]
     data_dict['current_point_cloud_point_colors'] = np.ones((data_dict['current_point_cloud_numpy'].shape[0], 3), dtype=np.float32)
     
-@algo_func(required_data=['current_point_cloud_numpy', 'current_image_numpy', 'current_calib_data'])
+@algo_func(required_data=['current_point_cloud_numpy'], stateless=True)
+def rotate_and_crop(data_dict: dict, cfg_dict: dict, logger: Logger):
+    """
+    Rotate and crop the point cloud data in a single pass, with the parameters of `rotate` and `crop`. It has no configuration of its own, the pipelines run it in place of `rotate` followed by `crop` when both are enabled (see `fused_processes`).
+
+    Args:
+        data_dict (dict): A dictionary containing the data.
+        cfg_dict (dict): A dictionary containing the configuration parameters.
+        logger (gui.logger_gui.Logger): A logger object for logging messages and errors in GUI.
+    """
+    #########################################################################################################################
+    # standard code snippet that gets the parameters from the config file and checks if required data is present in data_dict
+    # the parameters are those of the fused algorithms
+    rotate_params = get_algo_params(cfg_dict, algo_type, 'rotate', logger)
+    crop_params = get_algo_params(cfg_dict, algo_type, 'crop', logger)
+    
+    # check if required data is present in data_dict
+    for key in rotate_and_crop.required_data:
+        if key not in data_dict:
+            logger.log(f'{key} not found in data_dict', Logger.ERROR)
+            return
+    # standard code snippet ends here
+    #########################################################################################################################
+
+    # imports
+    from liguard.pcd.utils import calc_rotation_matrix, transform_and_crop_point_cloud
+
+    # rigid transform of the rotation
+    transform = np.eye(4, dtype=np.float32)
+    transform[:3, :3] = calc_rotation_matrix(rotate_params['angles'])
+
+    # Update the point cloud in data_dict
+    data_dict['current_point_cloud_numpy'] = transform_and_crop_point_cloud(data_dict['current_point_cloud_numpy'], transform, crop_params['min_xyz'], crop_params['max_xyz'])
+    data_dict['current_point_cloud_point_colors'] = np.ones((data_dict['current_point_cloud_numpy'].shape[0], 3), dtype=np.float32)
+
+@algo_func(required_data=['current_point_cloud_numpy', 'current_image_numpy', 'current_calib_data'], stateless=True)
 def project_image_pixel_colors(data_dict: dict, cfg_dict: dict, logger: Logger):
     """
     Projects the colors of image pixels onto the point cloud.
@@ -109,18 +143,16 @@ def project_image_pixel_colors(data_dict: dict, cfg_dict: dict, logger: Logger):
     # standard code snippet ends here
     #########################################################################################################################
     
+    # imports
+    from liguard.calib.utils import get_lidar_to_image, project_points_to_image
+    
     # Extract required data
     img_np = data_dict['current_image_numpy']
-    Tr_velo_to_cam = data_dict['current_calib_data']['Tr_velo_to_cam']
-    R0_rect = data_dict['current_calib_data']['R0_rect']
-    P2 = data_dict['current_calib_data']['P2']
     
     data_dict['current_point_cloud_point_colors'] = np.ones((data_dict['current_point_cloud_numpy'].shape[0], 3), dtype=np.float32) # N X 3(RGB)
-    # Convert lidar coordinates to homogeneous coordinates
-    lidar_coords_Nx4 = np.hstack((data_dict['current_point_cloud_numpy'][:,:3], np.ones((data_dict['current_point_cloud_numpy'].shape[0], 1))))
     
     # Project lidar points onto the image plane
-    pixel_coords = P2 @ R0_rect @ Tr_velo_to_cam @ lidar_coords_Nx4.T
+    pixel_coords = project_points_to_image(data_dict['current_point_cloud_numpy'], get_lidar_to_image(data_dict['current_calib_data'])).T
     
     # Normalize pixel coordinates
     normalized_pixel_coords_2d = pixel_coords[:2] / (pixel_coords[2] + 1e-8)
@@ -132,6 +164,50 @@ def project_image_pixel_colors(data_dict: dict, cfg_dict: dict, logger: Logger):
     # Update the point cloud colors in data_dict corresponding to the valid pixel coordinates
     data_dict['current_point_cloud_point_colors'][valid_coords] = img_np[normalized_pixel_coords_2d[valid_coords][:, 1], normalized_pixel_coords_2d[valid_coords][:, 0]] / 255.0
     
+@algo_func(required_data=['current_point_cloud_numpy'], stateless=True)
+def voxel_downsample(data_dict: dict, cfg_dict: dict, logger: Logger):
+    """
+    Downsample the point cloud data to one point per voxel, so that the later algorithms process fewer points.
+
+    The row of the downsampled point cloud of every original point is kept in `data_dict['current_point_cloud_downsample_index_map']`, so that per-point results, e.g. `data_dict['current_point_cloud_cluster_labels']`, can be scattered back to the original points with `values[index_map]`.
+
+    Args:
+        data_dict (dict): A dictionary containing the data.
+        cfg_dict (dict): A dictionary containing the configuration parameters.
+        logger (gui.logger_gui.Logger): A logger object for logging messages and errors in GUI.
+    """
+    #########################################################################################################################
+    # standard code snippet that gets the parameters from the config file and checks if required data is present in data_dict
+    # usually, this snippet is common for all the algorithms, so it is recommended to not remove it
+    algo_name = inspect.stack()[0].function
+    params = get_algo_params(cfg_dict, algo_type, algo_name, logger)
+    
+    # check if required data is present in data_dict
+    for key in voxel_downsample.required_data:
+        if key not in data_dict:
+            logger.log(f'{key} not found in data_dict', Logger.ERROR)
+            return
+    # standard code snippet ends here
+    #########################################################################################################################
+
+    # imports
+    from liguard.pcd.utils import downsample_point_cloud
+
+    if params['reduction'] not in ['centroid', 'first']:
+        logger.log(f'Unknown reduction {params["reduction"]}, must be centroid or first', Logger.ERROR)
+        return
+
+    # point colors are reduced along with the points
+    pcd = data_dict['current_point_cloud_numpy']
+    point_colors = data_dict.get('current_point_cloud_point_colors', None)
+    if point_colors is not None and len(point_colors) != len(pcd): point_colors = None
+
+    # Update the point cloud in data_dict
+    downsampled_pcd, downsampled_point_colors, index_map = downsample_point_cloud(pcd, params['leaf_size'], params['reduction'], point_colors)
+    data_dict['current_point_cloud_numpy'] = downsampled_pcd
+    data_dict['current_point_cloud_downsample_index_map'] = index_map
+    if downsampled_point_colors is not None: data_dict['current_point_cloud_point_colors'] = downsampled_point_colors
+
 @algo_func(required_data=['current_point_cloud_numpy'])
 def BGFilterDHistDPP(data_dict: dict, cfg_dict: dict, logger: Logger):
     """
@@ -155,11 +231,12 @@ def BGFilterDHistDPP(data_dict: dict, cfg_dict: dict, logger: Logger):
             return
     # standard code snippet ends here
     #########################################################################################################################
-    live_editable_params = ['background_density_threshold'] # list of params that can be live edited and do not require re-computation of filter
+    live_editable_params = ['background_density_threshold', 'decay_factor', 'continuous_learning'] # list of params that can be live edited and do not require re-computation of filter
     
     # imports
-    from liguard.algo.non_nn.DHistDPP import calc_DHistDPP_params, save_DHistDPP_params, load_DHistDPP_params, make_DHistDPP_filter
-    from liguard.algo.utils import gather_point_clouds, skip_frames, combine_gathers
+    from liguard.algo.non_nn.DHistDPP import DHistDPPAccumulator, save_DHistDPP_params, load_DHistDPP_params, make_DHistDPP_filter
+    from liguard.algo.non_nn.filter_file import find_mismatched_metadata
+    from liguard.algo.utils import accumulate_point_clouds, skip_frames
     from liguard.pcd.utils import get_fixed_sized_point_cloud
 
     # dict keys
@@ -168,24 +245,32 @@ def BGFilterDHistDPP(data_dict: dict, cfg_dict: dict, logger: Logger):
     params_key = make_key(algo_name, 'params')
     filter_key = make_key(algo_name, 'filter')
     filter_loaded_key = make_key(algo_name, 'filter_loaded')
+    accumulator_key = make_key(algo_name, 'accumulator')
+    learned_frame_key = make_key(algo_name, 'learned_frame')
+    filter_params_key = make_key(algo_name, 'filter_params')
     
     # generate keys for query and skip frames
-    all_query_frames_keys = [f'{query_frames_key}_{i}' for i in range(get_algo_params(cfg_dict, algo_name, 'number_of_frame_gather_iters', logger))]
-    all_skip_frames_keys = [f'{skip_frames_key}_{i}' for i in range(get_algo_params(cfg_dict, algo_name, 'number_of_skip_frames_after_each_iter', logger))]
+    all_query_frames_keys = [f'{query_frames_key}_{i}' for i in range(params['number_of_frame_gather_iters'])]
+    all_skip_frames_keys = [f'{skip_frames_key}_{i}' for i in range(params['number_of_frame_gather_iters'])]
 
     # load filter if exists
-    if filter_loaded_key not in data_dict and get_algo_params(cfg_dict, algo_name, 'load_filter', logger):
+    if filter_loaded_key not in data_dict and params['load_filter']:
         # add params to data_dict
         data_dict[params_key] = params
         
         # load filter
         data_outputs_dir = cfg_dict['data']['outputs_dir']
         if not os.path.isabs(data_outputs_dir): data_outputs_dir = os.path.join(cfg_dict['data']['pipeline_dir'], data_outputs_dir)
-        filter_params = load_DHistDPP_params(os.path.join(data_outputs_dir, params['filter_file']))
+        filter_path = os.path.join(data_outputs_dir, params['filter_file'])
+        filter_params = load_DHistDPP_params(filter_path)
         if filter_params:
             data_dict[filter_key] = lambda pcd, threshold: make_DHistDPP_filter(pcd, threshold, **filter_params)
             data_dict[filter_loaded_key] = True
+            data_dict[filter_params_key] = filter_params
             logger.log(f'Filter loaded from {params["filter_file"]}', Logger.INFO)
+            # warn if the filter was made with different params than the current ones
+            mismatched_params = find_mismatched_metadata(filter_path, {key: params[key] for key in ['number_of_points_per_frame', 'lidar_range_in_unit_length', 'bins_per_unit_length']})
+            for key, (file_value, value) in mismatched_params.items(): logger.log(f'Filter in {params["filter_file"]} was made with {key}={file_value}, but {key}={value} in the config', Logger.WARNING)
         else:
             data_dict[filter_loaded_key] = False
             logger.log(f'Failed to load filter from {params["filter_file"]}. Calculating ...', Logger.WARNING)
@@ -194,25 +279,22 @@ def BGFilterDHistDPP(data_dict: dict, cfg_dict: dict, logger: Logger):
     if filter_key not in data_dict:
         data_dict[params_key] = params
         
-        # gather frames
+        # accumulate the histogram frame by frame, so that only the counts are kept in memory instead of all the gathered frames
+        if accumulator_key not in data_dict: data_dict[accumulator_key] = DHistDPPAccumulator(params['number_of_points_per_frame'], params['lidar_range_in_unit_length'], params['bins_per_unit_length'], params.get('decay_factor', 1.0))
         for i in range(params['number_of_frame_gather_iters']):
-            gathering_done = gather_point_clouds(data_dict, cfg_dict, all_query_frames_keys[i], params['number_of_frames_in_each_gather_iter'])
-            if not gathering_done: return
+            accumulation_done = accumulate_point_clouds(data_dict, cfg_dict, all_query_frames_keys[i], params['number_of_frames_in_each_gather_iter'], data_dict[accumulator_key])
+            if not accumulation_done: return
             skipping_done = skip_frames(data_dict, cfg_dict, all_skip_frames_keys[i], params['number_of_skip_frames_after_each_iter'])
             if not skipping_done: return
-            
-        # combine gathered frames
-        combine_gathers(data_dict, cfg_dict, query_frames_key, all_query_frames_keys)
-        assert len(data_dict[query_frames_key]) == params['number_of_frame_gather_iters'] * params['number_of_frames_in_each_gather_iter']
         
         # generate filter
         logger.log('Generating filter', Logger.INFO)
-        
-        data_dict[query_frames_key] = [get_fixed_sized_point_cloud(frame, params['number_of_points_per_frame']) for frame in data_dict[query_frames_key]]
-        filter_params = calc_DHistDPP_params(data_dict[query_frames_key], params['number_of_points_per_frame'], params['lidar_range_in_unit_length'], params['bins_per_unit_length'])
+        filter_params = data_dict[accumulator_key].params()
+        data_dict[filter_params_key] = filter_params
         data_dict[filter_key] = lambda pcd, threshold: make_DHistDPP_filter(pcd, threshold, **filter_params)
-        logger.log(f'Filter generated', Logger.INFO)
-        
+        data_dict[learned_frame_key] = data_dict['current_frame_index']
+        logger.log('Filter generated', Logger.INFO)
+
         # make sure the outputs_dir is created
         data_outputs_dir = cfg_dict['data']['outputs_dir']
         if not os.path.isabs(data_outputs_dir): data_outputs_dir = os.path.join(cfg_dict['data']['pipeline_dir'], data_outputs_dir)
@@ -233,6 +315,18 @@ def BGFilterDHistDPP(data_dict: dict, cfg_dict: dict, logger: Logger):
             for key in keys_to_remove: data_dict.pop(key)
             return
     
+    # keep learning the background from the incoming frames, so that the filter adapts to scene changes
+    if filter_key in data_dict and params.get('continuous_learning', False) and data_dict.get(learned_frame_key, None) != data_dict['current_frame_index']:
+        if accumulator_key not in data_dict:
+            # the filter was loaded from disk, start from it as if it was accumulated from the gathered frames
+            data_dict[accumulator_key] = DHistDPPAccumulator(params['number_of_points_per_frame'], params['lidar_range_in_unit_length'], params['bins_per_unit_length'], params.get('decay_factor', 1.0))
+            data_dict[accumulator_key].load(data_dict[filter_params_key], params['number_of_frame_gather_iters'] * params['number_of_frames_in_each_gather_iter'])
+        data_dict[accumulator_key].decay_factor = params.get('decay_factor', 1.0)
+        data_dict[accumulator_key].update(data_dict['current_point_cloud_numpy'])
+        data_dict[learned_frame_key] = data_dict['current_frame_index']
+        learned_filter_params = data_dict[accumulator_key].params()
+        data_dict[filter_key] = lambda pcd, threshold: make_DHistDPP_filter(pcd, threshold, **learned_filter_params)
+    
     # if filter exists, apply it
     if filter_key in data_dict:
         data_dict['current_point_cloud_numpy'] = get_fixed_sized_point_cloud(data_dict['current_point_cloud_numpy'], params['number_of_points_per_frame'])
@@ -261,11 +355,12 @@ def BGFilterSTDF(data_dict: dict, cfg_dict: dict, logger: Logger):
             return
     # standard code snippet ends here
     #########################################################################################################################
-    live_editable_params = ['background_density_threshold'] # list of params that can be live edited and do not require re-computation of filter
+    live_editable_params = ['background_density_threshold', 'decay_factor', 'continuous_learning'] # list of params that can be live edited and do not require re-computation of filter
 
     # imports
-    from liguard.algo.non_nn.STDF import calc_STDF_params, save_STDF_params, load_STDF_params, make_STDF_filter
-    from liguard.algo.utils import gather_point_clouds, skip_frames, combine_gathers
+    from liguard.algo.non_nn.STDF import STDFAccumulator, save_STDF_params, load_STDF_params, make_STDF_filter
+    from liguard.algo.non_nn.filter_file import find_mismatched_metadata
+    from liguard.algo.utils import accumulate_point_clouds, skip_frames
     from liguard.pcd.utils import get_fixed_sized_point_cloud
     
     # dict keys
@@ -274,10 +369,13 @@ def BGFilterSTDF(data_dict: dict, cfg_dict: dict, logger: Logger):
     params_key = make_key(algo_name, 'params')
     filter_key = make_key(algo_name, 'filter')
     filter_loaded_key = make_key(algo_name, 'filter_loaded')
+    accumulator_key = make_key(algo_name, 'accumulator')
+    learned_frame_key = make_key(algo_name, 'learned_frame')
+    filter_params_key = make_key(algo_name, 'filter_params')
     
     # generate keys for query and skip frames
     all_query_frames_keys = [f'{query_frames_key}_{i}' for i in range(params['number_of_frame_gather_iters'])]
-    all_skip_frames_keys = [f'{skip_frames_key}_{i}' for i in range(params['number_of_skip_frames_after_each_iter'])]
+    all_skip_frames_keys = [f'{skip_frames_key}_{i}' for i in range(params['number_of_frame_gather_iters'])]
 
     # load filter if exists
     if filter_loaded_key not in data_dict and params['load_filter']:
@@ -287,11 +385,16 @@ def BGFilterSTDF(data_dict: dict, cfg_dict: dict, logger: Logger):
         # load filter
         data_outputs_dir = cfg_dict['data']['outputs_dir']
         if not os.path.isabs(data_outputs_dir): data_outputs_dir = os.path.join(cfg_dict['data']['pipeline_dir'], data_outputs_dir)
-        filter_params = load_STDF_params(os.path.join(data_outputs_dir, params['filter_file']))
+        filter_path = os.path.join(data_outputs_dir, params['filter_file'])
+        filter_params = load_STDF_params(filter_path)
         if filter_params:
             data_dict[filter_key] = lambda pcd, threshold: make_STDF_filter(pcd, threshold, **filter_params)
             data_dict[filter_loaded_key] = True
+            data_dict[filter_params_key] = filter_params
             logger.log(f'Filter loaded from {params["filter_file"]}', Logger.INFO)
+            # warn if the filter was made with different params than the current ones
+            mismatched_params = find_mismatched_metadata(filter_path, {key: params[key] for key in ['lidar_range_in_unit_length', 'bins_per_unit_length']})
+            for key, (file_value, value) in mismatched_params.items(): logger.log(f'Filter in {params["filter_file"]} was made with {key}={file_value}, but {key}={value} in the config', Logger.WARNING)
         else:
             data_dict[filter_loaded_key] = False
             logger.log(f'Failed to load filter from {params["filter_file"]}. Calculating ...', Logger.WARNING)
@@ -299,22 +402,20 @@ def BGFilterSTDF(data_dict: dict, cfg_dict: dict, logger: Logger):
     # generate filter if not exists
     if filter_key not in data_dict:
         data_dict[params_key] = params
-        # gather frames
+        # accumulate the histogram frame by frame, so that only the counts are kept in memory instead of all the gathered frames
+        if accumulator_key not in data_dict: data_dict[accumulator_key] = STDFAccumulator(params['lidar_range_in_unit_length'], params['bins_per_unit_length'], params.get('decay_factor', 1.0))
         for i in range(params['number_of_frame_gather_iters']):
-            gathering_done = gather_point_clouds(data_dict, cfg_dict, all_query_frames_keys[i], params['number_of_frames_in_each_gather_iter'])
-            if not gathering_done: return
+            accumulation_done = accumulate_point_clouds(data_dict, cfg_dict, all_query_frames_keys[i], params['number_of_frames_in_each_gather_iter'], data_dict[accumulator_key])
+            if not accumulation_done: return
             skipping_done = skip_frames(data_dict, cfg_dict, all_skip_frames_keys[i], params['number_of_skip_frames_after_each_iter'])
             if not skipping_done: return
-            
-        # combine gathered frames
-        combine_gathers(data_dict, cfg_dict, query_frames_key, all_query_frames_keys)
-        assert len(data_dict[query_frames_key]) == params['number_of_frame_gather_iters'] * params['number_of_frames_in_each_gather_iter']
         
         # generate filter
         logger.log('Generating filter', Logger.INFO)
-        data_dict[query_frames_key] = [get_fixed_sized_point_cloud(frame, params['number_of_points_per_frame']) for frame in data_dict[query_frames_key]]
-        filter_params = calc_STDF_params(data_dict[query_frames_key], params['lidar_range_in_unit_length'], params['bins_per_unit_length'])
+        filter_params = data_dict[accumulator_key].params()
+        data_dict[filter_params_key] = filter_params
         data_dict[filter_key] = lambda pcd, threshold: make_STDF_filter(pcd, threshold, **filter_params)
+        data_dict[learned_frame_key] = data_dict['current_frame_index']
         logger.log('Filter generated', Logger.INFO)
 
         # make sure the outputs_dir is created
@@ -337,13 +438,25 @@ def BGFilterSTDF(data_dict: dict, cfg_dict: dict, logger: Logger):
             for key in keys_to_remove: data_dict.pop(key)
             return
     
+    # keep learning the background from the incoming frames, so that the filter adapts to scene changes
+    if filter_key in data_dict and params.get('continuous_learning', False) and data_dict.get(learned_frame_key, None) != data_dict['current_frame_index']:
+        if accumulator_key not in data_dict:
+            # the filter was loaded from disk, start from it as if it was accumulated from the gathered frames
+            data_dict[accumulator_key] = STDFAccumulator(params['lidar_range_in_unit_length'], params['bins_per_unit_length'], params.get('decay_factor', 1.0))
+            data_dict[accumulator_key].load(data_dict[filter_params_key], params['number_of_frame_gather_iters'] * params['number_of_frames_in_each_gather_iter'])
+        data_dict[accumulator_key].decay_factor = params.get('decay_factor', 1.0)
+        data_dict[accumulator_key].update(data_dict['current_point_cloud_numpy'])
+        data_dict[learned_frame_key] = data_dict['current_frame_index']
+        learned_filter_params = data_dict[accumulator_key].params()
+        data_dict[filter_key] = lambda pcd, threshold: make_STDF_filter(pcd, threshold, **learned_filter_params)
+    
     # if filter exists, apply it
     if filter_key in data_dict:
         # apply filter
         data_dict['current_point_cloud_numpy'] = get_fixed_sized_point_cloud(data_dict['current_point_cloud_numpy'], params['number_of_points_per_frame'])
         data_dict['current_point_cloud_numpy'] = data_dict['current_point_cloud_numpy'][data_dict[filter_key](data_dict['current_point_cloud_numpy'], params['background_density_threshold'])]
 
-@algo_func(required_data=['current_point_cloud_numpy'])
+@algo_func(required_data=['current_point_cloud_numpy'], stateless=True)
 def Clusterer_TEPP_DBSCAN(data_dict: dict, cfg_dict: dict, logger: Logger):
     """
     Perform TEPP DBSCAN clustering on the current point cloud.
@@ -379,14 +492,17 @@ def Clusterer_TEPP_DBSCAN(data_dict: dict, cfg_dict: dict, logger: Logger):
     labels, _ = DBSCAN(data_dict['current_point_cloud_numpy'], params['eps'], params['min_samples'])
     
     # create 'current_label_list' if not exists
-    if 'current_label_list' not in data_dict: data_dict['current_label_list'] = []
+    if 'current_label_list' not in data_dict:
+        from liguard.lbl.label_table import LabelTable
+        data_dict['current_label_list'] = LabelTable()
     
-    # update label list
-    for label in np.unique(labels):
-        if label == -1: continue
-        data_dict['current_label_list'].append({'lidar_cluster': {'point_indices': labels == label}})
+    # update label list, the clusters are records into the shared cluster labels of the points
+    from liguard.pcd.utils import calc_cluster_records
+    data_dict['current_point_cloud_cluster_labels'] = np.asarray(labels, dtype=np.int32)
+    data_dict['current_point_cloud_cluster_order'], records = calc_cluster_records(data_dict['current_point_cloud_cluster_labels'])
+    data_dict['current_label_list'].extend({'lidar_cluster': record} for record in records)
 
-@algo_func(required_data=['current_point_cloud_numpy'])
+@algo_func(required_data=['current_point_cloud_numpy'], stateless=True)
 def O3D_DBSCAN(data_dict: dict, cfg_dict: dict, logger: Logger):
     """
     DBSCAN clustering available in Open3D library.
@@ -417,14 +533,58 @@ def O3D_DBSCAN(data_dict: dict, cfg_dict: dict, logger: Logger):
     labels = np.array(pcd.cluster_dbscan(eps=params['eps'], min_points=params['min_samples'], print_progress=False))
 
     # create 'current_label_list' if not exists
-    if 'current_label_list' not in data_dict: data_dict['current_label_list'] = []
+    if 'current_label_list' not in data_dict:
+        from liguard.lbl.label_table import LabelTable
+        data_dict['current_label_list'] = LabelTable()
+
+    # update label list, the clusters are records into the shared cluster labels of the points
+    from liguard.pcd.utils import calc_cluster_records
+    data_dict['current_point_cloud_cluster_labels'] = np.asarray(labels, dtype=np.int32)
+    data_dict['current_point_cloud_cluster_order'], records = calc_cluster_records(data_dict['current_point_cloud_cluster_labels'])
+    data_dict['current_label_list'].extend({'lidar_cluster': record} for record in records)
+
+@algo_func(required_data=['current_point_cloud_numpy'], stateless=True)
+def Voxel_DBSCAN(data_dict: dict, cfg_dict: dict, logger: Logger):
+    """
+    DBSCAN clustering accelerated with a uniform voxel hash, gives the same labels as O3D_DBSCAN.
 
-    # update label list
-    for label in np.unique(labels):
-        if label == -1: continue
-        data_dict['current_label_list'].append({'lidar_cluster': {'point_indices': labels == label}})
+    Args:
+        data_dict (dict): A dictionary containing data for processing.
+        cfg_dict (dict): A dictionary containing configuration parameters.
+        logger (gui.logger_gui.Logger): A logger object for logging messages and errors in GUI.
+    """
+    #########################################################################################################################
+    # standard code snippet that gets the parameters from the config file and checks if required data is present in data_dict
+    # usually, this snippet is common for all the algorithms, so it is recommended to not remove it
+    algo_name = inspect.stack()[0].function
+    params = get_algo_params(cfg_dict, algo_type, algo_name, logger)
+    
+    # check if required data is present in data_dict
+    for key in Voxel_DBSCAN.required_data:
+        if key not in data_dict:
+            logger.log(f'{key} not found in data_dict', Logger.ERROR)
+            return
+    # standard code snippet ends here
+    #########################################################################################################################
+
+    # imports
+    from liguard.algo.non_nn.VoxelDBSCAN import voxel_dbscan
+    from liguard.pcd.utils import calc_cluster_records
+
+    # perform clustering
+    labels = voxel_dbscan(data_dict['current_point_cloud_numpy'], params['eps'], params['min_samples'], workers=params.get('workers', 1))
+
+    # create 'current_label_list' if not exists
+    if 'current_label_list' not in data_dict:
+        from liguard.lbl.label_table import LabelTable
+        data_dict['current_label_list'] = LabelTable()
+
+    # update label list, the clusters are records into the shared cluster labels of the points
+    data_dict['current_point_cloud_cluster_labels'] = labels
+    data_dict['current_point_cloud_cluster_order'], records = calc_cluster_records(labels)
+    data_dict['current_label_list'].extend({'lidar_cluster': record} for record in records)
 
-@ algo_func(required_data=['current_point_cloud_numpy', 'current_label_list'])
+@ algo_func(required_data=['current_point_cloud_numpy', 'current_label_list'], stateless=True)
 def Cluster2Object(data_dict: dict, cfg_dict: dict, logger: Logger):
     """
     Converts lidar clusters to object labels and adds them to the current label list.
@@ -449,47 +609,39 @@ def Cluster2Object(data_dict: dict, cfg_dict: dict, logger: Logger):
     #########################################################################################################################
 
     # imports
-    import open3d as o3d
-    
-    # iterate over clusters and convert them to objects
-    for label_dict in data_dict['current_label_list']:
-        if 'lidar_cluster' not in label_dict: continue
-        
-        # get cluster
-        lidar_cluster_dict = label_dict['lidar_cluster']
-        point_indices = lidar_cluster_dict['point_indices']
-        cluster = data_dict['current_point_cloud_numpy'][point_indices][:, :3]
-
-        # get an axis-aligned bounding box
-        try:
-            bbox = o3d.geometry.AxisAlignedBoundingBox.create_from_points(o3d.utility.Vector3dVector(cluster))
-            xyz_center = bbox.get_center().astype(np.float32)
-            xyz_extent = (bbox.get_max_bound() - bbox.get_min_bound()).astype(np.float32)
-            xyz_euler_angles = np.array([0, 0, 0], dtype=np.float32)
-        except: continue
-
-        # get bbox params
-        base_length = xyz_extent[0] if xyz_extent[0] > xyz_extent[1] else xyz_extent[1]
-        height = xyz_extent[2]
-        foot = xyz_center[2] - height / 2.0
-
-        # foot can't be too heigh
-        if foot > params['ground_level'] + params['max_foot_level']: continue
-
-        # very small height objects are noise
-        if height < params['min_height']: continue
-
-        # classify the object based on size constraints
-        selected_obj_class = None
-        for obj_class, size_constraint in params['size_constraints'].items():
-            base_length_range = size_constraint['base_length']
-            height_range = size_constraint['height']
-            if base_length_range[0] <= base_length < base_length_range[1]: # and height_range[0] <= height < height_range[1]:
-                selected_obj_class = obj_class
-                break
-        
-        # if can't classify, skip the cluster
-        if selected_obj_class == None: continue
+    from liguard.pcd.utils import calc_cluster_boxes
+
+    # clusters are records into the shared cluster labels of the points
+    cluster_labels = [label_dict['lidar_cluster']['cluster_label'] for label_dict in data_dict['current_label_list'] if 'lidar_cluster' in label_dict]
+    if len(cluster_labels) == 0: return
+    if 'current_point_cloud_cluster_labels' not in data_dict or len(data_dict['current_point_cloud_cluster_labels']) != len(data_dict['current_point_cloud_numpy']):
+        logger.log('current_point_cloud_cluster_labels does not match current_point_cloud_numpy, make sure the point cloud is not modified after clustering', Logger.ERROR)
+        return
+
+    # get the axis-aligned and oriented bounding boxes of all the clusters at once
+    boxes = calc_cluster_boxes(data_dict['current_point_cloud_numpy'], data_dict['current_point_cloud_cluster_labels'], data_dict.get('current_point_cloud_cluster_order', None))
+    xyz_centers = ((boxes['min_xyz'] + boxes['max_xyz']) / 2.0).astype(np.float32)
+    xyz_extents = (boxes['max_xyz'] - boxes['min_xyz']).astype(np.float32)
+
+    # get bbox params
+    base_lengths = np.maximum(xyz_extents[:, 0], xyz_extents[:, 1])
+    heights = xyz_extents[:, 2]
+    foots = xyz_centers[:, 2] - heights / 2.0
+
+    # foot can't be too heigh and very small height objects are noise, and clusters removed from the label list are skipped
+    valid = (foots <= params['ground_level'] + params['max_foot_level']) & (heights >= params['min_height']) & np.isin(boxes['cluster_labels'], cluster_labels)
+
+    # classify the objects based on size constraints, the first class whose base length range contains the base length is selected
+    obj_classes = list(params['size_constraints'].keys())
+    base_length_ranges = np.array([params['size_constraints'][obj_class]['base_length'] for obj_class in obj_classes], dtype=np.float32).reshape(-1, 2)
+    in_range = (base_lengths[:, None] >= base_length_ranges[:, 0]) & (base_lengths[:, None] < base_length_ranges[:, 1]) # and height ranges are not checked
+    class_indices = np.argmax(in_range, axis=1)
+    # if can't classify, skip the cluster
+    valid &= np.any(in_range, axis=1)
+    requires_orientation = np.array([obj_class in params['classes_require_orientation'] for obj_class in obj_classes], dtype=bool)
+
+    for cluster_index in np.flatnonzero(valid):
+        selected_obj_class = obj_classes[class_indices[cluster_index]]
 
         # get color of the cluster
         if selected_obj_class in params['class_colors']:
@@ -503,23 +655,20 @@ def Cluster2Object(data_dict: dict, cfg_dict: dict, logger: Logger):
         label['class'] = selected_obj_class
 
         # get orientation of the object
-        if selected_obj_class in params['classes_require_orientation']:
-            try:
-                bbox_o = o3d.geometry.OrientedBoundingBox.create_from_points(o3d.utility.Vector3dVector(cluster))
-                xyz_center = bbox_o.get_center().astype(np.float32)
-                xyz_extent = bbox_o.extent.astype(np.float32)
-                rotation_matrix = bbox_o.R.astype(np.float32)
-                xyz_euler_angles = np.array(
-                    [0.0, # np.arctan2(rotation_matrix[2,1], rotation_matrix[2,2]),
-                    0.0, # np.arctan2(-rotation_matrix[2,0], np.sqrt(rotation_matrix[2,1]**2 + rotation_matrix[2,2]**2)),
-                    np.arctan2(rotation_matrix[1,0], rotation_matrix[0,0])], dtype=np.float32)
-            except: pass
-            
+        if requires_orientation[class_indices[cluster_index]]:
+            xyz_center = boxes['oriented_center'][cluster_index].astype(np.float32)
+            xyz_extent = boxes['oriented_extent'][cluster_index].astype(np.float32)
+            xyz_euler_angles = np.array([0.0, 0.0, boxes['yaw'][cluster_index]], dtype=np.float32)
+        else:
+            xyz_center = xyz_centers[cluster_index]
+            xyz_extent = xyz_extents[cluster_index]
+            xyz_euler_angles = np.array([0, 0, 0], dtype=np.float32)
+
         # complete label dict and add to label list
         label['bbox_3d'] = {'xyz_center': xyz_center, 'xyz_extent': xyz_extent, 'xyz_euler_angles': xyz_euler_angles, 'rgb_color': rgb_color, 'predicted': True, 'added_by': algo_name}
         data_dict['current_label_list'].append(label)
 
-@algo_func(required_data=['current_point_cloud_numpy'])
+@algo_func(required_data=['current_point_cloud_numpy'], batchable=True)
 def PointPillarDetection(data_dict: dict, cfg_dict: dict, logger: Logger):
     """
     Perform object detection using the PointPillar algorithm.
@@ -530,8 +679,10 @@ def PointPillarDetection(data_dict: dict, cfg_dict: dict, logger: Logger):
 
     The implementation used here is from "https://github.com/zhulf0804/PointPillars".
     
+    The model is run on all the frames of a batch at once when a list of data dicts is given, one per frame.
+
     Args:
-        data_dict (dict): A dictionary containing the required data for processing.
+        data_dict (dict | list): A dictionary containing the required data for processing, or a list of them for a batch of frames.
         cfg_dict (dict): A dictionary containing the configuration parameters.
         logger (gui.logger_gui.Logger): A logger object for logging messages and errors in GUI.
     """
@@ -541,74 +692,55 @@ def PointPillarDetection(data_dict: dict, cfg_dict: dict, logger: Logger):
     algo_name = inspect.stack()[0].function
     params = get_algo_params(cfg_dict, algo_type, algo_name, logger)
     
+    # a batch of frames is given as a list of data dicts
+    data_dicts = data_dict if isinstance(data_dict, list) else [data_dict]
+    
     # check if required data is present in data_dict
     for key in PointPillarDetection.required_data:
-        if key not in data_dict:
+        if any(key not in frame_data_dict for frame_data_dict in data_dicts):
             logger.log(f'{key} not found in data_dict', Logger.ERROR)
             return
     # standard code snippet ends here
     #########################################################################################################################
     
-    # algo name and keys used in algo
-    model_key = make_key(algo_name, 'model')
-    class_ids_key = make_key(algo_name, 'class_ids')
-    ids_class_key = make_key(algo_name, 'ids_class')
-    pcd_limit_range_key = make_key(algo_name, 'pcd_limit_range')
-    class_color_key = make_key(algo_name, 'class_color')
-    
     # imports
     import torch
+    from liguard.algo.models import get_model, point_pillars_classes
+    from liguard.lbl.label_table import LabelTable
 
-    # create model if not exists
-    if 'PointPillarDetection_model' not in data_dict:
-        data_dict[class_ids_key] = {'Pedestrian': 0, 'Cyclist': 1, 'Car': 2}
-        data_dict[ids_class_key] = {v:k for k, v in data_dict[class_ids_key].items()}
-        min_xyz = cfg_dict['proc']['lidar']['crop']['min_xyz']
-        max_xyz = cfg_dict['proc']['lidar']['crop']['max_xyz']
-        data_dict[pcd_limit_range_key] = np.array(min_xyz + max_xyz, dtype=np.float32)
-        data_dict[class_color_key] = {'Pedestrian': [1, 0, 0], 'Cyclist': [0, 0, 1], 'Car': [0, 1, 0]}
-
-        path = resolve_for_application_root(params['github_repo_dir'])
-        if path not in sys.path: sys.path.append(path)
-        from liguard.algo.nn.PointPillars.model import PointPillars
-
-        data_dict[model_key] = PointPillars(nclasses=len(data_dict[class_ids_key]))
-        model_path = resolve_for_application_root(params['ckpt_file'])
-        if torch.cuda.is_available():
-            data_dict[model_key].cuda()
-            data_dict[model_key].load_state_dict(torch.load(model_path))
-        else:
-             data_dict[model_key].load_state_dict(torch.load(model_path), map_location=torch.device('cpu'))
+    # the number of threads used by torch on cpu, 0 keeps the default
+    if params.get('num_threads', 0) > 0 and torch.get_num_threads() != params['num_threads']: torch.set_num_threads(params['num_threads'])
 
-        data_dict[model_key].eval()
+    # the model is kept in the process-wide model registry, it's loaded on first use unless it was preloaded when the pipeline was built
+    model = get_model(algo_name, cfg_dict, params)
     
+    # all the frames in a single forward pass
     with torch.no_grad():
-        pc_torch = torch.from_numpy(data_dict['current_point_cloud_numpy'])
-        if torch.cuda.is_available(): pc_torch = pc_torch.cuda()
-        result_filter = data_dict[model_key](batched_pts=[pc_torch], mode='test')[0]
-
-    bbox_3des = result_filter['lidar_bboxes']
-    labels, scores = result_filter['labels'], result_filter['scores']
-
-    for i in range(len(labels)):
-        if scores[i] < params['score_threshold']: continue
-        bbox_3d = bbox_3des[i]
-        xyz_center = bbox_3d[:3]
-        xyz_center[2] += bbox_3d[5] / 2
-        xyz_extent = bbox_3d[3:6]
-        xyz_euler_angles = np.array([0, 0, -bbox_3d[6]], dtype=np.float32)
-        obj_class = data_dict[ids_class_key][labels[i]]
-        rgb_color = np.array(data_dict[class_color_key][obj_class], dtype=np.float32)
-
-        label = dict()
-        label['class'] = obj_class
-        label['bbox_3d'] = {'xyz_center': xyz_center, 'xyz_extent': xyz_extent, 'xyz_euler_angles': xyz_euler_angles, 'rgb_color': rgb_color, 'predicted': True, 'added_by': algo_name}
-
-
-        if 'current_label_list' not in data_dict: data_dict['current_label_list'] = []
-        data_dict['current_label_list'].append(label)
-
-@algo_func(required_data=['current_label_list', 'current_calib_data'])
+        pcs_torch = [torch.from_numpy(frame_data_dict['current_point_cloud_numpy']) for frame_data_dict in data_dicts]
+        if torch.cuda.is_available(): pcs_torch = [pc_torch.cuda() for pc_torch in pcs_torch]
+        result_filters = model(batched_pts=pcs_torch, mode='test')
+
+    class_color = {'Pedestrian': [1, 0, 0], 'Cyclist': [0, 0, 1], 'Car': [0, 1, 0]}
+    class_colors = np.array([class_color[obj_class] for obj_class in point_pillars_classes], dtype=np.float32)
+
+    for frame_data_dict, result_filter in zip(data_dicts, result_filters):
+        bbox_3des = np.asarray(result_filter['lidar_bboxes'], dtype=np.float32).reshape(-1, 7)
+        labels, scores = np.asarray(result_filter['labels'], dtype=np.int32).reshape(-1), np.asarray(result_filter['scores'], dtype=np.float32).reshape(-1)
+
+        # all the detections of the frame at once, as a label table
+        keep = scores >= params['score_threshold']
+        bbox_3des, labels, scores = bbox_3des[keep], labels[keep], scores[keep]
+        xyz_center = bbox_3des[:, :3].copy()
+        xyz_center[:, 2] += bbox_3des[:, 5] / 2
+        xyz_extent = bbox_3des[:, 3:6]
+        xyz_euler_angles = np.zeros((len(labels), 3), dtype=np.float32)
+        xyz_euler_angles[:, 2] = -bbox_3des[:, 6]
+        detections = LabelTable(point_pillars_classes, labels, xyz_center, xyz_extent, xyz_euler_angles, class_colors[labels], np.ones(len(labels), dtype=bool), score=scores, sources=[algo_name], source_ids=np.zeros(len(labels), dtype=np.int32))
+
+        if 'current_label_list' not in frame_data_dict: frame_data_dict['current_label_list'] = LabelTable()
+        frame_data_dict['current_label_list'] = LabelTable.concat([frame_data_dict['current_label_list'], detections])
+
+@algo_func(required_data=['current_label_list', 'current_calib_data'], stateless=True)
 def gen_bbox_2d(data_dict: dict, cfg_dict: dict, logger: Logger):
     """
     Generate 2D bounding boxes from 3D bounding boxes.
@@ -633,43 +765,41 @@ def gen_bbox_2d(data_dict: dict, cfg_dict: dict, logger: Logger):
     #########################################################################################################################
     
     # imports
-    import open3d as o3d
+    from liguard.calib.utils import get_lidar_to_image, project_points_to_image
+    from liguard.lbl.label_table import LabelTable
+    from liguard.pcd.utils import calc_box_corners
     
     # get calibration data
-    calib_data = data_dict['current_calib_data']
-    
-    # get 2D bounding boxes from 3D bounding boxes
-    for label_dict in data_dict['current_label_list']:
-        if 'bbox_3d' not in label_dict: continue
-        if 'bbox_2d' in label_dict: continue
-        
-        # get 3D bounding box data
+    lidar_to_image = get_lidar_to_image(data_dict['current_calib_data'])
+    
+    # labels with a 3D bounding box but no 2D bounding box
+    label_table = LabelTable.from_list(data_dict['current_label_list'])
+    label_indices = np.flatnonzero(label_table.has_bbox_3d & ~label_table.has_bbox_2d)
+    if len(label_indices) == 0: return
+    xyz_center = label_table.get_column('xyz_center')[label_indices]
+    
+    # get 3D bounding box corners of all the labels, and project them onto the image plane at once
+    corners_3d = calc_box_corners(xyz_center, label_table.get_column('xyz_extent')[label_indices], label_table.get_column('xyz_euler_angles')[label_indices])
+    corners_2d = project_points_to_image(corners_3d.reshape(-1, 3), lidar_to_image)
+    corners_2d = (corners_2d[:, :2] / corners_2d[:, 2:]).reshape(-1, 8, 2)
+    
+    # get 2D bounding boxes from 2D corners
+    min_xy = corners_2d.min(axis=1)
+    max_xy = corners_2d.max(axis=1)
+    xy_center = min_xy + (max_xy - min_xy) / 2.0
+    xy_extent = max_xy - min_xy
+    depth = np.linalg.norm(xyz_center, axis=1)
+    
+    for i, label_idx in enumerate(label_indices):
+        label_dict = label_table[label_idx]
         bbox_3d = label_dict['bbox_3d']
-        xyz_center = bbox_3d['xyz_center']
-        xyz_extent = bbox_3d['xyz_extent']
-        xyz_euler_angles = bbox_3d['xyz_euler_angles']
-        
-        # get 3D bounding box corners
-        rotation_matrix = o3d.geometry.OrientedBoundingBox.get_rotation_matrix_from_xyz(xyz_euler_angles)
-        o3d_bbox_3d = o3d.geometry.OrientedBoundingBox(xyz_center, rotation_matrix, xyz_extent)
-        corners_3d = np.array(o3d_bbox_3d.get_box_points()).astype(np.float32)
-        corners_3d = np.concatenate([corners_3d, np.ones((corners_3d.shape[0], 1))], axis=1) # make it x,y,z,1
-        
-        # project 3D bounding box corners onto the image plane
-        corners_2d = calib_data['P2'] @ calib_data['R0_rect'] @ calib_data['Tr_velo_to_cam'] @ corners_3d.T
-        corners_2d = corners_2d[:2] / corners_2d[2]
-        corners_2d = corners_2d.T
-        
-        # get 2D bounding box from 2D corners
-        min_xy = np.min(corners_2d, axis=0)
-        max_xy = np.max(corners_2d, axis=0)
-        
-        xy_center = min_xy + (max_xy - min_xy) / 2.0
-        xy_extent = max_xy - min_xy
         rgb_color = bbox_3d['rgb_color']
-        depth = np.linalg.norm(bbox_3d['xyz_center']).item()
         predicted = bbox_3d['predicted']
-        added_by = bbox_3d['added_by'] + '_2d'
+        # labels that weren't added by an algorithm, e.g. ground truth, get this algorithm as the source
+        added_by = bbox_3d.get('added_by', algo_name) + '_2d'
         
         # add 2D bounding box to the label dict
-        label_dict['bbox_2d'] = {'xy_center': xy_center, 'xy_extent': xy_extent, 'rgb_color': rgb_color, 'depth': depth, 'predicted': predicted, 'added_by': added_by, 'visualize': params['visualize']}
\ No newline at end of file
+        label_dict['bbox_2d'] = {'xy_center': xy_center[i], 'xy_extent': xy_extent[i], 'rgb_color': rgb_color, 'depth': depth[i].item(), 'predicted': predicted, 'added_by': added_by, 'visualize': params['visualize']}
+    
+    # the label dicts are in the table
+    data_dict['current_label_list'] = label_table
@@ -0,0 +1,119 @@
+import sys
+from liguard.gui.config_gui import resolve_for_application_root
+from liguard.gui.logger_gui import Logger
+from liguard.algo.utils import AlgoType, get_algo_params
+from liguard.model_registry import model_registry, make_model_key, get_models_cfg
+
+import numpy as np
+
+"""
+The module models.py contains the model loaders of the neural-network based algorithms. Each loader makes the registry key of the model from the algorithm's parameters, so that the model is shared by all the pipelines of the process and only reloaded when a parameter it depends on changes. The loaders are registered by algorithm name in `model_specs`, which is also used to load the models in background when a pipeline is built.
+"""
+
+# classes of the PointPillars checkpoints
+point_pillars_classes = ['Pedestrian', 'Cyclist', 'Car']
+
+def get_device() -> str:
+    """
+    Returns the device the models are loaded on, 'cuda' if available, otherwise 'cpu'.
+    """
+    import torch
+    return 'cuda' if torch.cuda.is_available() else 'cpu'
+
+def point_pillars_model(cfg_dict: dict, params: dict) -> tuple:
+    """
+    Gets the registry key and the loader of the `PointPillarDetection` model.
+
+    Args:
+        cfg_dict (dict): Pipeline configuration dictionary.
+        params (dict): Parameters of `PointPillarDetection`.
+
+    Returns:
+        tuple: (key, load_fn).
+    """
+    device = get_device()
+    model_path = resolve_for_application_root(params['ckpt_file'])
+    key = make_model_key('PointPillarDetection', model_path, device, {'github_repo_dir': params['github_repo_dir']})
+    def load_fn():
+        import torch
+        path = resolve_for_application_root(params['github_repo_dir'])
+        if path not in sys.path: sys.path.append(path)
+        from liguard.algo.nn.PointPillars.model import PointPillars
+
+        model = PointPillars(nclasses=len(point_pillars_classes))
+        model.load_state_dict(torch.load(model_path, map_location=torch.device(device)))
+        model.to(device)
+        model.eval()
+        return model
+    return key, load_fn
+
+def yolov5_model(cfg_dict: dict, params: dict) -> tuple:
+    """
+    Gets the registry key and the loader of the `UltralyticsYOLOv5` model. The model is warmed up once loaded.
+
+    Args:
+        cfg_dict (dict): Pipeline configuration dictionary.
+        params (dict): Parameters of `UltralyticsYOLOv5`.
+
+    Returns:
+        tuple: (key, load_fn).
+    """
+    device = get_device()
+    key = make_model_key('UltralyticsYOLOv5', params['model'], device, {'model': params['model']})
+    def load_fn():
+        import torch
+        model = torch.hub.load('ultralytics/yolov5', params['model'], pretrained=True, _verbose=False)
+        # warm up with a blank image of the inference size, so that the lazy initialization isn't paid by the first frame
+        model(np.zeros((640, 640, 3), dtype=np.uint8))
+        return model
+    return key, load_fn
+
+# algorithm name: (algorithm type, function returning the registry key and the loader of its model)
+model_specs = {
+    'PointPillarDetection': (AlgoType.lidar, point_pillars_model),
+    'UltralyticsYOLOv5': (AlgoType.camera, yolov5_model),
+}
+
+def get_model(algo_name: str, cfg_dict: dict, params: dict):
+    """
+    Gets the model of an algorithm from the registry, it's loaded if it isn't loaded yet.
+
+    Args:
+        algo_name (str): Name of the algorithm, a key of `model_specs`.
+        cfg_dict (dict): Pipeline configuration dictionary.
+        params (dict): Parameters of the algorithm.
+
+    Returns:
+        The loaded model.
+    """
+    algo_type, model_spec = model_specs[algo_name]
+    return model_registry.get(*model_spec(cfg_dict, params))
+
+def preload_models(cfg_dict: dict, processes: list, logger: Logger) -> list:
+    """
+    Configures the model registry and loads the models of the given processes in background, so that they're ready when the first frame is processed. Models already loaded by a previous pipeline with the same key aren't reloaded.
+
+    Args:
+        cfg_dict (dict): Pipeline configuration dictionary.
+        processes (list): Enabled processes of the pipeline.
+        logger (Logger): Logger object.
+
+    Returns:
+        list: Started loading threads.
+    """
+    model_registry.configure(cfg_dict)
+    if not get_models_cfg(cfg_dict)['preload']: return []
+    threads = []
+    for process in processes:
+        if process.__name__ not in model_specs: continue
+        algo_type, model_spec = model_specs[process.__name__]
+        params = get_algo_params(cfg_dict, algo_type, process.__name__, logger)
+        try: key, load_fn = model_spec(cfg_dict, params)
+        except Exception as e:
+            logger.log(f'Preloading the model of {process.__name__} failed: {e}', Logger.WARNING)
+            continue
+        if key in model_registry: continue
+        logger.log(f'Loading the model of {process.__name__} in background', Logger.INFO)
+        on_error = lambda e, name=process.__name__: logger.log(f'Loading the model of {name} failed: {e}', Logger.ERROR)
+        threads.append(model_registry.preload(key, load_fn, on_error))
+    return threads
@@ -1,6 +1,9 @@
+import os
 import pickle
 import numpy as np
 
+from liguard.algo.non_nn.filter_file import save_filter, load_filter, quantize_densities, dequantize_densities, quantize_threshold
+
 """
 Author: Muhammad Shahbaz (m.shahbaz.kharal@outlook.com)
 Github: github.com/m-shahbaz-kharal
@@ -13,7 +16,7 @@ It is a background filter for roadside LIDAR "structured" point cloud data. The
 The algorithm is summmarized in the following steps:
 Since the point cloud is structured, each point index represents a unique ray in the LIDAR's field of view.
 
-1. So, for each ray, a histogram of distance is calculated across all frames, resulting in N histograms, where N is the number of points in the point cloud.
+1. So, for each ray, a histogram of distance is calculated across all frames, resulting in N histograms, where N is the number of points in the point cloud. The histograms can also be accumulated frame by frame, optionally with exponential decay, using `DHistDPPAccumulator`.
 2. The histograms are then normalized by the number of frames.
 3. The normalized histograms are then used to filter out the background points as follows:
     a. For each point index in the query point cloud, the distance of the point is calculated.
@@ -23,6 +26,39 @@ Since the point cloud is structured, each point index represents a unique ray in
         - otherwise background.
 """
 
+def calc_bin_indices(distances: np.ndarray, # distances of points from origin, any shape
+                     bins_per_point: int, # number of bins per point
+                     lidar_range_in_unit_length: float, # maximum range of lidar in lidar unit length
+):
+    """
+    Calculates the histogram bin index of every distance, binned the same way as `np.histogram(x, bins_per_point, range=(0, lidar_range_in_unit_length))`.
+
+    Returns:
+        tuple: The bin indices and a boolean mask of the distances that are in the histogram range.
+    """
+    # same bin edges as np.histogram, which computes them in the dtype of the data
+    bin_type = np.result_type(0, lidar_range_in_unit_length, distances)
+    if np.issubdtype(bin_type, np.integer): bin_type = float
+    edges = np.linspace(0, lidar_range_in_unit_length, bins_per_point+1, dtype=bin_type)
+    bin_indices = np.digitize(distances, edges) - 1
+    # like np.histogram, the last bin is closed on the right and values out of the range are ignored
+    bin_indices[distances == edges[-1]] = bins_per_point - 1
+    in_range = (distances >= edges[0]) & (distances <= edges[-1])
+    return bin_indices, in_range
+
+def calc_histograms_per_point(distances_per_point: np.ndarray, # NxF, distances of N rays in F frames
+                              bins_per_point: int, # number of bins per point
+                              lidar_range_in_unit_length: float, # maximum range of lidar in lidar unit length
+):
+    """
+    Calculates the histogram of distances of every ray in one vectorized pass. The result is identical to calling `np.histogram(x, bins_per_point, range=(0, lidar_range_in_unit_length))` on every row, but the bin indices of all the distances are found at once and counted with a single `np.bincount` over ray-offset bin indices.
+    """
+    number_of_points = distances_per_point.shape[0]
+    bin_indices, in_range = calc_bin_indices(distances_per_point, bins_per_point, lidar_range_in_unit_length)
+    ray_offsets = np.arange(number_of_points, dtype=np.int64)[:, None] * bins_per_point
+    flat_indices = (bin_indices + ray_offsets)[in_range]
+    return np.bincount(flat_indices, minlength=number_of_points * bins_per_point).reshape(number_of_points, bins_per_point)
+
 def calc_DHistDPP_params(point_cloud_set: list, # a list of point clouds, points in each frame must be equal
              number_of_points_per_frame: int, # number of points in each point cloud
              lidar_range_in_unit_length: float, # maximum range of lidar in lidar unit length
@@ -35,7 +71,7 @@ def calc_DHistDPP_params(point_cloud_set: list, # a list of point clouds, points
     # get the most abundant distances
     bins_per_point = int(lidar_range_in_unit_length * bins_per_unit_length)
     bins = np.linspace(0, lidar_range_in_unit_length, bins_per_point+1)
-    histograms_per_point = np.apply_along_axis(lambda x: np.histogram(x, bins_per_point, range=(0, lidar_range_in_unit_length))[0], axis=1, arr=distances_per_point)
+    histograms_per_point = calc_histograms_per_point(distances_per_point, bins_per_point, lidar_range_in_unit_length)
     normalized_histogram_per_point = histograms_per_point.astype(np.float32) / number_of_frames
 
     filter_params = dict(
@@ -47,27 +83,115 @@ def calc_DHistDPP_params(point_cloud_set: list, # a list of point clouds, points
 
     return filter_params
     
+class DHistDPPAccumulator:
+    """
+    Accumulates the histograms of distances per point frame by frame, so that only the count matrix is kept in memory instead of all the gathered frames. Optionally, the counts decay exponentially so that the model adapts to scene changes.
+
+    Args:
+        number_of_points_per_frame (int): Number of points in each point cloud.
+        lidar_range_in_unit_length (float): Maximum range of lidar in lidar unit length.
+        bins_per_unit_length (int): Number of bins per unit length.
+        decay_factor (float): Factor the counts are multiplied with before a new frame is accumulated, 1.0 means no decay.
+
+    Attributes:
+        counts (np.ndarray): NxB float32 matrix of (decayed) counts per point and bin.
+        number_of_frames (float): (Decayed) number of accumulated frames.
+    """
+    def __init__(self, number_of_points_per_frame: int, lidar_range_in_unit_length: float, bins_per_unit_length: int, decay_factor: float = 1.0):
+        self.number_of_points_per_frame = number_of_points_per_frame
+        self.lidar_range_in_unit_length = lidar_range_in_unit_length
+        self.bins_per_point = int(lidar_range_in_unit_length * bins_per_unit_length)
+        self.bins = np.linspace(0, lidar_range_in_unit_length, self.bins_per_point+1)
+        self.decay_factor = decay_factor
+        self.counts = np.zeros((number_of_points_per_frame, self.bins_per_point), dtype=np.float32)
+        self.number_of_frames = 0.0
+
+    def update(self, point_cloud: np.ndarray):
+        """
+        Accumulates a point cloud. Like `get_fixed_sized_point_cloud`, point clouds with fewer points than `number_of_points_per_frame` are padded with points at the origin and larger ones are cropped.
+
+        Args:
+            point_cloud (np.ndarray): Nx3 or Nx4 point cloud.
+        """
+        if self.decay_factor != 1.0:
+            self.counts *= self.decay_factor
+            self.number_of_frames *= self.decay_factor
+        number_of_points = min(len(point_cloud), self.number_of_points_per_frame)
+        distances = np.zeros(self.number_of_points_per_frame, dtype=np.float32)
+        distances[:number_of_points] = np.linalg.norm(np.asarray(point_cloud[:number_of_points], dtype=np.float32)[:,:3], ord=2, axis=1)
+        bin_indices, in_range = calc_bin_indices(distances, self.bins_per_point, self.lidar_range_in_unit_length)
+        # every ray has one distance per frame, so there are no repeated indices
+        rays = np.flatnonzero(in_range)
+        self.counts[rays, bin_indices[rays]] += 1
+        self.number_of_frames += 1
+
+    def load(self, filter_params: dict, number_of_frames: float):
+        """
+        Starts the accumulation from existing filter params, e.g. a filter loaded from disk, as if they were accumulated from `number_of_frames` frames.
+        """
+        normalized_histogram_per_point = filter_params['normalized_histogram_per_point']
+        if 'density_scale' in filter_params: normalized_histogram_per_point = dequantize_densities(normalized_histogram_per_point, filter_params['density_scale'])
+        self.counts = np.asarray(normalized_histogram_per_point, dtype=np.float32) * np.float32(number_of_frames)
+        self.number_of_frames = float(number_of_frames)
+
+    def params(self) -> dict:
+        """
+        Returns the filter params of the accumulated frames, same as `calc_DHistDPP_params`.
+        """
+        return dict(
+            bins=self.bins,
+            bins_per_point=self.bins_per_point,
+            normalized_histogram_per_point=self.counts / max(self.number_of_frames, 1.0),
+            number_of_points_per_frame=self.number_of_points_per_frame
+        )
+
 def make_DHistDPP_filter(point_cloud: np.ndarray, # Nx4,
            background_density_threshold: float, # if the point falls in a bin with density less than this threshold, it is considered as foreground
            bins: np.ndarray, # bins for histogram
            bins_per_point: int, # number of bins per point
-           normalized_histogram_per_point: np.ndarray, # normalized histogram per point
-           number_of_points_per_frame: int # number of points in each frame
+           normalized_histogram_per_point: np.ndarray, # normalized histogram per point, float or uint8 quantized
+           number_of_points_per_frame: int, # number of points in each frame
+           density_scale: float = None # density range of the uint8 quantized histogram, None if the histogram is not quantized
     ):
     dists = np.linalg.norm(point_cloud[:,:3], ord=2, axis=1)
     bin_indices = np.digitize(dists, bins) - 1
     bin_indices = np.clip(bin_indices, 0, bins_per_point-1)
+    if density_scale is not None: background_density_threshold = quantize_threshold(background_density_threshold, density_scale)
     mask = normalized_histogram_per_point[np.arange(number_of_points_per_frame), bin_indices] < background_density_threshold
     return mask
 
-def save_DHistDPP_params(filter_params, filename):
-    filename = filename.split('.')[0] + '.pkl'
-    with open(filename, 'wb') as f: pickle.dump(filter_params, f)
-    return filename
+def save_DHistDPP_params(filter_params, filename, density_scale: float = 1.0):
+    # the normalized histograms are in [0, 1], one distance per ray per frame
+    lidar_range_in_unit_length = float(filter_params['bins'][-1])
+    metadata = dict(
+        number_of_points_per_frame=int(filter_params['number_of_points_per_frame']),
+        bins_per_point=int(filter_params['bins_per_point']),
+        lidar_range_in_unit_length=lidar_range_in_unit_length,
+        bins_per_unit_length=filter_params['bins_per_point'] / lidar_range_in_unit_length,
+        density_scale=density_scale
+    )
+    normalized_histogram_per_point = filter_params['normalized_histogram_per_point']
+    if 'density_scale' in filter_params: normalized_histogram_per_point = dequantize_densities(normalized_histogram_per_point, filter_params['density_scale'])
+    arrays = dict(
+        bins=filter_params['bins'],
+        normalized_histogram_per_point=quantize_densities(normalized_histogram_per_point, density_scale)
+    )
+    return save_filter(filename, 'DHistDPP', metadata, arrays)
 
 def load_DHistDPP_params(filename):
+    loaded = load_filter(filename, 'DHistDPP')
+    if loaded is not None:
+        metadata, arrays = loaded
+        return dict(
+            bins=arrays['bins'],
+            bins_per_point=metadata['bins_per_point'],
+            normalized_histogram_per_point=arrays['normalized_histogram_per_point'],
+            number_of_points_per_frame=metadata['number_of_points_per_frame'],
+            density_scale=metadata['density_scale']
+        )
+    # filters pickled by older versions
     try:
-        filename = filename.split('.')[0] + '.pkl'
+        filename = os.path.splitext(filename)[0] + '.pkl'
         with open(filename, 'rb') as f: return pickle.load(f)
     except:
-        return None
\ No newline at end of file
+        return None
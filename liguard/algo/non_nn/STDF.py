@@ -1,6 +1,9 @@
+import os
 import pickle
 import numpy as np
 
+from liguard.algo.non_nn.filter_file import save_filter, load_filter, quantize_densities, dequantize_densities, quantize_threshold
+
 """
 Author: Muhammad Shahbaz (m.shahbaz.kharal@outlook.com)
 Github: github.com/m-shahbaz-kharal
@@ -13,15 +16,29 @@ A simple implementation of a spatio-temporal density-based background filter tha
 The algorithm is summarized in the following steps:
 Since the number of points in each frame is not fixed, all the point clouds (gathered temporally) are stacked together to form a single point cloud.
 
-1. A 3D (for spatial dimensions x, y, z) histogram of the point cloud is calculated across all frames.
+1. A 3D (for spatial dimensions x, y, z) histogram of the point cloud is calculated across all frames. Since almost all of the voxels are empty, the histogram is kept sparse: the linearized keys of the occupied voxels are stored sorted along with their point counts. The histogram can also be accumulated frame by frame, optionally with exponential decay, using `STDFAccumulator`.
 2. The histogram is then normalized by the number of frames.
 3. The normalized histogram is then used to filter out the background points as follows:
-    a. For each point in the query point cloud, the point coordinates are used to find the bin index in the histogram.
+    a. For each point in the query point cloud, the point coordinates are used to find the bin index in the histogram, which is looked up in the sorted voxel keys with a binary search.
     b. The density of the bin is then compared with a threshold:
         - If the density is less than the threshold, the point is considered as foreground,
         - otherwise background.
 """
 
+def calc_voxel_keys(points: np.ndarray, # Nx3
+                    bins: np.ndarray, # bins for histogram
+                    bins_per_side: int, # number of bins per side
+):
+    """
+    Calculates the linearized voxel keys `(ix * bins_per_side + iy) * bins_per_side + iz` of the points that fall in the histogram range, binned the same way as `np.histogramdd`.
+    """
+    voxel_indices = np.digitize(points, bins)
+    # like np.histogramdd, the last bin is closed on the right and points out of the range are ignored
+    voxel_indices[points == bins[-1]] -= 1
+    in_range = np.all((voxel_indices >= 1) & (voxel_indices <= bins_per_side), axis=1)
+    voxel_indices = voxel_indices[in_range].astype(np.int64) - 1
+    return (voxel_indices[:, 0] * bins_per_side + voxel_indices[:, 1]) * bins_per_side + voxel_indices[:, 2]
+
 def calc_STDF_params(point_cloud_set: list, # a list of point clouds, points in each frame must be equal
          lidar_range_in_unit_length: float, # maximum range of lidar in lidar unit length
          bins_per_unit_length: int, # number of bins per unit length
@@ -30,37 +47,157 @@ def calc_STDF_params(point_cloud_set: list, # a list of point clouds, points in
     point_cloud_set = np.vstack(point_cloud_set).reshape(-1, point_cloud_set[0].shape[1])
     bins_per_side = int(lidar_range_in_unit_length * bins_per_unit_length)
     bins = np.linspace(-lidar_range_in_unit_length, lidar_range_in_unit_length, bins_per_side+1)
-    histogram_range = [-lidar_range_in_unit_length, lidar_range_in_unit_length]
-    histogram_3d, edges = np.histogramdd(point_cloud_set[:,:3], bins=(bins, bins, bins), range=[histogram_range, histogram_range, histogram_range])
-    normalized_histogram_3d = histogram_3d / number_of_frames
+    # sparse 3d histogram, only the occupied voxels are kept as sorted keys and counts
+    voxel_keys, voxel_counts = np.unique(calc_voxel_keys(point_cloud_set[:,:3], bins, bins_per_side), return_counts=True)
 
     filter_params = dict(
         bins=bins,
         bins_per_side=bins_per_side,
-        normalized_histogram_3d=normalized_histogram_3d
+        number_of_frames=number_of_frames,
+        voxel_keys=voxel_keys,
+        voxel_counts=voxel_counts.astype(np.uint32)
     )
 
     return filter_params
     
+class STDFAccumulator:
+    """
+    Accumulates the sparse 3D histogram frame by frame, so that only the occupied voxels are kept in memory instead of all the gathered frames. Optionally, the counts decay exponentially so that the model adapts to scene changes.
+
+    Args:
+        lidar_range_in_unit_length (float): Maximum range of lidar in lidar unit length.
+        bins_per_unit_length (int): Number of bins per unit length.
+        decay_factor (float): Factor the counts are multiplied with before a new frame is accumulated, 1.0 means no decay.
+        minimum_count (float): With decay, voxels whose counts decay below this value are dropped.
+
+    Attributes:
+        voxel_keys (np.ndarray): Sorted keys of the occupied voxels.
+        voxel_counts (np.ndarray): (Decayed) number of points in the occupied voxels.
+        number_of_frames (float): (Decayed) number of accumulated frames.
+    """
+    def __init__(self, lidar_range_in_unit_length: float, bins_per_unit_length: int, decay_factor: float = 1.0, minimum_count: float = 1e-3):
+        self.bins_per_side = int(lidar_range_in_unit_length * bins_per_unit_length)
+        self.bins = np.linspace(-lidar_range_in_unit_length, lidar_range_in_unit_length, self.bins_per_side+1)
+        self.decay_factor = decay_factor
+        self.minimum_count = minimum_count
+        self.voxel_keys = np.empty(0, dtype=np.int64)
+        self.voxel_counts = np.empty(0, dtype=np.float64)
+        self.number_of_frames = 0.0
+
+    def update(self, point_cloud: np.ndarray):
+        """
+        Accumulates a point cloud.
+
+        Args:
+            point_cloud (np.ndarray): Nx3 or Nx4 point cloud.
+        """
+        if self.decay_factor != 1.0:
+            self.voxel_counts *= self.decay_factor
+            self.number_of_frames *= self.decay_factor
+            keep = self.voxel_counts >= self.minimum_count
+            self.voxel_keys, self.voxel_counts = self.voxel_keys[keep], self.voxel_counts[keep]
+        keys, counts = np.unique(calc_voxel_keys(point_cloud[:,:3], self.bins, self.bins_per_side), return_counts=True)
+        # merge the sorted keys of the frame into the sorted occupied voxels
+        positions = np.searchsorted(self.voxel_keys, keys)
+        occupied = positions < len(self.voxel_keys)
+        occupied[occupied] = self.voxel_keys[positions[occupied]] == keys[occupied]
+        self.voxel_counts[positions[occupied]] += counts[occupied]
+        self.voxel_keys = np.insert(self.voxel_keys, positions[~occupied], keys[~occupied])
+        self.voxel_counts = np.insert(self.voxel_counts, positions[~occupied], counts[~occupied])
+        self.number_of_frames += 1
+
+    def load(self, filter_params: dict, number_of_frames: float):
+        """
+        Starts the accumulation from existing filter params, e.g. a filter loaded from disk, as if they were accumulated from `number_of_frames` frames.
+        """
+        self.voxel_keys = np.asarray(filter_params['voxel_keys'], dtype=np.int64)
+        if 'voxel_densities' in filter_params: voxel_densities = dequantize_densities(filter_params['voxel_densities'], filter_params['density_scale']).astype(np.float64)
+        else: voxel_densities = filter_params['voxel_counts'] / filter_params['number_of_frames']
+        self.voxel_counts = voxel_densities * number_of_frames
+        self.number_of_frames = float(number_of_frames)
+
+    def params(self) -> dict:
+        """
+        Returns the filter params of the accumulated frames, same as `calc_STDF_params`.
+        """
+        # without decay the counts are whole numbers, keep them compact
+        if np.array_equal(self.voxel_counts, np.floor(self.voxel_counts)): voxel_counts = self.voxel_counts.astype(np.uint32)
+        else: voxel_counts = self.voxel_counts.copy()
+        return dict(
+            bins=self.bins,
+            bins_per_side=self.bins_per_side,
+            number_of_frames=max(self.number_of_frames, 1.0),
+            voxel_keys=self.voxel_keys.copy(),
+            voxel_counts=voxel_counts
+        )
+
 def make_STDF_filter(point_cloud: np.ndarray, # Nx3 or Nx4,
             background_density_threshold: float, # if the point falls in a bin with density less than this threshold, it is considered as foreground
             bins: np.ndarray, # bins for histogram
             bins_per_side: int, # number of bins per side
-            normalized_histogram_3d: np.ndarray, # normalized histogram 3d
+            voxel_keys: np.ndarray, # sorted keys of the occupied voxels
+            number_of_frames: float = 1.0, # number of frames the histogram is calculated from
+            voxel_counts: np.ndarray = None, # number of points in the occupied voxels
+            voxel_densities: np.ndarray = None, # uint8 quantized densities of the occupied voxels, used instead of voxel_counts for filters loaded from disk
+            density_scale: float = None, # density range of the quantized densities
     ):
     voxel_indices = np.digitize(point_cloud[:,:3], bins) - 1
-    voxel_indices = np.clip(voxel_indices, 0, bins_per_side-1)
-    mask = normalized_histogram_3d[voxel_indices[:,0], voxel_indices[:,1], voxel_indices[:,2]] < background_density_threshold
+    voxel_indices = np.clip(voxel_indices, 0, bins_per_side-1).astype(np.int64)
+    keys = (voxel_indices[:,0] * bins_per_side + voxel_indices[:,1]) * bins_per_side + voxel_indices[:,2]
+    if len(voxel_keys) == 0: return np.zeros(len(point_cloud), dtype=np.float64) < background_density_threshold
+    # look the keys up in the sorted occupied voxels, empty voxels have zero density
+    # the keys are cast to the dtype of the voxel keys so that memory-mapped keys aren't converted on every call
+    positions = np.minimum(np.searchsorted(voxel_keys, keys.astype(voxel_keys.dtype)), len(voxel_keys)-1)
+    occupied = voxel_keys[positions] == keys
+    if voxel_densities is not None:
+        densities = np.where(occupied, voxel_densities[positions], 0)
+        background_density_threshold = quantize_threshold(background_density_threshold, density_scale)
+    else:
+        densities = np.where(occupied, voxel_counts[positions] / number_of_frames, 0.0)
+    mask = densities < background_density_threshold
     return mask
 
-def save_STDF_params(filter_params, filename):
-    filename = filename.split('.')[0] + '.pkl'
-    with open(filename, 'wb') as f: pickle.dump(filter_params, f)
-    return filename
+def save_STDF_params(filter_params, filename, density_scale: float = 4.0):
+    # a voxel can have more than one point per frame, so the densities can exceed 1, higher densities saturate which doesn't matter for thresholding
+    lidar_range_in_unit_length = float(filter_params['bins'][-1])
+    metadata = dict(
+        bins_per_side=int(filter_params['bins_per_side']),
+        lidar_range_in_unit_length=lidar_range_in_unit_length,
+        bins_per_unit_length=filter_params['bins_per_side'] / lidar_range_in_unit_length,
+        density_scale=density_scale
+    )
+    if 'voxel_densities' in filter_params: voxel_densities = dequantize_densities(filter_params['voxel_densities'], filter_params['density_scale'])
+    else: voxel_densities = filter_params['voxel_counts'] / filter_params['number_of_frames']
+    arrays = dict(
+        bins=filter_params['bins'],
+        # sparse histogram, the keys are stored in the smallest dtype that fits them
+        voxel_keys=np.asarray(filter_params['voxel_keys']).astype(np.min_scalar_type(filter_params['bins_per_side'] ** 3)),
+        voxel_densities=quantize_densities(voxel_densities, density_scale)
+    )
+    return save_filter(filename, 'STDF', metadata, arrays)
 
 def load_STDF_params(filename):
+    loaded = load_filter(filename, 'STDF')
+    if loaded is not None:
+        metadata, arrays = loaded
+        return dict(
+            bins=arrays['bins'],
+            bins_per_side=metadata['bins_per_side'],
+            voxel_keys=arrays['voxel_keys'],
+            voxel_densities=arrays['voxel_densities'],
+            density_scale=metadata['density_scale']
+        )
+    # filters saved as a pickled dense histogram by older versions
     try:
-        filename = filename.split('.')[0] + '.pkl'
-        with open(filename, 'rb') as f: return pickle.load(f)
+        with open(os.path.splitext(filename)[0] + '.pkl', 'rb') as f: filter_params = pickle.load(f)
+        normalized_histogram_3d = filter_params['normalized_histogram_3d']
+        voxel_keys = np.flatnonzero(normalized_histogram_3d)
+        return dict(
+            bins=filter_params['bins'],
+            bins_per_side=filter_params['bins_per_side'],
+            number_of_frames=1,
+            voxel_keys=voxel_keys.astype(np.int64),
+            voxel_counts=normalized_histogram_3d.ravel()[voxel_keys]
+        )
     except:
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,182 @@
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+"""
+Voxel-Grid DBSCAN
+=================
+
+DBSCAN clustering accelerated with a uniform voxel hash, producing the same labels as Open3D's `cluster_dbscan`: `-1` for noise and `0, 1, ...` for clusters, numbered in the order of their first core point.
+
+The algorithm is summarized in the following steps:
+
+1. The points are hashed into voxels with side `eps`, and sorted by voxel key, so that the points of every voxel are a contiguous segment. All the neighbours of a point within `eps` are then in the 27 voxels around its voxel.
+2. The adjacent occupied voxels are found with a binary search of the neighbouring keys in the sorted voxel keys. Only half of the 26 neighbouring offsets are searched, as every pair is found from both sides otherwise.
+3. Every point is compared with the points of its neighbouring voxels, offset by offset, and their float32 distances are compared with `eps`. Points farther than `eps` from the face, edge, or corner shared with a neighbouring voxel are skipped for that offset. The number of neighbours of every point gives the core points, i.e. the points with at least `min_samples` neighbours including themselves.
+4. The core points within `eps` of each other are connected with a vectorized union-find over the sorted points, and the clusters are numbered by their smallest point index.
+5. Every border point, a non-core point within `eps` of a core point, joins the cluster with the smallest label among the clusters of its core neighbours, the rest are noise.
+
+The offsets of step 3 can be processed by a thread pool, as NumPy releases the GIL in the heavy operations.
+"""
+
+neighbour_offsets = [(0, 0, 0)] + [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1) if (dx, dy, dz) > (0, 0, 0)] # the other half of the offsets are found from the neighbouring side
+
+def calc_voxel_neighbours(points: np.ndarray, # Nx3 float32 points
+                          eps: float, # voxel side
+):
+    """
+    Hashes the points into voxels with side `eps` and finds the neighbouring occupied voxels of every voxel at the `neighbour_offsets`.
+
+    Returns:
+        tuple: The permutation that sorts the points by voxel, the voxel of every sorted point, the 3xN positions of the sorted points in their voxels in [0, 1], the start and the number of points of every voxel in the sorted points, and, for every offset, the neighbouring voxel of every voxel or -1 if it isn't occupied.
+    """
+    scaled_points = points / np.float32(eps)
+    voxels = np.floor(scaled_points)
+    positions_in_voxels = scaled_points - voxels
+    voxels = voxels.astype(np.int64)
+    # shift the voxels so that the neighbouring keys of all the voxels are non-negative and don't wrap around
+    voxels -= voxels.min(axis=0) - 1
+    dims = voxels.max(axis=0) + 2
+    keys = (voxels[:, 0] * dims[1] + voxels[:, 1]) * dims[2] + voxels[:, 2]
+    order = np.argsort(keys, kind='stable')
+    voxel_keys, voxel_starts, voxel_counts = np.unique(keys[order], return_index=True, return_counts=True)
+    point_voxels = np.repeat(np.arange(len(voxel_keys)), voxel_counts)
+
+    neighbour_voxels = []
+    for dx, dy, dz in neighbour_offsets:
+        neighbour_keys = voxel_keys + (dx * dims[1] + dy) * dims[2] + dz
+        positions = np.minimum(np.searchsorted(voxel_keys, neighbour_keys), len(voxel_keys) - 1)
+        neighbour_voxels.append(np.where(voxel_keys[positions] == neighbour_keys, positions, -1))
+    return order, point_voxels, np.ascontiguousarray(positions_in_voxels[order].T), voxel_starts, voxel_counts, neighbour_voxels
+
+def calc_neighbour_pairs(coordinates: np.ndarray, # 3xN float32 coordinates of the points sorted by voxel, one contiguous row per axis
+                         eps: float, # maximum distance between neighbours
+                         point_voxels: np.ndarray, # voxel of every point
+                         positions_in_voxels: np.ndarray, # 3xN positions of the points in their voxels in [0, 1]
+                         voxel_starts: np.ndarray, # start of every voxel in the points
+                         voxel_counts: np.ndarray, # number of points in every voxel
+                         offset: tuple, # offset of the neighbouring voxels
+                         neighbour_voxels: np.ndarray, # neighbouring voxel of every voxel at the offset, -1 if not occupied
+):
+    """
+    Finds the point pairs within `eps` between the points and the points of their neighbouring voxels at an offset. Every point is compared with the k-th point of its neighbouring voxel at once, for increasing k, so that the work is proportional to the number of compared pairs. For non-zero offsets, the points farther than `eps` from the neighbouring voxel, and the points of the neighbouring voxels farther than `eps` from the voxel, are skipped.
+
+    Returns:
+        tuple: Neighbour counts of the points, including the points themselves for the zero offset, and the neighbour pairs `(i, j)`.
+    """
+    number_of_points = coordinates.shape[1]
+    same_voxel = offset == (0, 0, 0)
+    if same_voxel:
+        i, candidates, starts, counts = np.arange(number_of_points), np.arange(number_of_points), voxel_starts, voxel_counts
+    else:
+        # squared distances from the points to the faces, edges, or corners shared with the neighbouring voxels, in voxel units
+        gaps_to_neighbours = sum((1 - positions_in_voxels[axis] if d > 0 else positions_in_voxels[axis]) ** 2 for axis, d in enumerate(offset) if d != 0)
+        gaps_from_neighbours = sum((positions_in_voxels[axis] if d > 0 else 1 - positions_in_voxels[axis]) ** 2 for axis, d in enumerate(offset) if d != 0)
+        # a small tolerance for the rounding of the positions
+        i = np.flatnonzero(gaps_to_neighbours <= 1.0001)
+        candidates = np.flatnonzero(gaps_from_neighbours <= 1.0001)
+        counts = np.bincount(point_voxels[candidates], minlength=len(voxel_counts))
+        starts = np.cumsum(counts) - counts
+    i = i[neighbour_voxels[point_voxels[i]] >= 0]
+    neighbours = neighbour_voxels[point_voxels[i]]
+    starts, counts = starts[neighbours], counts[neighbours]
+    # in the voxel itself, every point is only compared with the points after it
+    first_k = i - starts + 1 if same_voxel else np.zeros(len(i), dtype=np.int64)
+    squared_eps = np.float32(eps) ** 2
+    x, y, z = coordinates
+    all_i, all_j = [], []
+    for k in range(int(counts.max()) if len(counts) else 0):
+        active = (counts > k) & (first_k <= k)
+        if k > 0:
+            # points whose neighbouring voxel has no more candidates are done
+            remaining = counts > k
+            i, starts, counts, first_k, active = i[remaining], starts[remaining], counts[remaining], first_k[remaining], active[remaining]
+        compared_i = i[active]
+        j = candidates[starts[active] + k]
+        dx, dy, dz = x[compared_i] - x[j], y[compared_i] - y[j], z[compared_i] - z[j]
+        within = dx * dx + dy * dy + dz * dz <= squared_eps
+        all_i.append(compared_i[within])
+        all_j.append(j[within])
+    i, j = np.concatenate(all_i) if all_i else np.empty(0, dtype=np.int64), np.concatenate(all_j) if all_j else np.empty(0, dtype=np.int64)
+    neighbour_counts = np.bincount(i, minlength=number_of_points) + np.bincount(j, minlength=number_of_points)
+    # every point is a neighbour of itself
+    if same_voxel: neighbour_counts += 1
+    return neighbour_counts, i, j
+
+def find_roots(parent: np.ndarray):
+    # pointer jumping until every point points to its root
+    while True:
+        grandparent = parent[parent]
+        if np.array_equal(grandparent, parent): return parent
+        parent = grandparent
+
+def union(parent: np.ndarray, i: np.ndarray, j: np.ndarray):
+    """
+    Connects the components of the point pairs, every component hooks to its smallest point index.
+
+    Returns:
+        np.ndarray: The root of every point.
+    """
+    parent = find_roots(parent)
+    while True:
+        root_i, root_j = parent[i], parent[j]
+        different = root_i != root_j
+        if not np.any(different): return parent
+        i, j, root_i, root_j = i[different], j[different], root_i[different], root_j[different]
+        np.minimum.at(parent, np.maximum(root_i, root_j), np.minimum(root_i, root_j))
+        parent = find_roots(parent)
+
+def voxel_dbscan(points: np.ndarray, # Nx3 or Nx4
+                 eps: float, # maximum radius to search
+                 min_samples: int, # minimum number of neighbours of a core point, including itself
+                 workers: int = 1, # number of threads the neighbouring offsets are processed with
+    ):
+    number_of_points = len(points)
+    labels = np.full(number_of_points, -1, dtype=np.int32)
+    points = np.asarray(points[:, :3], dtype=np.float32)
+    # points that are not finite are noise
+    finite_indices = np.flatnonzero(np.all(np.isfinite(points), axis=1))
+    if len(finite_indices) == 0: return labels
+
+    order, point_voxels, positions_in_voxels, voxel_starts, voxel_counts, neighbour_voxels = calc_voxel_neighbours(points[finite_indices], eps)
+    # gathering the coordinates of every axis from contiguous rows is much faster than gathering the points
+    sorted_coordinates = np.ascontiguousarray(points[finite_indices][order].T)
+    number_of_sorted_points = len(order)
+
+    # find the neighbours at every offset
+    process_offset = lambda offset_index: calc_neighbour_pairs(sorted_coordinates, eps, point_voxels, positions_in_voxels, voxel_starts, voxel_counts, neighbour_offsets[offset_index], neighbour_voxels[offset_index])
+    if workers > 1:
+        with ThreadPoolExecutor(workers) as executor: results = list(executor.map(process_offset, range(len(neighbour_offsets))))
+    else:
+        results = [process_offset(offset_index) for offset_index in range(len(neighbour_offsets))]
+    neighbour_counts = np.sum([result[0] for result in results], axis=0)
+    i = np.concatenate([result[1] for result in results])
+    j = np.concatenate([result[2] for result in results])
+    del results
+
+    # connect the core points
+    core = neighbour_counts >= min_samples
+    core_i, core_j = core[i], core[j]
+    both_core = core_i & core_j
+    # the union-find runs over the sorted points, whose neighbours are close in memory
+    parent = union(np.arange(number_of_sorted_points), i[both_core], j[both_core])
+    # the clusters are numbered in the order of their smallest point index, like the clusters of Open3D are numbered in the order of their first core point
+    smallest_index = np.full(number_of_sorted_points, number_of_sorted_points, dtype=np.int64)
+    np.minimum.at(smallest_index, parent[core], order[core])
+    roots = np.flatnonzero(smallest_index < number_of_sorted_points)
+    roots = roots[np.argsort(smallest_index[roots])]
+    cluster_of_root = np.full(number_of_sorted_points, -1, dtype=np.int32)
+    cluster_of_root[roots] = np.arange(len(roots), dtype=np.int32)
+    sorted_labels = np.full(number_of_sorted_points, -1, dtype=np.int32)
+    sorted_labels[core] = cluster_of_root[parent[core]]
+
+    # border points join the cluster with the smallest label among their core neighbours
+    border_i = np.concatenate([i[core_j & ~core_i], j[core_i & ~core_j]])
+    border_j = np.concatenate([j[core_j & ~core_i], i[core_i & ~core_j]])
+    if len(border_i):
+        border_labels = np.full(number_of_sorted_points, np.iinfo(np.int32).max, dtype=np.int32)
+        np.minimum.at(border_labels, border_i, sorted_labels[border_j])
+        is_border = border_labels != np.iinfo(np.int32).max
+        sorted_labels[is_border] = border_labels[is_border]
+
+    labels[finite_indices[order]] = sorted_labels
+    return labels
@@ -0,0 +1,132 @@
+import os
+import json
+import struct
+import numpy as np
+
+"""
+Versioned binary file format for the background filters (DHistDPP, STDF).
+
+Layout:
+    - magic `LGBF` (4 bytes), format version (uint16), header size (uint32), all little-endian,
+    - JSON header with the algorithm name, the metadata the filter was made with (bins, range, etc.), and the dtype, shape, and offset of every array,
+    - the raw arrays, each aligned to 64 bytes so that they can be memory-mapped.
+
+The densities are stored quantized to uint8 over `[0, density_scale]`, which is precise enough for thresholding, and loading memory-maps the arrays instead of reading them.
+"""
+
+magic = b'LGBF'
+format_version = 1
+file_extension = '.lgbf'
+alignment = 64
+
+def quantize_densities(densities: np.ndarray, density_scale: float) -> np.ndarray:
+    """
+    Quantizes densities in `[0, density_scale]` to uint8, larger densities saturate.
+    """
+    return np.rint(np.clip(densities / density_scale, 0, 1) * 255).astype(np.uint8)
+
+def dequantize_densities(quantized_densities: np.ndarray, density_scale: float) -> np.ndarray:
+    """
+    Converts uint8 quantized densities back to float32 densities.
+    """
+    return quantized_densities.astype(np.float32) * np.float32(density_scale / 255)
+
+def quantize_threshold(background_density_threshold: float, density_scale: float) -> float:
+    """
+    Scales a density threshold to the range of the quantized densities, so that `quantized_density < quantized_threshold` matches `density < threshold` up to half a quantization step. The threshold isn't rounded, so that empty bins stay below any positive threshold.
+    """
+    return float(np.clip(background_density_threshold / density_scale, 0, 1) * 255)
+
+def save_filter(filename: str, algorithm: str, metadata: dict, arrays: dict) -> str:
+    """
+    Saves a filter.
+
+    Args:
+        filename (str): Path of the file, the extension is replaced with `.lgbf`.
+        algorithm (str): Name of the algorithm the filter belongs to.
+        metadata (dict): JSON serializable parameters the filter was made with.
+        arrays (dict): Arrays of the filter by name.
+
+    Returns:
+        str: Path of the saved file.
+    """
+    filename = os.path.splitext(filename)[0] + file_extension
+
+    # compute the array offsets relative to the start of the data section
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    array_entries = dict()
+    offset = 0
+    for name, array in arrays.items():
+        array_entries[name] = dict(dtype=array.dtype.str, shape=list(array.shape), offset=offset)
+        offset += -(-array.nbytes // alignment) * alignment
+    header = json.dumps(dict(algorithm=algorithm, metadata=metadata, arrays=array_entries)).encode('utf-8')
+    # pad the header so that the data section is aligned
+    prefix_size = len(magic) + 2 + 4
+    header += b' ' * (-(prefix_size + len(header)) % alignment)
+
+    with open(filename, 'wb') as f:
+        f.write(magic + struct.pack('<HI', format_version, len(header)) + header)
+        for name, array in arrays.items():
+            f.write(array.tobytes())
+            f.write(b'\0' * (-array.nbytes % alignment))
+    return filename
+
+def read_header(filename: str) -> dict:
+    """
+    Reads the header of a filter file.
+
+    Args:
+        filename (str): Path of the file, the extension is replaced with `.lgbf`.
+
+    Returns:
+        dict: The header with `version`, `algorithm`, `metadata`, `arrays`, and `data_offset` keys, or None if the file doesn't exist or isn't a filter file.
+    """
+    filename = os.path.splitext(filename)[0] + file_extension
+    try:
+        with open(filename, 'rb') as f:
+            if f.read(len(magic)) != magic: return None
+            version, header_size = struct.unpack('<HI', f.read(6))
+            if version > format_version: return None
+            header = json.loads(f.read(header_size).decode('utf-8'))
+    except (OSError, ValueError, struct.error):
+        return None
+    header['version'] = version
+    header['data_offset'] = len(magic) + 6 + header_size
+    return header
+
+def load_filter(filename: str, algorithm: str):
+    """
+    Loads a filter, the arrays are memory-mapped read-only.
+
+    Args:
+        filename (str): Path of the file, the extension is replaced with `.lgbf`.
+        algorithm (str): Name of the algorithm the filter must belong to.
+
+    Returns:
+        tuple: The metadata and the arrays by name, or None if the file doesn't exist or isn't a filter of the algorithm.
+    """
+    header = read_header(filename)
+    if header is None or header['algorithm'] != algorithm: return None
+    filename = os.path.splitext(filename)[0] + file_extension
+    arrays = dict()
+    for name, entry in header['arrays'].items():
+        shape = tuple(entry['shape'])
+        if int(np.prod(shape)) == 0: arrays[name] = np.zeros(shape, dtype=entry['dtype'])
+        else: arrays[name] = np.memmap(filename, dtype=entry['dtype'], mode='r', offset=header['data_offset'] + entry['offset'], shape=shape)
+    return header['metadata'], arrays
+
+def find_mismatched_metadata(filename: str, expected_metadata: dict) -> dict:
+    """
+    Compares the metadata of a filter file with the expected parameters.
+
+    Args:
+        filename (str): Path of the file, the extension is replaced with `.lgbf`.
+        expected_metadata (dict): Expected parameters.
+
+    Returns:
+        dict: Mismatched parameters as `{name: (value in file, expected value)}`.
+    """
+    header = read_header(filename)
+    if header is None: return dict()
+    metadata = header['metadata']
+    return {key: (metadata[key], value) for key, value in expected_metadata.items() if key in metadata and metadata[key] != value}
@@ -4,7 +4,7 @@ from liguard.gui.logger_gui import Logger
 from liguard.algo.utils import AlgoType, algo_func, get_algo_params, make_key
 algo_type = AlgoType.post
 
-@algo_func(required_data=['current_label_list', 'current_calib_data'])
+@algo_func(required_data=['current_label_list', 'current_calib_data'], stateless=True)
 def Fuse2DPredictedBBoxes(data_dict: dict, cfg_dict: dict, logger: Logger):
     """
     Fuses bbox_2d information among ModalityA and ModalityB.
@@ -161,7 +161,7 @@ def GenerateKDTreePastTrajectory(data_dict: dict, cfg_dict: dict, logger: Logger
     - bbox_3d dict in data_dict['current_label_list'][<index>].
     
     Operation:
-    - It uses KDTree to track objects.
+    - It matches the centers of the objects to the centers of the objects in the previous frames with the Hungarian algorithm over all the pairwise distances, i.e. what querying a KDTree for all the neighbours gave.
     - Stores the past trajectory of objects in data_dict['current_label_list'][<index>]['bbox_3d']['past_trajectory'].
 
     Args:
@@ -185,8 +185,8 @@ def GenerateKDTreePastTrajectory(data_dict: dict, cfg_dict: dict, logger: Logger
 
     # imports
     import numpy as np
-    from scipy.spatial import KDTree
     from scipy.optimize import linear_sum_assignment
+    from liguard.lbl.label_table import LabelTable
 
     # algo name and dict keys
     processed_frames_key = make_key(algo_name, 'processed_frames')
@@ -197,83 +197,66 @@ def GenerateKDTreePastTrajectory(data_dict: dict, cfg_dict: dict, logger: Logger
         logger.log(f'Frame {data_dict["current_frame_index"]} already processed, skipping ...', Logger.WARNING)
         return
     
-    current_bbox_3d_labels = []
-    for i, label_dict in enumerate(data_dict['current_label_list']):
-        if 'bbox_3d' not in label_dict: continue
-        bbox_3d_dict = label_dict['bbox_3d']
-        current_bbox_3d_labels.append([i, bbox_3d_dict])
+    # the centers are gathered from the label table, only the dicts of the matched labels are built
+    label_table = LabelTable.from_list(data_dict['current_label_list'])
+    data_dict['current_label_list'] = label_table
+    bbox_3d_indices = np.flatnonzero(label_table.has_bbox_3d)
     
     # if no bbox_3d found in current frame, skip
-    if len(current_bbox_3d_labels) == 0:
+    if len(bbox_3d_indices) == 0:
         logger.log('No bbox_3d found in current frame', Logger.DEBUG)
         return
     
+    # the history keeps the centers and the past trajectories of the bbox_3ds of every frame
+    current_bbox_3d_xyz_center = label_table.get_column('xyz_center')[bbox_3d_indices]
+    current_past_trajectories = [None] * len(bbox_3d_indices)
+    
     # create history window if it does not exist
     if bbox_history_window_key not in data_dict:
-        data_dict[bbox_history_window_key] = [current_bbox_3d_labels]
+        data_dict[bbox_history_window_key] = [(current_bbox_3d_xyz_center, current_past_trajectories)]
         return
-
-    # Create a KDTree for points_list
-    all_history_bbox_3d_xyz_centers = []
-    for bbox_3d_labels in data_dict[bbox_history_window_key]:
-        xyz_centers = np.array([bbox_3d_dict['xyz_center'] for _, bbox_3d_dict in bbox_3d_labels])
-        all_history_bbox_3d_xyz_centers.append(xyz_centers)
-    current_bbox_3d_xyz_center = np.array([bbox_3d_dict['xyz_center'] for _, bbox_3d_dict in current_bbox_3d_labels])
     
-    # ---------------------- KDTree Tracking ---------------------- #
-    kd_tree = KDTree(current_bbox_3d_xyz_center)
-    already_matched = []
+    # ---------------------- Nearest Center Tracking ---------------------- #
+    already_matched = np.zeros(len(bbox_3d_indices), dtype=bool)
 
-    for history_idx, xyz_centers in enumerate(all_history_bbox_3d_xyz_centers):
-        cost_matrix = np.zeros((len(xyz_centers), len(current_bbox_3d_xyz_center)))
-
-        for i, point in enumerate(xyz_centers):
-            distances, indices = kd_tree.query(point, k=len(current_bbox_3d_xyz_center))
-            cost_matrix[i, indices] = distances
+    for xyz_centers, past_trajectories in data_dict[bbox_history_window_key]:
+        # distances between all the history and current centers at once
+        cost_matrix = np.linalg.norm(xyz_centers[:, None, :].astype(np.float64) - current_bbox_3d_xyz_center[None, :, :], axis=2)
 
         # Use the Hungarian algorithm (linear_sum_assignment) to find the optimal matching
         row_indices, col_indices = linear_sum_assignment(cost_matrix)
 
-        # Output the matching result
-        matches_kd_tree = list(zip(row_indices, col_indices))
-
-        for i, j in matches_kd_tree:
+        for i, j in zip(row_indices, col_indices):
             # check if the current bbox is already matched
-            if j in already_matched: continue
+            if already_matched[j]: continue
             
             # check if the distance is within the threshold
             if cost_matrix[i, j] > params['max_match_distance']: continue
 
-            # get the bbox_3d dict
-            last_bbox_3d = data_dict[bbox_history_window_key][history_idx][i][1]
-            current_bbox_3d = current_bbox_3d_labels[j][1]
-
             # store the past trajectory
-            if 'past_trajectory' in last_bbox_3d:
-                current_bbox_3d['past_trajectory'] = np.append(last_bbox_3d['past_trajectory'], [last_bbox_3d['xyz_center']], axis=0)
-            else:
-                current_bbox_3d['past_trajectory'] = np.array([last_bbox_3d['xyz_center']], dtype=np.float32)
+            if past_trajectories[i] is not None: past_trajectory = np.append(past_trajectories[i], [xyz_centers[i]], axis=0)
+            else: past_trajectory = np.array([xyz_centers[i]], dtype=np.float32)
+            current_past_trajectories[j] = past_trajectory
+            label_dict = label_table[bbox_3d_indices[j]]
+            label_dict['bbox_3d']['past_trajectory'] = past_trajectory
 
             # add text info
-            if 'text_info' not in data_dict['current_label_list'][current_bbox_3d_labels[j][0]]: data_dict['current_label_list'][current_bbox_3d_labels[j][0]]['text_info'] = f'traj-: {len(current_bbox_3d["past_trajectory"])}'
-            else: data_dict['current_label_list'][current_bbox_3d_labels[j][0]]['text_info'] += f' | traj-: {len(current_bbox_3d["past_trajectory"])}'
-
-            # update the bbox_3d dict
-            data_dict['current_label_list'][current_bbox_3d_labels[j][0]]['bbox_3d'] = current_bbox_3d
+            if 'text_info' not in label_dict: label_dict['text_info'] = f'traj-: {len(past_trajectory)}'
+            else: label_dict['text_info'] += f' | traj-: {len(past_trajectory)}'
 
             # mark the current bbox as matched
-            already_matched.append(j)
-    # ---------------------- KDTree Tracking ---------------------- #
+            already_matched[j] = True
+    # ---------------------- Nearest Center Tracking ---------------------- #
 
     # keep record of processed frames
     if processed_frames_key not in data_dict: data_dict[processed_frames_key] = [data_dict['current_frame_index']]
     else: data_dict[processed_frames_key].append(data_dict['current_frame_index'])
     
-    # update the last_bbox_3d_labels
-    data_dict[bbox_history_window_key].insert(0, current_bbox_3d_labels)
+    # update the history window
+    data_dict[bbox_history_window_key].insert(0, (current_bbox_3d_xyz_center, current_past_trajectories))
     data_dict[bbox_history_window_key] = data_dict[bbox_history_window_key][:params['history_size']]
 
-@algo_func(required_data=['current_label_list'])
+@algo_func(required_data=['current_label_list'], stateless=True)
 def GenerateCubicSplineFutureTrajectory(data_dict: dict, cfg_dict: dict, logger: Logger):
     """
     Generates future trajectory using cubic spline interpolation.
@@ -333,7 +316,7 @@ def GenerateCubicSplineFutureTrajectory(data_dict: dict, cfg_dict: dict, logger:
         else: label_dict['text_info'] += f' | traj+: locked'
     # ---------------------- Cubic Spline Interpolation ---------------------- #
 
-@algo_func(required_data=['current_label_list'])
+@algo_func(required_data=['current_label_list'], stateless=True)
 def GeneratePolyFitFutureTrajectory(data_dict: dict, cfg_dict: dict, logger: Logger):
     """
     Generates future trajectory using polynomial fit.
@@ -456,7 +439,7 @@ def GenerateVelocityFromTrajectory(data_dict: dict, cfg_dict: dict, logger: Logg
     if processed_frames_key not in data_dict: data_dict[processed_frames_key] = [data_dict['current_frame_index']]
     else: data_dict[processed_frames_key].append(data_dict['current_frame_index'])
 
-@algo_func(required_data=['current_point_cloud_numpy', 'current_label_list'])
+@algo_func(required_data=['current_point_cloud_numpy', 'current_label_list'], stateless=True)
 def create_per_object_pcdet_dataset(data_dict: dict, cfg_dict: dict, logger: Logger):
     """
     Creates a per-object PCDet dataset by extracting object point clouds and labels from the input data.
@@ -483,7 +466,8 @@ def create_per_object_pcdet_dataset(data_dict: dict, cfg_dict: dict, logger: Log
     # imports
     import os
     import numpy as np
-    import open3d as o3d
+    from liguard.lbl.label_table import LabelTable
+    from liguard.pcd.utils import points_in_boxes
     
     # Get required data from data_dict
     current_point_cloud_path = data_dict['current_point_cloud_path']
@@ -502,24 +486,20 @@ def create_per_object_pcdet_dataset(data_dict: dict, cfg_dict: dict, logger: Log
     lbl_output_dir = os.path.join(output_path, 'label')
     os.makedirs(lbl_output_dir, exist_ok=True)
     
-    idx = 0
-    for label_dict in current_label_list:
-        if 'bbox_3d' not in label_dict: continue
+    # find the points inside the bounding boxes of all the labels at once
+    current_label_table = LabelTable.from_list(current_label_list)
+    bbox_3d_indices = np.flatnonzero(current_label_table.has_bbox_3d)
+    inside_points_list = points_in_boxes(current_point_cloud_numpy, current_label_table.get_column('xyz_center')[bbox_3d_indices], current_label_table.get_column('xyz_extent')[bbox_3d_indices], current_label_table.get_column('xyz_euler_angles')[bbox_3d_indices], return_indices=True)
+    
+    for idx, (label_idx, inside_points) in enumerate(zip(bbox_3d_indices, inside_points_list)):
+        label_dict = current_label_table[label_idx]
         
         # Get bounding box center, extent, and euler angles
-        bbox_center = label_dict['bbox_3d']['xyz_center'].copy()
+        bbox_center = np.array(label_dict['bbox_3d']['xyz_center'])
         bbox_extent = label_dict['bbox_3d']['xyz_extent']
         bbox_euler_angles = label_dict['bbox_3d']['xyz_euler_angles']
-        R = o3d.geometry.OrientedBoundingBox.get_rotation_matrix_from_xyz(bbox_euler_angles)
-        
-        # Create an oriented bounding box
-        try: rotated_bbox = o3d.geometry.OrientedBoundingBox(bbox_center, R, bbox_extent)
-        except:
-            logger.log(f'Error in creating oriented bounding box for object {idx}', Logger.WARNING)
-            continue
         
         # Get points within the bounding box
-        inside_points = rotated_bbox.get_point_indices_within_bounding_box(o3d.utility.Vector3dVector(current_point_cloud_numpy[:, :3]))
         object_point_cloud = current_point_cloud_numpy[inside_points]
         
         # Center the point cloud
@@ -541,10 +521,8 @@ def create_per_object_pcdet_dataset(data_dict: dict, cfg_dict: dict, logger: Log
             if 'class' in label_dict: lbl_str += label_dict['class']
             else: lbl_str += 'Unknown'
             f.write(lbl_str)
-        
-        idx += 1
 
-@algo_func(required_data=['current_point_cloud_numpy', 'current_label_list'])
+@algo_func(required_data=['current_point_cloud_numpy', 'current_label_list'], stateless=True)
 def create_pcdet_dataset(data_dict: dict, cfg_dict: dict, logger: Logger):
     """
     Creates a PCDet dataset by extracting point clouds and labels from the input data.
@@ -4,7 +4,7 @@ from liguard.gui.logger_gui import Logger
 from liguard.algo.utils import AlgoType, algo_func, get_algo_params, make_key
 algo_type = AlgoType.pre
 
-@algo_func(required_data=['current_point_cloud_numpy'])
+@algo_func(required_data=['current_point_cloud_numpy'], stateless=True)
 def remove_nan_inf_allzero_from_pcd(data_dict: dict, cfg_dict: dict, logger: Logger):
     """
     Removes NaN values from the point cloud.
@@ -42,7 +42,7 @@ def remove_nan_inf_allzero_from_pcd(data_dict: dict, cfg_dict: dict, logger: Log
     # update data_dict
     data_dict['current_point_cloud_numpy'] = current_point_cloud_numpy
 
-@algo_func(required_data=[])
+@algo_func(required_data=[], stateless=True)
 def manual_calibration(data_dict: dict, cfg_dict: dict, logger: Logger):
     """
     Manually calibrates the point cloud data.
@@ -68,6 +68,7 @@ def manual_calibration(data_dict: dict, cfg_dict: dict, logger: Logger):
 
     # imports
     import numpy as np
+    from liguard.calib.utils import get_lidar_to_image
     
     # parse params and add to data_dict
     try:
@@ -75,6 +76,7 @@ def manual_calibration(data_dict: dict, cfg_dict: dict, logger: Logger):
         R0_rect = np.array([float(x) for x in params['rotation_matrix_4x4'].split(' ')], dtype=np.float32).reshape(4, 4)
         P2 = np.array([float(x) for x in params['cam_intrinsic_3x4'].split(' ')], dtype=np.float32).reshape(3, 4)
         calib = {'Tr_velo_to_cam': Tr_velo_to_cam, 'R0_rect': R0_rect, 'P2': P2}
+        get_lidar_to_image(calib)
         data_dict['current_calib_path'] = None
         data_dict['current_calib_data'] = calib
     except Exception as e:
@@ -1,6 +1,8 @@
 from liguard.gui.logger_gui import Logger
 from enum import Enum, auto
 
+import numpy as np
+
 class AlgoType(Enum):
     """
     An enumeration of the categories of algorithms.
@@ -12,15 +14,71 @@ class AlgoType(Enum):
     label = auto()
     post = auto()
 
-def algo_func(required_data: list = []):
+def algo_func(required_data: list = [], stateless: bool = False, batchable: bool = False):
     """
     A decorator to specify the required data for an algorithm.
+
+    Args:
+        required_data (list): The keys that must be present in the data dictionary.
+        stateless (bool): True if the algorithm only depends on the current frame, i.e. it doesn't keep state across frames in the data dictionary (trajectories, background filter gathering, etc.) or hold resources that must not be duplicated (loaded models, sockets, etc.). Stateless algorithms can process frames concurrently.
+        batchable (bool): True if the algorithm can also be called with a list of data dictionaries, one per frame in order, instead of a single one. It then processes all the frames at once, e.g. in a single forward pass of a model, writes the outputs of each frame to its own data dictionary, and keeps its state in the first one. The bulk processor calls batchable algorithms on batches of frames.
     """
     def decorator(func):
         func.required_data = required_data
+        func.stateless = stateless
+        func.batchable = batchable
         return func
     return decorator
 
+def fuse_processes(processes: list, built_in_modules: dict) -> list:
+    """
+    Replaces runs of consecutive built-in processes with their fused counterparts. The fusions are listed in the `fused_processes` dictionary of the algorithm module as `{(process_name, ...): fused_process_name}`.
+
+    Args:
+        processes (list): The enabled processes, in order of priority.
+        built_in_modules (dict): The `__dict__` of the built-in algorithm module of the processes.
+
+    Returns:
+        list: The processes with the fusions applied.
+    """
+    fused_processes = built_in_modules.get('fused_processes', dict())
+    fused = []
+    i = 0
+    while i < len(processes):
+        for names, fused_name in fused_processes.items():
+            run = processes[i:i + len(names)]
+            # custom algorithms with the same names aren't fused
+            if len(run) == len(names) and all(process is built_in_modules.get(name) for process, name in zip(run, names)):
+                fused.append(built_in_modules[fused_name])
+                i += len(names)
+                break
+        else:
+            fused.append(processes[i])
+            i += 1
+    return fused
+
+# bounds of the lidar crop configurations, see `get_crop_bounds`
+crop_bounds_cache = dict()
+
+def get_crop_bounds(cfg_dict: dict) -> tuple:
+    """
+    Gets the bounds of the lidar `crop` algorithm as arrays. They're converted once per configuration and cached, so the algorithms that compare to them on every frame don't convert the configuration lists every time.
+
+    Args:
+        cfg_dict (dict): The dictionary containing the configuration data.
+
+    Returns:
+        tuple: (3,) float64 min_xyz and max_xyz arrays, they must not be modified.
+    """
+    crop_params = cfg_dict['proc']['lidar']['crop']
+    key = (tuple(crop_params['min_xyz']), tuple(crop_params['max_xyz']))
+    if key not in crop_bounds_cache:
+        min_xyz, max_xyz = np.array(key[0], dtype=np.float64), np.array(key[1], dtype=np.float64)
+        min_xyz.flags.writeable = False
+        max_xyz.flags.writeable = False
+        crop_bounds_cache[key] = (min_xyz, max_xyz)
+    return crop_bounds_cache[key]
+
 def make_key(algo_name: str, key: str) -> str:
     """
     Creates a standard key for the data dictionary used in LiGuard.
@@ -92,6 +150,48 @@ def gather_point_clouds(data_dict: dict, cfg_dict: dict, key: str, count: int, g
     return gathering_completed
 
 
+def accumulate_point_clouds(data_dict: dict, cfg_dict: dict, key: str, count: int, accumulator, global_index_key: str = None):
+    """
+    Accumulates point clouds into an accumulator until a specified count is reached. Unlike `gather_point_clouds`, the point clouds are not kept, only the number of accumulated frames and their indices.
+    
+    Args:
+        data_dict (dict): The dictionary containing the data.
+        cfg_dict (dict): The dictionary containing the configuration data.
+        key (str): The key to store the accumulated frames count in the data dictionary.
+        count (int): The desired count of point clouds to accumulate.
+        accumulator: An object with an `update(point_cloud)` method, such as `STDFAccumulator` or `DHistDPPAccumulator`.
+        global_index_key (str, optional): The key to store the indices of the accumulated frames in the data dictionary. Defaults to None.
+    
+    Returns:
+        bool: True if the accumulation is completed, False otherwise.
+    """
+    logger: Logger = data_dict['logger']
+    
+    accumulation_not_started = key not in data_dict
+    if accumulation_not_started:
+        data_dict[key] = 0
+        logger.log(f'Accumulating {count} point clouds', Logger.INFO)
+    
+    if global_index_key is None:
+        global_index_key = f'{key}_accumulated_frames_indices'
+    if global_index_key not in data_dict:
+        data_dict[global_index_key] = []
+    
+    # Check if accumulation is completed
+    accumulation_completed = data_dict[key] >= count
+    point_cloud_is_present = 'current_point_cloud_numpy' in data_dict
+    point_cloud_is_novel = data_dict['current_frame_index'] not in data_dict[global_index_key]
+    
+    # Accumulate the point cloud if accumulation is not completed and the point cloud is present and novel
+    if not accumulation_completed and point_cloud_is_present and point_cloud_is_novel:
+        accumulator.update(data_dict['current_point_cloud_numpy'])
+        data_dict[key] += 1
+        data_dict[global_index_key].append(data_dict['current_frame_index'])
+    
+    accumulation_completed = data_dict[key] >= count
+    return accumulation_completed
+
+
 def combine_gathers(data_dict: dict, cfg_dict: dict, key: str, gather_keys: list):
     """
     Combines multiple gathers into a single gather.
@@ -47,4 +47,6 @@ Handler File Structure
         #     calib['Tr_velo_to_cam'] = ? # 4x4 transformation matrix from lidar to camera
 
         return calib # make sure to return the calibration data dictionary, even if it is empty
-"""
\ No newline at end of file
+
+The calibration file reader adds the composed lidar to image projection, `P2 @ R0_rect @ Tr_velo_to_cam`, to the returned dictionary as `lidar_to_image` (3x4, float32) once per file. Algorithms should project with `get_lidar_to_image` and `project_points_to_image` from `calib/utils.py` instead of composing the matrices themselves.
+"""
@@ -1,8 +1,12 @@
 import os
 from liguard.gui.config_gui import resolve_for_application_root, resolve_for_default_workspace
 import glob
-import time
+import hashlib
 import threading
+from collections import OrderedDict
+
+from liguard.frame_cache import FrameCache, get_cache_cfg
+from liguard.calib.utils import get_lidar_to_image, get_inverse
 
 calib_dir = os.path.dirname(os.path.realpath(__file__))
 supported_calib_types = [clb_handler.split('_')[1].replace('.py','') for clb_handler in os.listdir(calib_dir) if 'handler' in clb_handler]
@@ -54,11 +58,18 @@ class FileIO:
         file_basenames.sort(key=lambda file_name: int(''.join(filter(str.isdigit, file_name))))
         self.files_basenames = file_basenames[self.clb_start_idx:self.clb_end_idx][self.global_zero:]
         
-        # read the calibration files in async mode
-        self.data_lock = threading.Lock()
-        self.data = []
-        self.stop = threading.Event()
-        threading.Thread(target=self.__async_read_fn__).start()
+        # identical calibration files are parsed once and share one calibration object, keyed by the hash of their contents
+        self.interned = OrderedDict()
+        self.max_interned = int(get_cache_cfg(cfg)['max_frames'])
+        self.interned_lock = threading.Lock()
+        
+        # a static calibration is read once from the first calibration file and used for every frame
+        self.static = cfg['data']['calib'].get('static', False)
+        if self.static:
+            self.static_frame = self.__read_frame__(0) if len(self.files_basenames) > 0 else None
+            self.cache = None
+        # prefetch the calibration files around the requested index
+        else: self.cache = FrameCache(self.__read_frame__, len(self.files_basenames), cfg)
         
     def get_abs_path(self, idx: int):
         """
@@ -73,24 +84,43 @@ class FileIO:
         clb_path = os.path.join(self.clb_dir, self.files_basenames[idx] + self.clb_ext)
         return clb_path
     
-    def __async_read_fn__(self):
+    def __read_frame__(self, idx: int):
         """
-        Asynchronously read all the calibration files.
+        Read the calibration file at the specified index, used by the prefetch cache.
+
+        Args:
+            idx (int): Index of the calibration file.
+
+        Returns:
+            tuple: Tuple containing the absolute path of the calibration file and the calibration data.
         """
-        for idx in range(len(self.files_basenames)):
-            if self.stop.is_set(): break
-            clb_abs_path = self.get_abs_path(idx)
-            calib = self.reader(clb_abs_path)
-            with self.data_lock: self.data.append((clb_abs_path, calib))
-            time.sleep(self.cfg['threads']['io_sleep'])
+        clb_abs_path = self.get_abs_path(idx)
+        try:
+            with open(clb_abs_path, 'rb') as f: key = hashlib.blake2b(f.read(), digest_size=16).digest()
+        except OSError:
+            # let the handler deal with missing files
+            return (clb_abs_path, self.reader(clb_abs_path))
+        with self.interned_lock:
+            if key in self.interned:
+                self.interned.move_to_end(key)
+                return (clb_abs_path, self.interned[key])
+        calib = self.reader(clb_abs_path)
+        # compose the projection and the inverses once per distinct calibration instead of once per use
+        if calib and 'P2' in calib and 'Tr_velo_to_cam' in calib: get_lidar_to_image(calib)
+        if calib and 'Tr_velo_to_cam' in calib and calib['Tr_velo_to_cam'].shape == (4, 4): get_inverse(calib, 'Tr_velo_to_cam')
+        with self.interned_lock:
+            calib = self.interned.setdefault(key, calib)
+            while self.max_interned > 0 and len(self.interned) > self.max_interned: self.interned.popitem(last=False)
+        return (clb_abs_path, calib)
         
     def __len__(self):
         """
         Get the number of calibration files.
 
         Returns:
-            int: Number of calibration files.
+            int: Number of calibration files, or the number of frames to process for a static calibration.
         """
+        if self.static: return self.cfg['data']['count'] if self.static_frame else 0
         return len(self.files_basenames)
     
     def __getitem__(self, idx):
@@ -101,17 +131,14 @@ class FileIO:
             idx: Index of the calibration file.
 
         Returns:
-            tuple: Tuple containing the absolute path of the calibration file and the calibration data.
+            tuple: Tuple containing the absolute path of the calibration file and the calibration data, the calibration data is shared by all the frames with identical calibration files.
         """
-        try:
-            with self.data_lock: return self.data[idx]
-        except:
-            clb_abs_path = self.get_abs_path(idx)
-            calib = self.reader(clb_abs_path)
-            return (clb_abs_path, calib)
+        if self.static: return self.static_frame
+        return self.cache[idx]
         
     def close(self):
         """
-        Closes the calibration files reading thread.
+        Closes the calibration files prefetching thread and releases the cached calibrations.
         """
-        self.stop.set()
\ No newline at end of file
+        if self.cache: self.cache.close()
+        self.interned.clear()
\ No newline at end of file
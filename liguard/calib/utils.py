@@ -0,0 +1,63 @@
+import numpy as np
+
+"""
+The module utils.py contains utility functions for working with calibration data. If you think that a function can be reused in other parts of the framework, you can move it to the utils.py module.
+"""
+
+def calc_lidar_to_image(calib: dict) -> np.ndarray:
+    """
+    Compose the projection from lidar coordinates to image pixel coordinates, `P2 @ R0_rect @ Tr_velo_to_cam`.
+
+    Args:
+        calib (dict): Calibration data with `P2` (3x4), `Tr_velo_to_cam` (4x4), and optionally `R0_rect` (4x4).
+
+    Returns:
+        np.ndarray: 3x4 float32 projection matrix.
+    """
+    R0_rect = calib['R0_rect'] if 'R0_rect' in calib else np.eye(4)
+    # composed in float64 so that the float32 result is rounded once
+    lidar_to_image = np.asarray(calib['P2'], dtype=np.float64) @ np.asarray(R0_rect, dtype=np.float64) @ np.asarray(calib['Tr_velo_to_cam'], dtype=np.float64)
+    return lidar_to_image.astype(np.float32)
+
+def get_lidar_to_image(calib: dict) -> np.ndarray:
+    """
+    Get the projection from lidar coordinates to image pixel coordinates of a calibration. The matrix is composed once and cached in the calibration data as `lidar_to_image`, the calibration file reader does that when a calibration file is read.
+
+    Args:
+        calib (dict): Calibration data with `P2`, `Tr_velo_to_cam`, and optionally `R0_rect`.
+
+    Returns:
+        np.ndarray: 3x4 float32 projection matrix.
+    """
+    if 'lidar_to_image' not in calib: calib['lidar_to_image'] = calc_lidar_to_image(calib)
+    return calib['lidar_to_image']
+
+def project_points_to_image(points: np.ndarray, lidar_to_image: np.ndarray) -> np.ndarray:
+    """
+    Project lidar points onto the image plane. The 3x3 block of the projection is multiplied and its translation added directly, so no homogeneous copy of the points is made.
+
+    Args:
+        points (np.ndarray): Points with shape (N, 3+), only x, y, z are used.
+        lidar_to_image (np.ndarray): 3x4 projection matrix, see `get_lidar_to_image`.
+
+    Returns:
+        np.ndarray: Homogeneous pixel coordinates with shape (N, 3), i.e. `(u * w, v * w, w)`, `w` is positive in front of the camera.
+    """
+    pixel_coords = points[:, :3] @ lidar_to_image[:, :3].T
+    pixel_coords += lidar_to_image[:, 3]
+    return pixel_coords
+
+def get_inverse(calib: dict, key: str) -> np.ndarray:
+    """
+    Get the inverse of a square calibration matrix, e.g. `Tr_velo_to_cam`. The inverse is computed once and cached in the calibration data as `<key>_inv`.
+
+    Args:
+        calib (dict): Calibration data.
+        key (str): Key of the matrix in the calibration data.
+
+    Returns:
+        np.ndarray: Inverse of the matrix.
+    """
+    inverse_key = key + '_inv'
+    if inverse_key not in calib: calib[inverse_key] = np.linalg.inv(calib[key])
+    return calib[inverse_key]
@@ -0,0 +1,202 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+"""
+The module frame_cache.py contains a bounded, windowed prefetch cache shared by the file readers (`pcd`, `img`, `calib`, and `lbl` FileIO classes). Instead of keeping every decoded frame in memory, the cache keeps a sliding window of frames around the index last requested by the consumer: frames ahead of it are prefetched in the background for playback, a few frames behind it are kept for back-stepping, and least-recently-used frames outside the window are evicted once the frame or byte budget is exceeded.
+"""
+
+default_cache_cfg = dict(
+    max_frames=100, # maximum number of frames kept in memory per reader, 0 means no limit
+    max_megabytes=1024, # maximum memory used by the cached frames per reader in MB, 0 means no limit
+    prefetch_ahead=30, # number of frames read ahead of the current frame
+    prefetch_behind=10, # number of frames kept behind the current frame
+)
+
+def get_cache_cfg(cfg: dict) -> dict:
+    """
+    Gets the cache configuration from the pipeline configuration, falling back to defaults for missing keys.
+
+    Args:
+        cfg (dict): Pipeline configuration dictionary.
+
+    Returns:
+        dict: Cache configuration with keys `max_frames`, `max_megabytes`, `prefetch_ahead`, and `prefetch_behind`.
+    """
+    cache_cfg = dict(default_cache_cfg)
+    if 'data' in cfg and isinstance(cfg['data'].get('cache', None), dict): cache_cfg.update(cfg['data']['cache'])
+    return cache_cfg
+
+def sizeof_frame(frame) -> int:
+    """
+    Estimates the memory footprint of a frame in bytes. NumPy arrays and other columnar containers, e.g. `LabelTable`, are counted by their `nbytes`, other containers are traversed recursively, and everything else is counted as a small constant.
+
+    Args:
+        frame: Frame data, usually a tuple of (file path, decoded data).
+
+    Returns:
+        int: Estimated size in bytes.
+    """
+    if isinstance(frame, np.ndarray): return frame.nbytes
+    if hasattr(frame, 'nbytes'): return frame.nbytes + 64
+    if isinstance(frame, dict): return sum(sizeof_frame(v) for v in frame.values()) + 64
+    if isinstance(frame, (list, tuple)): return sum(sizeof_frame(v) for v in frame) + 64
+    if isinstance(frame, str): return len(frame)
+    return 64
+
+class FrameCache:
+    """
+    Bounded LRU cache with a sliding prefetch window.
+
+    Args:
+        read_fn (callable): Function that takes a frame index and returns the frame, usually a tuple of (file path, decoded data).
+        length (int): Number of frames available.
+        cfg (dict): Pipeline configuration dictionary, the cache parameters are read from `cfg['data']['cache']`.
+
+    Attributes:
+        read_fn (callable): Function to read a frame at an index.
+        length (int): Number of frames available.
+        max_frames (int): Maximum number of cached frames, 0 means no limit.
+        max_bytes (int): Maximum number of cached bytes, 0 means no limit.
+        prefetch_ahead (int): Number of frames prefetched ahead of the current index.
+        prefetch_behind (int): Number of frames prefetched behind the current index.
+        io_sleep (float): Sleep time in seconds between two background reads.
+        current_idx (int): Index last requested by the consumer.
+        lock (threading.Condition): Condition guarding the cache state and waking the prefetch thread.
+        frames (OrderedDict): Cached frames, ordered from least to most recently used.
+        nbytes (int): Total estimated size of the cached frames.
+        stop (threading.Event): Event to stop the prefetch thread.
+    """
+    def __init__(self, read_fn: callable, length: int, cfg: dict):
+        self.read_fn = read_fn
+        self.length = length
+
+        cache_cfg = get_cache_cfg(cfg)
+        self.max_frames = int(cache_cfg['max_frames'])
+        self.max_bytes = int(float(cache_cfg['max_megabytes']) * 1024 * 1024)
+        self.prefetch_ahead = int(cache_cfg['prefetch_ahead'])
+        self.prefetch_behind = int(cache_cfg['prefetch_behind'])
+        self.io_sleep = cfg['threads']['io_sleep'] if 'threads' in cfg else 0.0
+        # the window can't be larger than the frame budget, otherwise prefetching would evict its own frames
+        if self.max_frames > 0:
+            self.prefetch_ahead = min(self.prefetch_ahead, self.max_frames - 1)
+            self.prefetch_behind = min(self.prefetch_behind, self.max_frames - 1 - self.prefetch_ahead)
+
+        self.current_idx = 0
+        self.lock = threading.Condition()
+        self.frames = OrderedDict()
+        self.nbytes = 0
+        self.stop = threading.Event()
+        # start the prefetch thread
+        threading.Thread(target=self.__async_prefetch_fn__).start()
+
+    def __window__(self):
+        """
+        Returns the frame indices of the current window to prefetch in priority order: frames ahead, then frames behind. The current frame is left out since the consumer reads it itself on a cache miss.
+        """
+        ahead = range(self.current_idx + 1, min(self.current_idx + self.prefetch_ahead + 1, self.length))
+        behind = range(self.current_idx - 1, max(self.current_idx - self.prefetch_behind - 1, -1), -1)
+        return list(ahead) + list(behind)
+
+    def __in_window__(self, idx: int) -> bool:
+        return self.current_idx - self.prefetch_behind <= idx <= self.current_idx + self.prefetch_ahead
+
+    def __over_budget__(self, extra_frames: int = 0, extra_bytes: int = 0) -> bool:
+        if self.max_frames > 0 and len(self.frames) + extra_frames > self.max_frames: return True
+        if self.max_bytes > 0 and self.nbytes + extra_bytes > self.max_bytes: return True
+        return False
+
+    def __evict__(self, keep: int = None):
+        """
+        Evicts least-recently-used frames until the cache is within budget. Frames outside the window are evicted first, `keep` is never evicted.
+        Must be called with `self.lock` held.
+        """
+        if not self.__over_budget__(): return
+        out_of_window = [idx for idx in self.frames if idx != keep and not self.__in_window__(idx)]
+        in_window = [idx for idx in self.frames if idx != keep and self.__in_window__(idx)]
+        for idx in out_of_window + in_window:
+            if not self.__over_budget__(): break
+            self.nbytes -= sizeof_frame(self.frames.pop(idx))
+
+    def __insert__(self, idx: int, frame, keep: int = None):
+        """
+        Inserts a frame as the most recently used one and evicts frames if over budget. Must be called with `self.lock` held.
+        """
+        if idx in self.frames: return
+        self.frames[idx] = frame
+        self.nbytes += sizeof_frame(frame)
+        self.__evict__(keep=idx if keep is None else keep)
+
+    def __next_to_prefetch__(self):
+        """
+        Returns the next index in the window that is not cached, or None if the window is complete or the budget doesn't allow more frames.
+        Must be called with `self.lock` held.
+        """
+        for idx in self.__window__():
+            if idx in self.frames: continue
+            # only prefetch if there's room, or if room can be made by evicting frames outside the window
+            average_frame_bytes = self.nbytes // len(self.frames) if len(self.frames) else 0
+            if self.__over_budget__(extra_frames=1, extra_bytes=average_frame_bytes) and all(self.__in_window__(i) for i in self.frames): return None
+            return idx
+        return None
+
+    def __async_prefetch_fn__(self):
+        """
+        Prefetches the frames in the window around the current index in the background.
+        """
+        # also stop when the main thread exits without closing the cache, so that the interpreter can shut down
+        while not self.stop.is_set() and threading.main_thread().is_alive():
+            with self.lock:
+                idx = self.__next_to_prefetch__()
+                if idx is None:
+                    # wait until the consumer moves or the cache is closed
+                    self.lock.wait(timeout=0.1)
+                    continue
+            frame = self.read_fn(idx)
+            with self.lock:
+                # the consumer may have moved far away while reading, don't pollute the cache then
+                if self.__in_window__(idx): self.__insert__(idx, frame, keep=self.current_idx)
+            if self.io_sleep > 0: self.stop.wait(self.io_sleep)
+
+    def __len__(self):
+        return self.length
+
+    def __contains__(self, idx: int):
+        with self.lock: return idx in self.frames
+
+    def __getitem__(self, idx: int):
+        """
+        Returns the frame at the given index and moves the prefetch window to it.
+
+        Args:
+            idx (int): Frame index.
+
+        Returns:
+            The frame returned by `read_fn`.
+        """
+        if idx < 0: idx += self.length
+        if not 0 <= idx < self.length: raise IndexError(f'Frame index {idx} out of range [0, {self.length}).')
+        with self.lock:
+            self.current_idx = idx
+            if idx in self.frames:
+                self.frames.move_to_end(idx)
+                frame = self.frames[idx]
+                self.lock.notify_all()
+                return frame
+        # cache miss, read synchronously
+        frame = self.read_fn(idx)
+        with self.lock:
+            self.__insert__(idx, frame)
+            self.lock.notify_all()
+        return frame
+
+    def close(self):
+        """
+        Stops the prefetch thread and drops all the cached frames.
+        """
+        self.stop.set()
+        with self.lock:
+            self.frames.clear()
+            self.nbytes = 0
+            self.lock.notify_all()
@@ -0,0 +1,170 @@
+import threading
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+import numpy as np
+
+"""
+The module frame_transport.py contains a shared-memory transport for the large arrays of the data dicts moved between the processes of the headless bulk processor. Instead of pickling the point clouds and images through the process pool on every hop, the main process copies them once into recycled shared-memory slots and the data dicts carry lightweight `SharedArray` handles `(name, shape, dtype)`. Worker processes attach to the slots zero-copy, and the slots of a frame are recycled once the postprocess stage has finished with it.
+"""
+
+# keys of the data dicts whose arrays are moved through shared memory
+shared_keys = ['current_point_cloud_numpy', 'current_image_numpy']
+# key of the data dicts listing the names of the slots owned by the frame
+slots_key = 'shared_memory_slots'
+
+SharedArray = namedtuple('SharedArray', ['name', 'shape', 'dtype'])
+SharedArray.__doc__ = 'Handle to an array stored at the beginning of a shared-memory slot.'
+
+class SlotPool:
+    """
+    Pool of shared-memory slots, owned by the main process. Released slots are kept and reused for later frames, so that the number of slots is bounded by the number of frames in flight.
+
+    Attributes:
+        lock (threading.Lock): Lock guarding the pool, slots are acquired and released from several pipeline threads.
+        slots (dict): All the slots, by name.
+        free (list): Names of the slots that are not used by any frame.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.slots = dict()
+        self.free = []
+
+    def acquire(self, nbytes: int) -> shared_memory.SharedMemory:
+        """
+        Acquires the smallest free slot of at least `nbytes` bytes, or creates a new one.
+
+        Args:
+            nbytes (int): Minimum size of the slot in bytes.
+
+        Returns:
+            shared_memory.SharedMemory: The acquired slot.
+        """
+        with self.lock:
+            fitting = [name for name in self.free if self.slots[name].size >= nbytes]
+            if len(fitting) > 0:
+                name = min(fitting, key=lambda name: self.slots[name].size)
+                self.free.remove(name)
+                return self.slots[name]
+            # leave some headroom so that slightly larger frames can reuse the slot later
+            slot = shared_memory.SharedMemory(create=True, size=max(int(nbytes * 1.25), 1))
+            self.slots[slot.name] = slot
+            return slot
+
+    def release(self, names: list):
+        """
+        Releases slots so that they can be reused.
+
+        Args:
+            names (list): Names of the slots.
+        """
+        with self.lock:
+            for name in names:
+                if name in self.slots and name not in self.free: self.free.append(name)
+
+    def share_frame(self, data_dict: dict):
+        """
+        Moves the arrays of `shared_keys` in a data dict to shared memory, replacing them with `SharedArray` handles. A frame that already owns slots, e.g. one materialized by a stateful segment between two stateless ones, reuses them when the arrays fit, otherwise the names of the acquired slots are added to `data_dict[slots_key]`.
+
+        Args:
+            data_dict (dict): Data dictionary of a frame.
+        """
+        owned = data_dict.setdefault(slots_key, [])
+        used = set(handle.name for handle in data_dict.values() if isinstance(handle, SharedArray))
+        # slots of the frame that no handle in it refers to
+        unused = [name for name in owned if name not in used]
+        for key in shared_keys:
+            array = data_dict.get(key, None)
+            if not isinstance(array, np.ndarray): continue
+            with self.lock:
+                fitting = [name for name in unused if self.slots[name].size >= array.nbytes]
+                slot = self.slots[min(fitting, key=lambda name: self.slots[name].size)] if len(fitting) > 0 else None
+            if slot is not None: unused.remove(slot.name)
+            else:
+                slot = self.acquire(array.nbytes)
+                owned.append(slot.name)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=slot.buf)[...] = array
+            data_dict[key] = SharedArray(slot.name, array.shape, array.dtype.str)
+        if len(owned) == 0: del data_dict[slots_key]
+
+    def recycle_frame(self, data_dict: dict):
+        """
+        Releases the slots owned by a frame once it has been processed completely.
+
+        Args:
+            data_dict (dict): Data dictionary of a frame.
+        """
+        self.release(data_dict.pop(slots_key, []))
+
+    def close(self):
+        """
+        Closes and unlinks all the slots.
+        """
+        with self.lock:
+            for slot in self.slots.values():
+                slot.close()
+                slot.unlink()
+            self.slots.clear()
+            self.free.clear()
+
+def materialize_frame(data_dict: dict):
+    """
+    Replaces the `SharedArray` handles in a data dict with copies of the arrays. Used in the main process before running stateful algorithms, which may keep the arrays across frames while the slots get recycled.
+
+    Args:
+        data_dict (dict): Data dictionary of a frame.
+    """
+    for key in shared_keys:
+        handle = data_dict.get(key, None)
+        if not isinstance(handle, SharedArray): continue
+        slot = shared_memory.SharedMemory(name=handle.name)
+        data_dict[key] = np.ndarray(handle.shape, dtype=handle.dtype, buffer=slot.buf).copy()
+        slot.close()
+
+# slots attached by the current worker process, by name
+attached_slots = dict()
+
+def close_attached_slots():
+    """
+    Closes the slots attached by the current worker process, registered as a finalizer of the worker processes.
+    """
+    for slot in attached_slots.values():
+        try: slot.close()
+        except BufferError: pass # a view is still alive, the slot is closed when the process exits
+    attached_slots.clear()
+
+def attach_frame(data_dict: dict) -> dict:
+    """
+    Replaces the `SharedArray` handles in a data dict with zero-copy views of the shared-memory slots. Used in the worker processes.
+
+    Args:
+        data_dict (dict): Data dictionary of a frame.
+
+    Returns:
+        dict: The attached views and their handles, by key, to pass to `detach_frame`.
+    """
+    attached = dict()
+    for key in shared_keys:
+        handle = data_dict.get(key, None)
+        if not isinstance(handle, SharedArray): continue
+        if handle.name not in attached_slots: attached_slots[handle.name] = shared_memory.SharedMemory(name=handle.name)
+        view = np.ndarray(handle.shape, dtype=handle.dtype, buffer=attached_slots[handle.name].buf)
+        data_dict[key] = view
+        attached[key] = (view, handle)
+    return attached
+
+def detach_frame(data_dict: dict, attached: dict):
+    """
+    Replaces the views attached by `attach_frame` with `SharedArray` handles again. If an algorithm replaced an array with a new one, the new array is written back to the frame's slot when it fits, otherwise it is left in the data dict as is and moved by pickling.
+
+    Args:
+        data_dict (dict): Data dictionary of a frame.
+        attached (dict): The views and handles returned by `attach_frame`.
+    """
+    for key, (view, handle) in attached.items():
+        array = data_dict.get(key, None)
+        if array is view: data_dict[key] = handle
+        elif isinstance(array, np.ndarray) and array.nbytes <= attached_slots[handle.name].size:
+            # the new array may itself be a view of the slot, numpy handles the overlap
+            np.ndarray(array.shape, dtype=array.dtype, buffer=attached_slots[handle.name].buf)[...] = array
+            data_dict[key] = SharedArray(handle.name, array.shape, array.dtype.str)
@@ -1,8 +1,8 @@
 import os
 from liguard.gui.config_gui import resolve_for_application_root, resolve_for_default_workspace
 import glob
-import time
-import threading
+
+from liguard.frame_cache import FrameCache
 
 import cv2
 
@@ -21,18 +21,16 @@ class FileIO:
         img_count (int): Number of image files to read.
         files_basenames (list): List of file basenames (without extension) of the image files.
         reader (function): Function to read an image file.
-        data_lock (threading.Lock): Lock for thread-safe access to the data list.
-        data (list): List of tuples containing the file absolute path and the image data.
-        stop (threading.Event): Event to signal the thread to stop.
+        cache (FrameCache): Bounded cache of tuples containing the file absolute path and the image data, prefetched around the last requested index.
 
     Methods:
         __init__(self, cfg: dict): Initializes the FileIO object.
         __read_img__(self, file_abs_path: str): Reads an image file and returns the image data.
         get_abs_path(self, idx: int): Returns the absolute path of the image file at the given index.
-        __async_read_fn__(self): Asynchronously reads the image files and populates the data list.
+        __read_frame__(self, idx: int): Reads the image file at the given index, used by the prefetch cache.
         __len__(self): Returns the number of image files.
         __getitem__(self, idx): Returns the image data and file absolute path at the given index.
-        close(self): Stops the asynchronous reading process.
+        close(self): Stops the prefetching process and releases the cached images.
 
     """
 
@@ -52,11 +50,8 @@ class FileIO:
         self.files_basenames = file_basenames[self.img_start_idx:self.img_end_idx][self.global_zero:]
         self.reader = self.__read_img__
 
-        self.data_lock = threading.Lock()
-        self.data = []
-        self.stop = threading.Event()
-        # Start the asynchronous reading thread
-        threading.Thread(target=self.__async_read_fn__).start()
+        # Start the windowed prefetch cache
+        self.cache = FrameCache(self.__read_frame__, len(self.files_basenames), cfg)
 
     def __read_img__(self, file_abs_path: str):
         """
@@ -86,20 +81,20 @@ class FileIO:
         """
         return os.path.join(self.img_dir, self.files_basenames[idx] + self.img_type)
 
-    def __async_read_fn__(self):
+    def __read_frame__(self, idx: int):
         """
-        Asynchronously reads the image files and populates the data list.
+        Reads the image file at the given index, used by the prefetch cache.
+
+        Args:
+            idx (int): Index of the image file.
+
+        Returns:
+            tuple: Tuple containing the file absolute path and the image data.
 
         """
-        for idx in range(len(self.files_basenames)):
-            if self.stop.is_set():
-                break
-            file_abs_path = self.get_abs_path(idx)
-            pcd_np = self.reader(file_abs_path)
-            with self.data_lock:
-                # append the file absolute path and the image data to the data list
-                self.data.append((file_abs_path, pcd_np))
-            time.sleep(self.cfg['threads']['io_sleep'])
+        file_abs_path = self.get_abs_path(idx)
+        # return the file absolute path and the image data
+        return (file_abs_path, self.reader(file_abs_path))
 
     def __len__(self):
         """
@@ -122,17 +117,11 @@ class FileIO:
             tuple: Tuple containing the file absolute path and the image data.
 
         """
-        try:
-            with self.data_lock:
-                return self.data[idx]
-        except:
-            file_abs_path = self.get_abs_path(idx)
-            # return the file absolute path and the image data
-            return (file_abs_path, self.reader(file_abs_path))
+        return self.cache[idx]
 
     def close(self):
         """
-        Closes the image files reading thread.
+        Closes the image files prefetching thread and releases the cached images.
 
         """
-        self.stop.set()
\ No newline at end of file
+        self.cache.close()
\ No newline at end of file
@@ -6,6 +6,7 @@ import cv2
 import numpy as np
 
 from liguard.gui.logger_gui import Logger
+from liguard.calib.utils import get_lidar_to_image, project_points_to_image
 
 class ImageVisualizer:
     """
@@ -141,9 +142,7 @@ class ImageVisualizer:
             if not bbox_3d_dict['predicted']: rgb_color *= 0.5 # darken
             
             # calib parameters
-            P2 = calib_dict['P2']
-            if 'R0_rect' in calib_dict: R0_rect = calib_dict['R0_rect']
-            Tr_velo_to_cam = calib_dict['Tr_velo_to_cam']
+            lidar_to_image = get_lidar_to_image(calib_dict)
             
             # transforms
             rotation_matrix = o3d.geometry.OrientedBoundingBox.get_rotation_matrix_from_xyz(xyz_euler_angles)
@@ -170,14 +169,10 @@ class ImageVisualizer:
             
             # add rotation and translation
             bbox_in_world_coords = Rt_4x4 @ bbox_in_local_coords.T
-            # project to camera coordinates
-            bbox_pts_in_camera_coords = Tr_velo_to_cam @ bbox_in_world_coords
-            # rect matrix shall be applied here, for kitti
-            if 'R0_rect' in calib_dict: bbox_pts_in_camera_coords = R0_rect @ bbox_pts_in_camera_coords
-            # if any point is behind camera, return
-            if np.any(bbox_pts_in_camera_coords[2] < 0): return None
             # project to image pixel coordinates
-            bbox_pts_in_image_pixel_coords = P2 @ bbox_pts_in_camera_coords
+            bbox_pts_in_image_pixel_coords = project_points_to_image(bbox_in_world_coords[:3].T, lidar_to_image).T
+            # if any point is behind camera, return
+            if np.any(bbox_pts_in_image_pixel_coords[2] < 0): return None
             # normalize
             points_in_image = bbox_pts_in_image_pixel_coords[0:2,:] / bbox_pts_in_image_pixel_coords[2:,:]
             
@@ -208,8 +203,7 @@ class ImageVisualizer:
             # add past bbox_3d trajectories if available
             if 'past_trajectory' in bbox_3d_dict and self.cfg['visualization']['camera']['draw_trajectory']:
                 past_trajectory = bbox_3d_dict['past_trajectory']
-                past_trajectory = np.concatenate([past_trajectory, np.ones((past_trajectory.shape[0], 1))], axis=1)
-                past_trajectory = calib_dict['P2'] @ calib_dict['R0_rect'] @ calib_dict['Tr_velo_to_cam'] @ past_trajectory.T
+                past_trajectory = project_points_to_image(past_trajectory, lidar_to_image).T
                 past_trajectory = past_trajectory[:, past_trajectory[2] > 0]
                 past_trajectory = past_trajectory[:2] / past_trajectory[2]
                 past_trajectory = past_trajectory.T
@@ -224,8 +218,7 @@ class ImageVisualizer:
             # add future bbox_3d trajectories if available
             if 'future_trajectory' in bbox_3d_dict and self.cfg['visualization']['camera']['draw_trajectory']:
                 future_trajectory = bbox_3d_dict['future_trajectory']
-                future_trajectory = np.concatenate([future_trajectory, np.ones((future_trajectory.shape[0], 1))], axis=1)
-                future_trajectory = calib_dict['P2'] @ calib_dict['R0_rect'] @ calib_dict['Tr_velo_to_cam'] @ future_trajectory.T
+                future_trajectory = project_points_to_image(future_trajectory, lidar_to_image).T
                 future_trajectory = future_trajectory[:, future_trajectory[2] > 0]
                 future_trajectory = future_trajectory[:2] / future_trajectory[2]
                 future_trajectory = future_trajectory.T
@@ -22,7 +22,7 @@ The `handler_<lbl_type>.py` file should contain the following elements:
 
 - `colors`: A dictionary mapping object categories to colors.
 - `label_file_extension`: A string specifying the file extension to look for.
-- `Handler` function: Reads the label file and returns a list of dictionaries representing the labels.
+- `Handler` function: Reads the label file and returns a list of dictionaries representing the labels. A plain list works, the built-in handlers return a `LabelTable` (see `label_table.py`) that parses the whole file with vectorized NumPy operations (see `parsers.py`) and only builds the dictionaries when they are accessed.
 
 .. code-block:: python
 
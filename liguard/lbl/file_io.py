@@ -1,8 +1,8 @@
 import os
 from liguard.gui.config_gui import resolve_for_application_root, resolve_for_default_workspace
 import glob
-import time
-import threading
+
+from liguard.frame_cache import FrameCache
 
 lbl_dir = os.path.dirname(os.path.realpath(__file__))
 
@@ -26,16 +26,14 @@ class FileIO:
         reader (class): Handler class for reading label files.
         clb_reader (callable): Callable object for reading calibration data.
         files_basenames (list): List of file basenames.
-        data_lock (threading.Lock): Lock for thread safety.
-        data (list): List of tuples containing label file paths and annotations.
-        stop (threading.Event): Event for stopping the async read thread.
+        cache (FrameCache): Bounded cache of tuples containing label file paths and annotations, prefetched around the last requested index.
 
     Methods:
         get_abs_path(idx: int) -> str: Returns the absolute path of the label file at the given index.
-        __async_read_fn__(): Asynchronously reads label files and annotations.
+        __read_frame__(idx: int) -> tuple: Reads the label file and annotation at the given index, used by the prefetch cache.
         __len__() -> int: Returns the number of label files.
         __getitem__(idx) -> tuple: Returns the label file path and annotation at the given index.
-        close(): Stops the async read thread.
+        close(): Stops the prefetch thread and releases the cached annotations.
 
     """
     def __init__(self, cfg: dict, calib_reader: callable):
@@ -71,10 +69,8 @@ class FileIO:
         file_basenames.sort(key=lambda file_name: int(''.join(filter(str.isdigit, file_name))))
         self.files_basenames = file_basenames[self.lbl_start_idx:self.lbl_end_idx][self.global_zero:]
         
-        self.data_lock = threading.Lock()
-        self.data = []
-        self.stop = threading.Event()
-        threading.Thread(target=self.__async_read_fn__).start()
+        # prefetch the label files around the requested index
+        self.cache = FrameCache(self.__read_frame__, len(self.files_basenames), cfg)
         
     def get_abs_path(self, idx: int) -> str:
         """
@@ -90,17 +86,20 @@ class FileIO:
         lbl_path = os.path.join(self.lbl_dir, self.files_basenames[idx] + self.lbl_ext)
         return lbl_path
         
-    def __async_read_fn__(self):
+    def __read_frame__(self, idx: int) -> tuple:
         """
-        Asynchronously reads label files and annotations.
+        Reads the label file and annotation at the given index, used by the prefetch cache.
+
+        Args:
+            idx (int): Index of the label file.
+
+        Returns:
+            tuple: Label file path and annotation.
 
         """
-        for idx in range(len(self.files_basenames)):
-            if self.stop.is_set(): break
-            lbl_abs_path = self.get_abs_path(idx)
-            annotation = self.reader(lbl_abs_path, self.clb_reader(idx)[1] if self.clb_reader else None)
-            with self.data_lock: self.data.append((lbl_abs_path, annotation))
-            time.sleep(self.cfg['threads']['io_sleep'])
+        lbl_abs_path = self.get_abs_path(idx)
+        annotation = self.reader(lbl_abs_path, self.clb_reader(idx)[1] if self.clb_reader else None)
+        return (lbl_abs_path, annotation)
         
     def __len__(self) -> int:
         """
@@ -123,16 +122,11 @@ class FileIO:
             tuple: Label file path and annotation.
 
         """
-        try:
-            with self.data_lock: return self.data[idx]
-        except:
-            lbl_abs_path = self.get_abs_path(idx)
-            annotation = self.reader(lbl_abs_path, self.clb_reader(idx)[1] if self.clb_reader else None)
-            return (lbl_abs_path, annotation)
+        return self.cache[idx]
         
     def close(self):
         """
-        Closes the label files reading thread.
+        Closes the label files prefetching thread and releases the cached annotations.
 
         """
-        self.stop.set()
\ No newline at end of file
+        self.cache.close()
\ No newline at end of file
@@ -18,57 +18,41 @@ label_file_extension = '.txt'
 import os
 import numpy as np
 
+from liguard.lbl.label_table import LabelTable
+from liguard.lbl.parsers import read_text_table, parse_numeric_columns
+
 def Handler(label_path: str, calib_data: dict):
     """
-    Process the label file and convert it into a list of dictionaries representing the labels.
+    Process the label file and convert it into a list of dictionaries representing the labels. The whole file is parsed at once into the columns of a `LabelTable`, the label dicts are only built when they're accessed.
 
     Args:
         label_path (str): The path to the label file.
         calib_data (dict): Calibration data.
 
     Returns:
-        list: A list of dictionaries representing the labels.
+        LabelTable: A list of dictionaries representing the labels.
     """
-    output = []
+    output = LabelTable()
     
     # Check if the label file exists
     if os.path.exists(label_path) == False:
         return output
     
     # Read the label file
-    with open(label_path, 'r') as f:
-        lbls = f.readlines()
+    table = read_text_table(label_path)
+    if len(table) == 0:
+        return output
+    
+    xyz_dxdydz_rz = parse_numeric_columns(table, slice(0, 7), np.float32)
+    obj_classes = table[:, 7]
     
-    for line in lbls:
-        parts = line.strip().split(' ')
-        xyz_dxdydz_rz = np.array([float(i) for i in parts[0:7]], dtype=np.float32)
-        obj_class = parts[7]
-        
-        # Create a dictionary to store the label information
-        label = dict()
-        label['x'] = xyz_dxdydz_rz[0]
-        label['y'] = xyz_dxdydz_rz[1]
-        label['z'] = xyz_dxdydz_rz[2]
-        label['dx'] = xyz_dxdydz_rz[3]
-        label['dy'] = xyz_dxdydz_rz[4]
-        label['dz'] = xyz_dxdydz_rz[5]
-        label['heading_angle'] = xyz_dxdydz_rz[6]
-        label['class'] = obj_class
-        
-        xyz_center = xyz_dxdydz_rz[0:3]
-        xyz_extent = xyz_dxdydz_rz[3:6]
-        xyz_euler_angles = np.array([0, 0, xyz_dxdydz_rz[6]], dtype=np.float32)
-        rgb_color = np.array(colors[obj_class], dtype=np.float32)
-        
-        # Create a dictionary to store the 3D bounding-box information
-        label['bbox_3d'] = {
-            'xyz_center': xyz_center,
-            'xyz_extent': xyz_extent,
-            'xyz_euler_angles': xyz_euler_angles,
-            'rgb_color': rgb_color,
-            'predicted': False
-        }
-        
-        output.append(label)
+    xyz_center = xyz_dxdydz_rz[:, 0:3]
+    xyz_extent = xyz_dxdydz_rz[:, 3:6]
+    xyz_euler_angles = np.zeros((len(table), 3), dtype=np.float32)
+    xyz_euler_angles[:, 2] = xyz_dxdydz_rz[:, 6]
+    class_names, class_ids = np.unique(obj_classes, return_inverse=True)
+    rgb_color = np.array([colors[obj_class] for obj_class in class_names], dtype=np.float32)[class_ids]
     
-    return output
\ No newline at end of file
+    # the label dicts also have the raw values
+    fields = {name: xyz_dxdydz_rz[:, i] for i, name in enumerate(['x', 'y', 'z', 'dx', 'dy', 'dz', 'heading_angle'])}
+    return LabelTable(class_names.tolist(), class_ids, xyz_center, xyz_extent, xyz_euler_angles, rgb_color, np.zeros(len(table), dtype=bool), fields)
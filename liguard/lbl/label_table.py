@@ -0,0 +1,301 @@
+from collections.abc import MutableSequence
+
+import numpy as np
+
+from liguard.calib.utils import project_points_to_image
+
+"""
+The module label_table.py contains `LabelTable`, the columnar container for the labels of a frame, i.e. `data_dict['current_label_list']`. The label handlers parse whole files into its columns with vectorized NumPy operations, and the algorithms can filter, merge, transform, and project all the labels of a frame at once with `mask`, `concat`, `transform`, and `project`.
+
+A `LabelTable` also behaves like the list of label dicts that the algorithms used to get, so algorithms that work with label dicts keep working. Algorithms that may get a plain list, e.g. from a custom algorithm, convert it with `LabelTable.from_list`.
+"""
+
+# bbox_3d columns of the table: column name -> (key in the bbox_3d dict, dtype, shape of a row, value of labels without it)
+bbox_3d_columns = {
+    'xyz_center': ('xyz_center', np.float32, (3,), 0.0),
+    'xyz_extent': ('xyz_extent', np.float32, (3,), 0.0),
+    'xyz_euler_angles': ('xyz_euler_angles', np.float32, (3,), 0.0),
+    'rgb_color': ('rgb_color', np.float32, (3,), 0.0),
+    'predicted': ('predicted', bool, (), False),
+    'score': ('confidence', np.float32, (), np.nan),
+}
+
+class LabelTable(MutableSequence):
+    """
+    Labels stored as columns, one row per object, that behave like a list of label dicts.
+
+    A label dict is built from the columns only when the label is accessed, e.g. by iterating over the table. From then on the label is that dict, so changes made to it are kept. Dicts can be appended, inserted, and removed like in a list. The vectorized operations read the values of such labels from their dicts, and write them back to their dicts.
+
+    The columns are never changed in place, operations that change values replace the column, so that copies and the tables kept by the label readers' cache aren't affected.
+
+    Args:
+        class_names (list): Names of the classes, the class ids index into it.
+        class_ids (np.ndarray): (K,) class id of every label.
+        xyz_center (np.ndarray): (K, 3) centers of the 3D bounding boxes in lidar coordinates.
+        xyz_extent (np.ndarray): (K, 3) extents of the 3D bounding boxes.
+        xyz_euler_angles (np.ndarray): (K, 3) euler angles of the 3D bounding boxes, the yaw is the last one.
+        rgb_color (np.ndarray): (K, 3) colors of the 3D bounding boxes in [0, 1].
+        predicted (np.ndarray): (K,) True for predicted labels, False for ground truth.
+        fields (dict): Other (K, ...) columns by label dict key, e.g. `truncation` of KITTI labels. In the label dicts, the values of 1-D columns are Python scalars and the values of other columns are array rows.
+        score (np.ndarray): (K,) confidence of predicted labels, `confidence` in the bbox_3d dict, NaN if there's none.
+        sources (list): Names of the algorithms that added labels, the source ids index into it.
+        source_ids (np.ndarray): (K,) source id of every label, `added_by` in the bbox_3d dict, -1 if there's none.
+
+    Attributes:
+        rows (list): Row of the columns of every label, or its dict once it is built or if it was added as a dict.
+        field_masks (dict): (K,) masks of the rows that have a field, by field name, for the fields that not all the rows have, see `concat`.
+    """
+    def __init__(self, class_names: list = (), class_ids: np.ndarray = None, xyz_center: np.ndarray = None, xyz_extent: np.ndarray = None, xyz_euler_angles: np.ndarray = None, rgb_color: np.ndarray = None, predicted: np.ndarray = None, fields: dict = None, score: np.ndarray = None, sources: list = (), source_ids: np.ndarray = None):
+        number_of_labels = 0 if class_ids is None else len(class_ids)
+        as_column = lambda array, dtype, shape, fill: np.full((number_of_labels, *shape), fill, dtype=dtype) if array is None else np.asarray(array, dtype=dtype).reshape(number_of_labels, *shape)
+        self.class_names = list(class_names)
+        self.class_ids = as_column(class_ids, np.int32, (), 0)
+        self.sources = list(sources)
+        self.source_ids = as_column(source_ids, np.int32, (), -1)
+        bbox_3d_values = dict(xyz_center=xyz_center, xyz_extent=xyz_extent, xyz_euler_angles=xyz_euler_angles, rgb_color=rgb_color, predicted=predicted, score=score)
+        for name, (_, dtype, shape, fill) in bbox_3d_columns.items(): setattr(self, name, as_column(bbox_3d_values[name], dtype, shape, fill))
+        self.fields = dict() if fields is None else {name: np.asarray(column) for name, column in fields.items()}
+        self.field_masks = dict()
+        self.rows = list(range(number_of_labels))
+
+    @classmethod
+    def from_list(cls, labels) -> 'LabelTable':
+        """
+        Compatibility layer for label lists, e.g. from algorithms that build `data_dict['current_label_list']` as a list of dicts.
+
+        Args:
+            labels (list): Label dicts, or a `LabelTable`.
+
+        Returns:
+            LabelTable: `labels` itself if it's already a table, otherwise a table of the same dicts.
+        """
+        if isinstance(labels, LabelTable): return labels
+        table = cls()
+        table.rows = list(labels)
+        return table
+
+    @staticmethod
+    def concat(labels_list: list) -> 'LabelTable':
+        """
+        Concatenates label tables, or lists, into one table without building the label dicts. Fields that only some of the tables have are only added to the dicts of their labels.
+
+        Args:
+            labels_list (list): Label tables, or lists of label dicts.
+
+        Returns:
+            LabelTable: New table with the labels of all the tables in order.
+        """
+        tables = [LabelTable.from_list(labels) for labels in labels_list]
+        # the fields of all the tables, in order of appearance, with an example column for their dtype and row shape
+        field_examples = dict()
+        for table in tables:
+            for name, column in table.fields.items(): field_examples.setdefault(name, column)
+        output = LabelTable()
+        columns = {name: [] for name in ['class_ids', 'source_ids', *bbox_3d_columns]}
+        fields = {name: [] for name in field_examples}
+        field_masks = {name: [] for name in field_examples}
+        offset = 0
+        for table in tables:
+            number_of_rows = len(table.class_ids)
+            # merge the class and source names, the last entry of the maps keeps -1 (no source) as it is
+            class_id_map = np.array([output.__vocabulary_id__(output.class_names, name) for name in table.class_names] + [-1], dtype=np.int32)
+            source_id_map = np.array([output.__vocabulary_id__(output.sources, name) for name in table.sources] + [-1], dtype=np.int32)
+            columns['class_ids'].append(class_id_map[table.class_ids])
+            columns['source_ids'].append(source_id_map[table.source_ids])
+            for name in bbox_3d_columns: columns[name].append(getattr(table, name))
+            for name, example in field_examples.items():
+                if name in table.fields:
+                    fields[name].append(table.fields[name])
+                    field_masks[name].append(table.field_masks[name] if name in table.field_masks else np.ones(number_of_rows, dtype=bool))
+                else:
+                    fields[name].append(np.zeros((number_of_rows, *example.shape[1:]), dtype=example.dtype))
+                    field_masks[name].append(np.zeros(number_of_rows, dtype=bool))
+            output.rows.extend(row if isinstance(row, dict) else row + offset for row in table.rows)
+            offset += number_of_rows
+        for name, column in columns.items():
+            if len(column): setattr(output, name, np.concatenate(column))
+        output.fields = {name: np.concatenate(column) for name, column in fields.items()}
+        # the masks are only kept for the fields that some labels don't have
+        output.field_masks = {name: mask for name, mask in ((name, np.concatenate(mask)) for name, mask in field_masks.items()) if not mask.all()}
+        return output
+
+    @staticmethod
+    def __vocabulary_id__(vocabulary: list, name) -> int:
+        if name is None: return -1
+        if name not in vocabulary: vocabulary.append(name)
+        return vocabulary.index(name)
+
+    def __build_dict__(self, row: int) -> dict:
+        label = dict()
+        label['class'] = self.class_names[self.class_ids[row]]
+        for name, column in self.fields.items():
+            if name in self.field_masks and not self.field_masks[name][row]: continue
+            label[name] = column[row].item() if column.ndim == 1 else column[row].copy()
+        label['bbox_3d'] = {'xyz_center': self.xyz_center[row].copy(), 'xyz_extent': self.xyz_extent[row].copy(), 'xyz_euler_angles': self.xyz_euler_angles[row].copy(), 'rgb_color': self.rgb_color[row].copy(), 'predicted': bool(self.predicted[row])}
+        if self.source_ids[row] >= 0: label['bbox_3d']['added_by'] = self.sources[self.source_ids[row]]
+        if not np.isnan(self.score[row]): label['bbox_3d']['confidence'] = self.score[row].item()
+        return label
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            table = self.copy()
+            table.rows = self.rows[index]
+            return table
+        row = self.rows[index]
+        if isinstance(row, dict): return row
+        # build the dict of the label once, it is the label from now on
+        label = self.__build_dict__(row)
+        self.rows[index] = label
+        return label
+
+    def __setitem__(self, index, label):
+        if isinstance(index, slice): self.rows[index] = list(label)
+        else: self.rows[index] = label
+
+    def __delitem__(self, index):
+        del self.rows[index]
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self):
+        for index in range(len(self.rows)): yield self[index]
+
+    def insert(self, index: int, label: dict):
+        self.rows.insert(index, label)
+
+    def copy(self):
+        """
+        Returns a shallow copy, like `list.copy`, the columns and the built dicts are shared.
+        """
+        table = LabelTable.__new__(LabelTable)
+        table.__dict__.update(self.__dict__)
+        table.rows = list(self.rows)
+        table.class_names = list(self.class_names)
+        table.sources = list(self.sources)
+        return table
+
+    def __split_rows__(self):
+        """
+        Returns the positions and column rows of the labels that are still columnar, and the positions and dicts of the other labels.
+        """
+        columnar_positions, columnar_rows, dict_positions, dicts = [], [], [], []
+        for position, row in enumerate(self.rows):
+            if isinstance(row, dict):
+                dict_positions.append(position)
+                dicts.append(row)
+            else:
+                columnar_positions.append(position)
+                columnar_rows.append(row)
+        return columnar_positions, columnar_rows, dict_positions, dicts
+
+    @property
+    def has_bbox_3d(self) -> np.ndarray:
+        """
+        (K,) True for the labels with a 3D bounding box, i.e. columnar labels and dicts with `bbox_3d`.
+        """
+        return np.array([not isinstance(row, dict) or 'bbox_3d' in row for row in self.rows], dtype=bool)
+
+    @property
+    def has_bbox_2d(self) -> np.ndarray:
+        """
+        (K,) True for the labels with a 2D bounding box, i.e. dicts with `bbox_2d`.
+        """
+        return np.array([isinstance(row, dict) and 'bbox_2d' in row for row in self.rows], dtype=bool)
+
+    @property
+    def class_list(self) -> list:
+        """
+        Class of every label.
+        """
+        return [row['class'] if isinstance(row, dict) else self.class_names[self.class_ids[row]] for row in self.rows]
+
+    def get_column(self, name: str) -> np.ndarray:
+        """
+        Gathers the values of a bbox_3d column of all the labels, without building the label dicts.
+
+        Args:
+            name (str): One of `xyz_center`, `xyz_extent`, `xyz_euler_angles`, `rgb_color`, `predicted`, and `score`.
+
+        Returns:
+            np.ndarray: (K, ...) values, labels without the value, e.g. without a bbox_3d, get 0, False, or NaN for the score; see `has_bbox_3d`.
+        """
+        key, dtype, shape, fill = bbox_3d_columns[name]
+        columnar_positions, columnar_rows, dict_positions, dicts = self.__split_rows__()
+        if len(dict_positions) == 0: return getattr(self, name)[columnar_rows]
+        values = np.full((len(self.rows), *shape), fill, dtype=dtype)
+        values[columnar_positions] = getattr(self, name)[columnar_rows]
+        for position, label in zip(dict_positions, dicts):
+            if 'bbox_3d' in label and key in label['bbox_3d']: values[position] = label['bbox_3d'][key]
+        return values
+
+    def set_column(self, name: str, values: np.ndarray):
+        """
+        Sets the values of a bbox_3d column of all the labels. The column is replaced, and the values of the labels that are dicts are written to their bbox_3d dicts. Labels without a bbox_3d are left as they are.
+
+        Args:
+            name (str): One of `xyz_center`, `xyz_extent`, `xyz_euler_angles`, `rgb_color`, `predicted`, and `score`.
+            values (np.ndarray): (K, ...) values.
+        """
+        key, dtype, shape, _ = bbox_3d_columns[name]
+        values = np.asarray(values, dtype=dtype).reshape(len(self.rows), *shape)
+        columnar_positions, columnar_rows, dict_positions, dicts = self.__split_rows__()
+        if len(columnar_rows):
+            column = getattr(self, name).copy()
+            column[columnar_rows] = values[columnar_positions]
+            setattr(self, name, column)
+        for position, label in zip(dict_positions, dicts):
+            if 'bbox_3d' not in label: continue
+            if name == 'score' and np.isnan(values[position]): continue
+            label['bbox_3d'][key] = values[position].item() if len(shape) == 0 else values[position].copy()
+
+    def mask(self, keep: np.ndarray) -> 'LabelTable':
+        """
+        Selects labels, without building the label dicts.
+
+        Args:
+            keep (np.ndarray): (K,) bool mask, or indices, of the labels to keep.
+
+        Returns:
+            LabelTable: New table with the selected labels, the columns and the built dicts are shared.
+        """
+        keep = np.asarray(keep)
+        indices = np.flatnonzero(keep) if keep.dtype == bool else keep
+        table = self.copy()
+        table.rows = [self.rows[index] for index in indices.tolist()]
+        return table
+
+    def transform(self, transformation_matrix: np.ndarray):
+        """
+        Applies a rigid transformation, that rotates around the z axis, to the 3D bounding boxes of all the labels, e.g. to move them between lidar frames.
+
+        Args:
+            transformation_matrix (np.ndarray): 4x4 transformation matrix.
+        """
+        transformation_matrix = np.asarray(transformation_matrix, dtype=np.float32)
+        self.set_column('xyz_center', self.get_column('xyz_center') @ transformation_matrix[:3, :3].T + transformation_matrix[:3, 3])
+        xyz_euler_angles = self.get_column('xyz_euler_angles')
+        xyz_euler_angles[:, 2] += np.arctan2(transformation_matrix[1, 0], transformation_matrix[0, 0])
+        self.set_column('xyz_euler_angles', xyz_euler_angles)
+
+    def project(self, lidar_to_image: np.ndarray) -> np.ndarray:
+        """
+        Projects the centers of the 3D bounding boxes of all the labels onto the image plane.
+
+        Args:
+            lidar_to_image (np.ndarray): 3x4 projection matrix, see `liguard.calib.utils.get_lidar_to_image`.
+
+        Returns:
+            np.ndarray: (K, 3) homogeneous pixel coordinates, i.e. `(u * w, v * w, w)`, `w` is positive in front of the camera.
+        """
+        return project_points_to_image(self.get_column('xyz_center'), lidar_to_image)
+
+    def __repr__(self) -> str:
+        return f'LabelTable({len(self)} labels)'
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Size of the columns in bytes, the built dicts aren't counted.
+        """
+        return sum(column.nbytes for column in [self.class_ids, self.source_ids, *[getattr(self, name) for name in bbox_3d_columns], *self.fields.values(), *self.field_masks.values()])
@@ -0,0 +1,39 @@
+import itertools
+
+import numpy as np
+
+"""
+The module parsers.py contains NumPy-based parsers for text label files. A whole file is split into a table of tokens at once, and the numeric columns are converted in a single NumPy call instead of one `float` call per value.
+"""
+
+def read_text_table(label_path: str) -> np.ndarray:
+    """
+    Reads a whitespace separated text file, one object per line, into a table of tokens. Empty lines are skipped. Lines with more tokens than the shortest line are cut, e.g. the optional score column of KITTI labels.
+
+    Args:
+        label_path (str): Path to the label file.
+
+    Returns:
+        np.ndarray: (K, C) object array of the str tokens, (0, 0) if the file has no objects.
+    """
+    with open(label_path, 'r') as f: rows = [line.split() for line in f]
+    rows = [row for row in rows if len(row) > 0]
+    if len(rows) == 0: return np.zeros((0, 0), dtype=object)
+    number_of_columns = min(len(row) for row in rows)
+    if max(len(row) for row in rows) != number_of_columns: rows = [row[:number_of_columns] for row in rows]
+    # object array of the tokens, NumPy converts Python str to numbers faster than its own str dtype
+    return np.array(list(itertools.chain.from_iterable(rows)), dtype=object).reshape(len(rows), number_of_columns)
+
+def parse_numeric_columns(table: np.ndarray, columns: slice, dtype=np.float64) -> np.ndarray:
+    """
+    Converts columns of a token table to numbers in one call.
+
+    Args:
+        table (np.ndarray): (K, C) token table, see `read_text_table`.
+        columns (slice): Columns to convert.
+        dtype: Numeric type of the result.
+
+    Returns:
+        np.ndarray: (K, number of columns) array.
+    """
+    return table[:, columns].astype(dtype)
@@ -9,22 +9,42 @@ from liguard.calib.file_io import FileIO as CLB_File_IO
 from liguard.lbl.file_io import FileIO as LBL_File_IO
 
 from liguard.gui.logger_gui import Logger
+from liguard.algo.utils import make_key, fuse_processes
+from liguard.algo.models import preload_models
+from liguard.frame_transport import SlotPool, materialize_frame, attach_frame, detach_frame, close_attached_slots
 
 import time
 import signal
 from threading import Thread, Event
 from queue import Queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
+import multiprocessing.util
 
 from tqdm import tqdm
 
 stop_event = Event()
 
-def reader2queue(reader, size, target_queue):
-    for idx in range(size):
-        if stop_event.is_set():
-            target_queue.put(None)
-            break
-        target_queue.put(reader[idx])
+def reader2queue(reader, size, target_queue, io_workers=1):
+    if io_workers <= 1:
+        for idx in range(size):
+            if stop_event.is_set(): break
+            target_queue.put(reader[idx])
+    else:
+        # decode frames in a pool of workers and put them in order, so the frames of all the modalities stay aligned
+        with ThreadPoolExecutor(max_workers=io_workers) as pool:
+            pending = deque()
+            next_idx = 0
+            while (next_idx < size or len(pending) > 0) and not stop_event.is_set():
+                # keep a bounded number of frames in flight
+                while next_idx < size and len(pending) < 2 * io_workers:
+                    pending.append(pool.submit(reader.__getitem__, next_idx))
+                    next_idx += 1
+                target_queue.put(pending.popleft().result())
+            for future in pending: future.cancel()
+    # end of data
+    target_queue.put(None)
 
 def queue2dict2queue(source_queue, key1, key2, target_queue):
     while True:
@@ -38,35 +58,158 @@ def queue2dict2queue(source_queue, key1, key2, target_queue):
         source_queue.task_done()
     
 def dicts2singledict(source_queues, target_queue, p_bar):
+    frame_index = 0
     while True:
         data = [source_queues[i].get() for i in range(len(source_queues))]
         if None in data:
             target_queue.put(None)
             for i in range(len(source_queues)): source_queues[i].task_done()
+            # the shortest modality has ended, stop the others and drain their queues so that their threads can finish
+            stop_event.set()
+            for i in range(len(source_queues)):
+                while data[i] is not None:
+                    data[i] = source_queues[i].get()
+                    source_queues[i].task_done()
             break
-        data_dict = dict()
+        data_dict = {'current_frame_index': frame_index}
         for d in data: data_dict.update(d)
         target_queue.put(data_dict)
         for i in range(len(source_queues)): source_queues[i].task_done()
         p_bar.update(1)
-
-def dict2proc2dict(source_queue, cfg, logger, processes, target_queue, p_bar):
-    while True:
-        data = source_queue.get()
-        if data is None:
-            if target_queue: target_queue.put(None)
+        frame_index += 1
+
+def dict2proc2dict(source_queue, cfg, logger, processes, target_queue, p_bar, batch_size=1):
+    # stateful algorithms keep their state in the data dict under keys made by make_key(algo_name, ...), carry it over from frame to frame
+    state_key_prefixes = tuple(make_key(process.__name__, '') for process in processes)
+    state = dict()
+    # frames are only gathered into batches when an algorithm can process them at once
+    if not any(getattr(process, 'batchable', False) for process in processes): batch_size = 1
+    ended = False
+    while not ended:
+        batch = []
+        while len(batch) < batch_size:
+            data = source_queue.get()
             source_queue.task_done()
-            break
-        for process in processes: process(data, cfg, logger)
+            if data is None:
+                ended = True
+                break
+            # stateful algorithms may keep the arrays across frames, so they get copies instead of views of the recycled shared-memory slots
+            materialize_frame(data)
+            data['logger'] = logger
+            batch.append(data)
+        for process in processes:
+            # the state is moved into the data dict before a process runs and taken back from it after, so that the keys an algorithm removes stay removed
+            if getattr(process, 'batchable', False) and len(batch) > 1:
+                # a batchable algorithm keeps its state in the first data dict of the batch
+                batch[0].update(state)
+                process(batch, cfg, logger)
+                state = {key: batch[0].pop(key) for key in list(batch[0].keys()) if key.startswith(state_key_prefixes)}
+                for data in batch[1:]:
+                    for key in list(data.keys()):
+                        if key.startswith(state_key_prefixes): del data[key]
+            else:
+                for data in batch:
+                    data.update(state)
+                    process(data, cfg, logger)
+                    state = {key: data.pop(key) for key in list(data.keys()) if key.startswith(state_key_prefixes)}
+        for data in batch:
+            del data['logger']
+            if target_queue: target_queue.put(data)
+            if p_bar: p_bar.update(1)
+    if target_queue: target_queue.put(None)
+
+# configuration and logger of a worker process of the process pool
+worker_state = dict()
+
+def __init_worker__(cfg, logger, sys_path):
+    # Ctrl + C is handled by the main process
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # make the custom algorithms importable
+    for path in sys_path:
+        if path not in sys.path: sys.path.append(path)
+    worker_state['cfg'] = cfg
+    worker_state['logger'] = logger
+    # close the shared-memory slots attached by the worker when it exits, atexit handlers aren't run in pool workers
+    multiprocessing.util.Finalize(None, close_attached_slots, exitpriority=10)
+
+def __run_processes__(processes, data):
+    attached = attach_frame(data)
+    for process in processes: process(data, worker_state['cfg'], worker_state['logger'])
+    detach_frame(data, attached)
+    return data
+
+def dict2pool2dict(source_queue, pool, slot_pool, workers, processes, target_queue, p_bar):
+    pending = deque()
+    def put_oldest():
+        data = pending.popleft().result()
         if target_queue: target_queue.put(data)
+        if p_bar: p_bar.update(1)
+    while True:
+        data = source_queue.get()
         source_queue.task_done()
-        p_bar.update(1)
+        if data is None: break
+        # the large arrays are moved through shared memory, only their handles are pickled
+        slot_pool.share_frame(data)
+        pending.append(pool.submit(__run_processes__, processes, data))
+        # frames are processed concurrently but put in order, keep a bounded number of frames in flight
+        while len(pending) >= 2 * workers or (len(pending) > 0 and pending[0].done()): put_oldest()
+    while len(pending) > 0: put_oldest()
+    if target_queue: target_queue.put(None)
+
+def frames2recycle(source_queue, slot_pool):
+    while True:
+        data = source_queue.get()
+        source_queue.task_done()
+        if data is None: break
+        if slot_pool: slot_pool.recycle_frame(data)
+
+def start_stage(source_queue, cfg, logger, processes, target_queue, p_bar, pool, slot_pool, workers, max_queue_size, batch_size=1):
+    """
+    Starts the threads running the processes of a pipeline stage. The processes are split into segments of consecutive stateless or stateful processes. Stateless segments are run on the process pool, frame-parallel, when a pool is given. Stateful segments are run in a single thread, one frame at a time in order, or on batches of frames in order when one of their processes is batchable.
+
+    Args:
+        source_queue (Queue): Queue of the input data dicts.
+        cfg (dict): Pipeline configuration dictionary.
+        logger (Logger): Logger object.
+        processes (list): Processes of the stage, in order of priority.
+        target_queue (Queue): Queue of the output data dicts, or None.
+        p_bar (tqdm): Progress bar of the stage.
+        pool (ProcessPoolExecutor): Process pool for stateless segments, or None.
+        slot_pool (SlotPool): Shared-memory slots used to move the frames to the process pool, or None.
+        workers (int): Number of workers in the pool.
+        max_queue_size (int): Maximum size of the queues between the segments.
+        batch_size (int): Maximum number of frames given at once to the batchable processes of stateful segments.
+
+    Returns:
+        list: Started threads.
+    """
+    segments = []
+    for process in processes:
+        parallel = pool is not None and getattr(process, 'stateless', False)
+        if len(segments) > 0 and segments[-1][0] == parallel: segments[-1][1].append(process)
+        else: segments.append((parallel, [process]))
+    if len(segments) == 0: segments.append((False, []))
+
+    threads = []
+    for i, (parallel, segment_processes) in enumerate(segments):
+        is_last_segment = i == len(segments) - 1
+        segment_target_queue = target_queue if is_last_segment else Queue(maxsize=max_queue_size)
+        segment_p_bar = p_bar if is_last_segment else None
+        if parallel: thread = Thread(target=dict2pool2dict, args=(source_queue, pool, slot_pool, workers, segment_processes, segment_target_queue, segment_p_bar))
+        else: thread = Thread(target=dict2proc2dict, args=(source_queue, cfg, logger, segment_processes, segment_target_queue, segment_p_bar, batch_size))
+        thread.start()
+        threads.append(thread)
+        source_queue = segment_target_queue
+    return threads
 
 def signal_handler(sig, frame):
     print("\nCtrl + C detected! Stopping ...")
     stop_event.set()  # Signal all threads to stop
 
 def bulk_process(args):
+    # the previous run in this process may have stopped the threads
+    stop_event.clear()
+
     pipeline_dir = args.pipeline_dir
     base_cfg_path = os.path.join(pipeline_dir, 'base_config.yml')
     with open(base_cfg_path) as f:cfg = yaml.safe_load(f)
@@ -100,6 +243,10 @@ def bulk_process(args):
 
     # signal handler
     signal.signal(signal.SIGINT, signal_handler)
+
+    # the io workers read ahead of the pipeline, the readers' own background prefetching would only duplicate their reads
+    if args.io_workers > 1:
+        cfg['data']['cache'] = dict(cfg['data'].get('cache', dict()), prefetch_ahead=0, prefetch_behind=0)
     
     # reader queues
     pcd_input_queue = Queue(maxsize=args.max_queue_size)
@@ -115,16 +262,16 @@ def bulk_process(args):
 
     # reader threads
     if pcd_reader:
-        pcd_io_thread = Thread(target=reader2queue, args=(pcd_reader, len(pcd_reader), pcd_input_queue))
+        pcd_io_thread = Thread(target=reader2queue, args=(pcd_reader, len(pcd_reader), pcd_input_queue, args.io_workers))
         pcd_io_thread.start()
     if img_reader:
-        img_io_thread = Thread(target=reader2queue, args=(img_reader, len(img_reader), img_input_queue))
+        img_io_thread = Thread(target=reader2queue, args=(img_reader, len(img_reader), img_input_queue, args.io_workers))
         img_io_thread.start()
     if clb_reader:
-        clb_io_thread = Thread(target=reader2queue, args=(clb_reader, len(clb_reader), clb_input_queue))
+        clb_io_thread = Thread(target=reader2queue, args=(clb_reader, len(clb_reader), clb_input_queue, args.io_workers))
         clb_io_thread.start()
     if lbl_reader:
-        lbl_io_thread = Thread(target=reader2queue, args=(lbl_reader, len(lbl_reader), lbl_input_queue))
+        lbl_io_thread = Thread(target=reader2queue, args=(lbl_reader, len(lbl_reader), lbl_input_queue, args.io_workers))
         lbl_io_thread.start()
 
     # data dict queues
@@ -187,6 +334,7 @@ def bulk_process(args):
         else: process = __import__(proc, fromlist=['*']).__dict__[proc]
         lidar_processes_dict[priority] = process
     lidar_processes = [lidar_processes_dict[priority] for priority in sorted(lidar_processes_dict.keys())]
+    lidar_processes = fuse_processes(lidar_processes, built_in_lidar_modules)
 
     camera_processes_dict = dict()
     built_in_camera_modules = __import__('liguard.algo.camera', fromlist=['*']).__dict__
@@ -228,34 +376,43 @@ def bulk_process(args):
         post_processes_dict[priority] = process
     post_processes = [post_processes_dict[priority] for priority in sorted(post_processes_dict.keys())]
 
+    # load the models of the enabled processes in background while the readers fill the queues
+    preload_models(cfg, pre_processes + lidar_processes + camera_processes + calib_processes + label_processes + post_processes, logger)
+
+    # process pool for stateless processes, workers are spawned so that they don't inherit the threads and locks of this process
+    if args.workers > 1:
+        pool = ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context('spawn'), initializer=__init_worker__, initargs=(cfg, logger, list(sys.path)))
+        slot_pool = SlotPool()
+    else: pool, slot_pool = None, None
+
     # preprocess
     preprocessed_data_dict_queue = Queue(maxsize=args.max_queue_size)
     preprocess_tqdm = tqdm(total=min_len, desc='Preprocessing data', position=1)
-    preprocess_thread = Thread(target=dict2proc2dict, args=(common_data_dict_queue, cfg, logger, pre_processes, preprocessed_data_dict_queue, preprocess_tqdm))
-    preprocess_thread.start()
+    preprocess_threads = start_stage(common_data_dict_queue, cfg, logger, pre_processes, preprocessed_data_dict_queue, preprocess_tqdm, pool, slot_pool, args.workers, args.max_queue_size, args.batch_size)
 
     # sequential processing
     seq_processed_data_dict_queue = Queue(maxsize=args.max_queue_size)
     seq_process_tqdm = tqdm(total=min_len, desc='Processing data', position=2)
-    lidar_thread = Thread(target=dict2proc2dict, args=(preprocessed_data_dict_queue, cfg, logger, lidar_processes + camera_processes + calib_processes, seq_processed_data_dict_queue, seq_process_tqdm))
-    lidar_thread.start()
+    lidar_threads = start_stage(preprocessed_data_dict_queue, cfg, logger, lidar_processes + camera_processes + calib_processes, seq_processed_data_dict_queue, seq_process_tqdm, pool, slot_pool, args.workers, args.max_queue_size, args.batch_size)
 
     # label processing
     label_processed_data_dict_queue = Queue(maxsize=args.max_queue_size)
     label_process_tqdm = tqdm(total=min_len, desc='Processing labels', position=3)
-    label_thread = Thread(target=dict2proc2dict, args=(seq_processed_data_dict_queue, cfg, logger, label_processes, label_processed_data_dict_queue, label_process_tqdm))
-    label_thread.start()
+    label_threads = start_stage(seq_processed_data_dict_queue, cfg, logger, label_processes, label_processed_data_dict_queue, label_process_tqdm, pool, slot_pool, args.workers, args.max_queue_size, args.batch_size)
 
     # postprocess
-    postprocessed_data_dict_queue = Queue(maxsize=args.max_queue_size)
     postprocess_tqdm = tqdm(total=min_len, desc='Postprocessing data', position=4)
-    postprocess_thread = Thread(target=dict2proc2dict, args=(label_processed_data_dict_queue, cfg, logger, post_processes, None, postprocess_tqdm))
-    postprocess_thread.start()
+    postprocessed_data_dict_queue = Queue(maxsize=args.max_queue_size)
+    postprocess_threads = start_stage(label_processed_data_dict_queue, cfg, logger, post_processes, postprocessed_data_dict_queue, postprocess_tqdm, pool, slot_pool, args.workers, args.max_queue_size, args.batch_size)
+
+    # recycle the shared-memory slots of the frames that are completely processed
+    recycle_thread = Thread(target=frames2recycle, args=(postprocessed_data_dict_queue, slot_pool))
+    recycle_thread.start()
 
     # signal handler
     # sigint handler
     try:
-        while not stop_event.is_set(): time.sleep(0.1)  # Sleep for a short time to keep the loop efficient
+        while recycle_thread.is_alive(): time.sleep(0.1)  # Sleep for a short time to keep the loop efficient
     except KeyboardInterrupt:
         # Handle Ctrl + C pressed in the main thread
         signal_handler(None, None)
@@ -276,14 +433,17 @@ def bulk_process(args):
     
     data_dict_thread.join()
     print('Data reading complete.')
-    preprocess_thread.join()
+    for thread in preprocess_threads: thread.join()
     print('Preprocessing complete.')
-    lidar_thread.join()
+    for thread in lidar_threads: thread.join()
     print('Sequential processing complete.')
-    label_thread.join()
+    for thread in label_threads: thread.join()
     print('Label processing complete.')
-    postprocess_thread.join()
+    for thread in postprocess_threads: thread.join()
     print('Postprocessing complete.')
+    recycle_thread.join()
+    if pool: pool.shutdown()
+    if slot_pool: slot_pool.close()
 
     reader_tqdm.close()
     preprocess_tqdm.close()
@@ -291,6 +451,10 @@ def bulk_process(args):
     label_process_tqdm.close()
     postprocess_tqdm.close()
 
+    # release the readers' prefetch caches
+    for reader in [pcd_reader, img_reader, clb_reader, lbl_reader]:
+        if reader: reader.close()
+
     logger.log('Processing complete.', Logger.INFO)
 
 def main():
@@ -317,14 +481,22 @@ def main():
     the data faster by utilizing multiple threads and removing GUI and
     other interactive elements.
 
-    Note 1: Currently, this doesn't work with live sensor data streams.
-    Note 2: Currently, this doesn't work with multi-frame dependent algorithms
-    such as calculating background filters using multiple frames (you can use a pre-calculated filter though), tracking, etc.
+    Use --workers N to process frames concurrently in N processes.
+    Stateless algorithms are run frame-parallel in the process pool,
+    while stateful ones (background filter gathering, trajectories, etc.)
+    are run on one frame at a time in order. Use --batch_size B to
+    give up to B frames at once to the algorithms that support it,
+    e.g. a single forward pass of PointPillars over B point clouds.
+
+    Note: Currently, this doesn't work with live sensor data streams.
     """
     import argparse
     parser = argparse.ArgumentParser(description=f'{description}')
     parser.add_argument('pipeline_dir', type=str, help='Path to the pipleine directory.')
     parser.add_argument('--max_queue_size', type=int, default=10, help='Maximum size of the queues.')
+    parser.add_argument('--workers', type=int, default=1, help='Number of worker processes running stateless algorithms frame-parallel.')
+    parser.add_argument('--batch_size', type=int, default=1, help='Maximum number of frames given at once to algorithms that support batches.')
+    parser.add_argument('--io_workers', type=int, default=1, help='Number of workers decoding frames of each modality in parallel.')
     args = parser.parse_args()
     bulk_process(args)
 
@@ -7,6 +7,8 @@ from liguard.gui.config_gui import BaseConfiguration as BaseConfigurationGUI
 from liguard.gui.config_gui import resolve_for_application_root, resolve_for_default_workspace
 from liguard.gui.logger_gui import Logger
 from liguard.liguard_profiler import Profiler
+from liguard.algo.utils import fuse_processes
+from liguard.algo.models import preload_models
 
 from liguard.pcd.file_io import FileIO as PCD_File_IO
 from liguard.pcd.sensor_io import SensorIO as PCD_Sensor_IO
@@ -278,6 +280,7 @@ class LiGuard:
                 except Exception:
                     self.logger.log(f'lidar_processes creation failed for {proc.__name__}:\n{traceback.format_exc()}', Logger.CRITICAL)
         self.lidar_processes = [self.lidar_processes[priority] for priority in sorted(self.lidar_processes.keys())]
+        self.lidar_processes = fuse_processes(self.lidar_processes, built_in_lidar_modules)
         self.logger.log(f'enabled lidar_processes: {[f.__name__ for f in self.lidar_processes]}', Logger.DEBUG)
         
         # camera processes
@@ -344,6 +347,9 @@ class LiGuard:
             
         self.post_processes = [self.post_processes[priority] for priority in sorted(self.post_processes.keys())]
         self.logger.log(f'enabled post_processes: {[f.__name__ for f in self.post_processes]}', Logger.DEBUG)
+
+        # load the models of the enabled processes in background, the models of the previous configuration are kept in the model registry and aren't reloaded
+        preload_models(cfg, self.pre_processes + self.lidar_processes + self.camera_processes + self.calib_processes + self.label_processes + self.post_processes, self.logger)
         
     def start(self, cfg):
         # start the LiGuard
@@ -522,6 +528,7 @@ class LiGuard:
         # close the data sources
         if self.pcd_io: self.pcd_io.close()
         if self.img_io: self.img_io.close()
+        if self.clb_io: self.clb_io.close()
         if self.lbl_io: self.lbl_io.close()
         
         # close the visualizers
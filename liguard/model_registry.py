@@ -0,0 +1,176 @@
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from liguard.frame_cache import sizeof_frame
+
+"""
+The module model_registry.py contains a process-wide registry of the loaded models of the neural-network based algorithms (`PointPillarDetection`, `UltralyticsYOLOv5`, etc.). Instead of keeping their models in the data dict, where they're lost on every configuration reload, the algorithms get them from the registry by a key made of the algorithm name, the checkpoint, the device, and a hash of the parameters the model depends on. Models can be loaded eagerly in background when the pipeline is built, and the least-recently-used models are unloaded once the memory budget is exceeded.
+"""
+
+default_models_cfg = dict(
+    max_megabytes=4096, # maximum memory used by the loaded models in MB, 0 means no limit
+    preload=True, # load the models of the enabled algorithms in background when the pipeline is built
+)
+
+def get_models_cfg(cfg: dict) -> dict:
+    """
+    Gets the model registry configuration from the pipeline configuration, falling back to defaults for missing keys.
+
+    Args:
+        cfg (dict): Pipeline configuration dictionary.
+
+    Returns:
+        dict: Model registry configuration with keys `max_megabytes` and `preload`.
+    """
+    models_cfg = dict(default_models_cfg)
+    if isinstance(cfg.get('models', None), dict): models_cfg.update(cfg['models'])
+    return models_cfg
+
+def make_model_key(algo_name: str, ckpt: str, device: str, params: dict) -> tuple:
+    """
+    Makes the registry key of a model.
+
+    Args:
+        algo_name (str): Name of the algorithm using the model.
+        ckpt (str): Checkpoint path or name of the model.
+        device (str): Device the model is loaded on, e.g. 'cpu' or 'cuda'.
+        params (dict): Parameters the model depends on, parameters that don't change the model must be left out so that toggling them doesn't reload it.
+
+    Returns:
+        tuple: (algo_name, ckpt, device, params hash).
+    """
+    params_hash = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+    return (algo_name, ckpt, device, params_hash)
+
+def sizeof_model(model) -> int:
+    """
+    Estimates the memory footprint of a model in bytes. Torch modules are counted by their parameters and buffers, everything else as a frame.
+
+    Args:
+        model: Loaded model.
+
+    Returns:
+        int: Estimated size in bytes.
+    """
+    if hasattr(model, 'parameters') and hasattr(model, 'buffers'):
+        return sum(tensor.numel() * tensor.element_size() for tensor in list(model.parameters()) + list(model.buffers()))
+    return sizeof_frame(model)
+
+class ModelRegistry:
+    """
+    Process-wide LRU registry of loaded models.
+
+    Args:
+        max_megabytes (float): Maximum memory used by the loaded models in MB, 0 means no limit.
+
+    Attributes:
+        lock (threading.Lock): Lock guarding the registry, models are requested and loaded from several threads.
+        models (OrderedDict): Futures of the models by key, ordered from least to most recently used.
+        sizes (dict): Estimated sizes of the loaded models by key.
+        nbytes (int): Total estimated size of the loaded models.
+        max_bytes (int): Maximum number of bytes of the loaded models, 0 means no limit.
+    """
+    def __init__(self, max_megabytes: float = 0):
+        self.lock = threading.Lock()
+        self.models = OrderedDict()
+        self.sizes = dict()
+        self.nbytes = 0
+        self.max_bytes = int(float(max_megabytes) * 1024 * 1024)
+
+    def configure(self, cfg: dict):
+        """
+        Sets the memory budget from the pipeline configuration, the models over the new budget are unloaded.
+
+        Args:
+            cfg (dict): Pipeline configuration dictionary, the registry parameters are read from `cfg['models']`.
+        """
+        with self.lock:
+            self.max_bytes = int(float(get_models_cfg(cfg)['max_megabytes']) * 1024 * 1024)
+            self.__evict__()
+
+    def __evict__(self, keep: tuple = None):
+        """
+        Unloads least-recently-used models until the registry is within budget. Models being loaded and `keep` are never unloaded.
+        Must be called with `self.lock` held.
+        """
+        if self.max_bytes <= 0: return
+        for key in list(self.models.keys()):
+            if self.nbytes <= self.max_bytes: break
+            if key == keep or key not in self.sizes: continue
+            del self.models[key]
+            self.nbytes -= self.sizes.pop(key)
+
+    def get(self, key: tuple, load_fn: callable):
+        """
+        Returns the model of a key, loading it with `load_fn` if it isn't loaded yet. If the model is being loaded by another thread, e.g. the background preloading, waits for it instead of loading it twice.
+
+        Args:
+            key (tuple): Key of the model, see `make_model_key`.
+            load_fn (callable): Function without arguments that loads and returns the model.
+
+        Returns:
+            The loaded model.
+        """
+        with self.lock:
+            future = self.models.get(key, None)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.models[key] = future
+            else: self.models.move_to_end(key)
+        if owner:
+            try: model = load_fn()
+            except BaseException as e:
+                with self.lock:
+                    if self.models.get(key, None) is future: del self.models[key]
+                future.set_exception(e)
+                raise
+            with self.lock:
+                # the registry may have been cleared while loading
+                if self.models.get(key, None) is future:
+                    self.sizes[key] = sizeof_model(model)
+                    self.nbytes += self.sizes[key]
+                    self.__evict__(keep=key)
+            future.set_result(model)
+        return future.result()
+
+    def preload(self, key: tuple, load_fn: callable, on_error: callable = None) -> threading.Thread:
+        """
+        Loads a model in a background thread, `get` waits for it if the model is requested before it's loaded.
+
+        Args:
+            key (tuple): Key of the model, see `make_model_key`.
+            load_fn (callable): Function without arguments that loads and returns the model.
+            on_error (callable): Function called with the exception if the loading fails, or None.
+
+        Returns:
+            threading.Thread: The started loading thread.
+        """
+        def preload_fn():
+            try: self.get(key, load_fn)
+            except Exception as e:
+                if on_error: on_error(e)
+        thread = threading.Thread(target=preload_fn, daemon=True)
+        thread.start()
+        return thread
+
+    def __contains__(self, key: tuple):
+        with self.lock: return key in self.models
+
+    def __len__(self):
+        with self.lock: return len(self.models)
+
+    def clear(self):
+        """
+        Unloads all the models.
+        """
+        with self.lock:
+            self.models.clear()
+            self.sizes.clear()
+            self.nbytes = 0
+
+# the registry of the process, it outlives the pipelines so that reloading a configuration doesn't reload the models
+model_registry = ModelRegistry(default_models_cfg['max_megabytes'])
@@ -1,13 +1,15 @@
 import os
 from liguard.gui.config_gui import resolve_for_application_root, resolve_for_default_workspace
 import glob
-import time
-import threading
+
+from liguard.frame_cache import FrameCache
 
 import numpy as np
-import open3d as o3d
+
+from liguard.pcd.parsers import read_pcd, read_ply
 
 supported_file_types = ['.bin', '.npy', '.ply', '.pcd']
+supported_mmap_file_types = ['.bin', '.npy']
 
 class FileIO:
     """
@@ -24,9 +26,8 @@ class FileIO:
         pcd_count (int): Number of point cloud files to read.
         files_basenames (list): List of file basenames (without extension) of the point cloud files.
         reader (function): Function to read the point cloud file based on its type.
-        data_lock (threading.Lock): Lock for thread-safe access to the data list.
-        data (list): List of tuples containing the absolute file path and the loaded point cloud data.
-        stop (threading.Event): Event to stop the asynchronous reading thread.
+        mmap (bool): If True, `.bin` and `.npy` files are memory-mapped instead of being read into memory.
+        cache (FrameCache): Bounded cache of tuples containing the absolute file path and the loaded point cloud data, prefetched around the last requested index. None if `mmap` is True.
 
     """
 
@@ -49,12 +50,16 @@ class FileIO:
         if self.pcd_type not in supported_file_types:
             raise NotImplementedError("File type not supported. Supported file types: " + ', '.join(supported_file_types) + ".")
         self.reader = getattr(self, '__read_' + self.pcd_type[1:] + '__')
-        
-        self.data_lock = threading.Lock()
-        self.data = []
-        self.stop = threading.Event()
-        # Start the asynchronous reading thread
-        threading.Thread(target=self.__async_read_fn__).start()
+
+        # Memory-mapping is opt-in and only possible for raw binary formats
+        self.mmap = cfg['data']['lidar'].get('mmap', False) and self.pcd_type in supported_mmap_file_types
+        if self.mmap:
+            self.reader = getattr(self, '__read_' + self.pcd_type[1:] + '_mmap__')
+            # mapping a file is O(1) and the OS page cache already keeps the frames, so no prefetching is needed
+            self.cache = None
+        else:
+            # Start the windowed prefetch cache
+            self.cache = FrameCache(self.__read_frame__, len(self.files_basenames), cfg)
     
     def __read_bin__(self, file_abs_path: str):
         """
@@ -82,9 +87,40 @@ class FileIO:
         """
         return np.load(file_abs_path)
 
+    def __read_bin_mmap__(self, file_abs_path: str):
+        """
+        Memory-map point cloud data from a binary file without reading it into memory.
+
+        The mapping is private (copy-on-write): the returned array shares the OS page cache with the file, and a page is only copied if an algorithm modifies the array in-place. The file on disk is never modified.
+
+        Args:
+            file_abs_path (str): Absolute path of the binary file.
+
+        Returns:
+            numpy.ndarray: Memory-mapped point cloud data as a numpy array.
+
+        """
+        if os.path.getsize(file_abs_path) == 0: return np.zeros((0, 4), dtype=np.float32)
+        return np.memmap(file_abs_path, dtype=np.float32, mode='c').reshape(-1,4).view(np.ndarray)
+
+    def __read_npy_mmap__(self, file_abs_path: str):
+        """
+        Memory-map point cloud data from a numpy file without reading it into memory.
+
+        The mapping is private (copy-on-write): the returned array shares the OS page cache with the file, and a page is only copied if an algorithm modifies the array in-place. The file on disk is never modified.
+
+        Args:
+            file_abs_path (str): Absolute path of the numpy file.
+
+        Returns:
+            numpy.ndarray: Memory-mapped point cloud data as a numpy array.
+
+        """
+        return np.load(file_abs_path, mmap_mode='c').view(np.ndarray)
+
     def __read_ply__(self, file_abs_path: str):
         """
-        Read point cloud data from a PLY file.
+        Read point cloud data from a PLY file, keeping the intensity field if present.
 
         Args:
             file_abs_path (str): Absolute path of the PLY file.
@@ -93,13 +129,11 @@ class FileIO:
             numpy.ndarray: Loaded point cloud data as a numpy array.
 
         """
-        points = np.asarray(o3d.io.read_point_cloud(file_abs_path).points, dtype=np.float32)
-        points = np.hstack((points, np.ones((points.shape[0], 1), dtype=np.float32)))
-        return points
+        return read_ply(file_abs_path)
     
     def __read_pcd__(self, file_abs_path: str):
         """
-        Read point cloud data from a PCD file.
+        Read point cloud data from an ascii, binary, or binary_compressed PCD file, keeping the intensity field if present.
 
         Args:
             file_abs_path (str): Absolute path of the PCD file.
@@ -108,9 +142,7 @@ class FileIO:
             numpy.ndarray: Loaded point cloud data as a numpy array.
 
         """
-        points = np.asarray(o3d.io.read_point_cloud(file_abs_path).points, dtype=np.float32)
-        points = np.hstack((points, np.ones((points.shape[0], 1), dtype=np.float32)))
-        return points
+        return read_pcd(file_abs_path)
         
     def get_abs_path(self, idx: int):
         """
@@ -125,19 +157,19 @@ class FileIO:
         """
         return os.path.join(self.pcd_dir, self.files_basenames[idx] + self.pcd_type)
         
-    def __async_read_fn__(self):
+    def __read_frame__(self, idx: int):
         """
-        Asynchronous function to read point cloud files in the background.
+        Read the point cloud file at the specified index, used by the prefetch cache.
+
+        Args:
+            idx (int): Index of the file basename in the list.
+
+        Returns:
+            tuple: Tuple containing the absolute file path and the loaded point cloud data.
 
         """
-        for idx in range(len(self.files_basenames)):
-            if self.stop.is_set():
-                break
-            file_abs_path = self.get_abs_path(idx)
-            pcd_np = self.reader(file_abs_path)
-            with self.data_lock:
-                self.data.append((file_abs_path, pcd_np))
-            time.sleep(self.cfg['threads']['io_sleep'])
+        file_abs_path = self.get_abs_path(idx)
+        return (file_abs_path, self.reader(file_abs_path))
         
     def __len__(self):
         """
@@ -160,16 +192,13 @@ class FileIO:
             tuple: Tuple containing the absolute file path and the loaded point cloud data.
 
         """
-        try:
-            with self.data_lock:
-                return self.data[idx]
-        except:
-            file_abs_path = self.get_abs_path(idx)
-            return (file_abs_path, self.reader(file_abs_path))
+        # every call maps the file anew, so in-place changes to a frame never leak into the next request of the same frame
+        if self.mmap: return self.__read_frame__(idx)
+        return self.cache[idx]
         
     def close(self):
         """
-        Close the point cloud files reading thread.
+        Close the point cloud files prefetching thread and release the cached frames.
 
         """
-        self.stop.set()
\ No newline at end of file
+        if self.cache: self.cache.close()
\ No newline at end of file
@@ -0,0 +1,219 @@
+import warnings
+import numpy as np
+
+try: import lzf # optional, much faster decompression of binary_compressed PCD files, installed with `pip install LiGuard[lzf]`
+except ImportError: lzf = None
+
+"""
+The module parsers.py contains NumPy-based parsers for PCD and PLY point cloud files. The headers are parsed in Python and the bodies are decoded directly into NumPy structured arrays, so the point clouds are read without going through Open3D and the real intensity field is kept.
+
+Supported encodings:
+- PCD: `ascii`, `binary`, and `binary_compressed` (LZF).
+- PLY: `ascii`, `binary_little_endian`, and `binary_big_endian`.
+
+All the parsers return an `Nx4` float32 array of `(x, y, z, intensity)`. If a file has no intensity field, the intensity is set to 1.0.
+"""
+
+# field names, in order of preference, that are treated as intensity
+intensity_field_names = ['intensity', 'i', 'scalar_intensity', 'reflectivity', 'reflectance', 'remission']
+
+pcd_types = {
+    ('F', 4): 'f4', ('F', 8): 'f8',
+    ('I', 1): 'i1', ('I', 2): 'i2', ('I', 4): 'i4', ('I', 8): 'i8',
+    ('U', 1): 'u1', ('U', 2): 'u2', ('U', 4): 'u4', ('U', 8): 'u8',
+}
+
+ply_types = {
+    'char': 'i1', 'int8': 'i1', 'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2', 'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4', 'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4', 'double': 'f8', 'float64': 'f8',
+}
+
+def lzf_decompress(data: bytes, uncompressed_size: int) -> bytes:
+    """
+    Decompresses LZF compressed data. Uses the `lzf` module of the `python-lzf` package if installed, otherwise a pure-Python implementation that is much slower and warns about it.
+
+    Args:
+        data (bytes): LZF compressed data.
+        uncompressed_size (int): Size of the decompressed data in bytes.
+
+    Returns:
+        bytes: Decompressed data.
+    """
+    if lzf is not None:
+        out = lzf.decompress(data, uncompressed_size)
+        if out is None or len(out) != uncompressed_size: raise ValueError(f'LZF decompression failed: expected {uncompressed_size} bytes.')
+        return out
+
+    warnings.warn('binary_compressed PCD files are decompressed in pure Python, which is slow. Install the LZF decompressor with `pip install LiGuard[lzf]` (or `pip install python-lzf`).', RuntimeWarning, stacklevel=2)
+    out = bytearray(uncompressed_size)
+    ip, op, n = 0, 0, len(data)
+    while ip < n:
+        ctrl = data[ip]
+        ip += 1
+        if ctrl < 32:
+            # literal run of ctrl + 1 bytes
+            ctrl += 1
+            out[op:op + ctrl] = data[ip:ip + ctrl]
+            ip += ctrl
+            op += ctrl
+        else:
+            # back reference
+            length = ctrl >> 5
+            ref = op - ((ctrl & 0x1f) << 8) - 1
+            if length == 7:
+                length += data[ip]
+                ip += 1
+            ref -= data[ip]
+            ip += 1
+            length += 2
+            if ref + length <= op: out[op:op + length] = out[ref:ref + length]
+            else:
+                # overlapping reference, repeat the pattern
+                pattern = out[ref:op]
+                out[op:op + length] = (pattern * (length // len(pattern) + 1))[:length]
+            op += length
+    if op != uncompressed_size: raise ValueError(f'LZF decompression failed: expected {uncompressed_size} bytes, got {op}.')
+    return bytes(out)
+
+def __to_xyzi__(get_field, field_names: list, number_of_points: int) -> np.ndarray:
+    """
+    Assembles an `Nx4` float32 array of `(x, y, z, intensity)` from decoded fields.
+
+    Args:
+        get_field (callable): Function that takes a field name and returns its values as a 1D array.
+        field_names (list): Names of the available fields.
+        number_of_points (int): Number of points.
+
+    Returns:
+        np.ndarray: Nx4 float32 array.
+    """
+    lower_names = {name.lower(): name for name in field_names}
+    for name in ['x', 'y', 'z']:
+        if name not in lower_names: raise ValueError(f'Point cloud has no "{name}" field. Available fields: {field_names}.')
+
+    points = np.empty((number_of_points, 4), dtype=np.float32)
+    points[:, 0] = get_field(lower_names['x'])
+    points[:, 1] = get_field(lower_names['y'])
+    points[:, 2] = get_field(lower_names['z'])
+    intensity_name = next((lower_names[name] for name in intensity_field_names if name in lower_names), None)
+    if intensity_name is None: points[:, 3] = 1.0
+    else: points[:, 3] = get_field(intensity_name)
+    return points
+
+def read_pcd(file_abs_path: str) -> np.ndarray:
+    """
+    Reads a PCD file.
+
+    Args:
+        file_abs_path (str): Absolute path of the PCD file.
+
+    Returns:
+        np.ndarray: Nx4 float32 array of `(x, y, z, intensity)`.
+    """
+    with open(file_abs_path, 'rb') as f: raw = f.read()
+
+    # parse header
+    header = dict()
+    offset = 0
+    while True:
+        line_end = raw.find(b'\n', offset)
+        if line_end == -1: raise ValueError(f'Invalid PCD file, DATA line not found: {file_abs_path}')
+        line = raw[offset:line_end].decode('ascii', errors='ignore').strip()
+        offset = line_end + 1
+        if len(line) == 0 or line.startswith('#'): continue
+        key, *values = line.split()
+        header[key.upper()] = values
+        if key.upper() == 'DATA': break
+
+    fields = header['FIELDS']
+    sizes = [int(s) for s in header['SIZE']]
+    types = [t.upper() for t in header['TYPE']]
+    counts = [int(c) for c in header['COUNT']] if 'COUNT' in header else [1] * len(fields)
+    if 'POINTS' in header: number_of_points = int(header['POINTS'][0])
+    else: number_of_points = int(header['WIDTH'][0]) * int(header['HEIGHT'][0])
+    data_type = header['DATA'][0].lower()
+
+    # PCD allows repeated field names, such as '_' for padding, make them unique
+    names = [name if fields.index(name) == i else f'{name}_{i}' for i, name in enumerate(fields)]
+    dtypes = [np.dtype('<' + pcd_types[(t, s)]) for t, s in zip(types, sizes)]
+
+    if data_type == 'ascii':
+        values = np.fromstring(raw[offset:].decode('ascii', errors='ignore'), dtype=np.float64, sep=' ')
+        values = values[:number_of_points * sum(counts)].reshape(number_of_points, sum(counts))
+        column_offsets = np.cumsum([0] + counts[:-1])
+        columns = {name: values[:, column_offsets[i]] for i, name in enumerate(names)}
+        return __to_xyzi__(columns.__getitem__, names, number_of_points)
+    elif data_type == 'binary':
+        # rows are stored as packed structs (array of structs)
+        struct_dtype = np.dtype([(name, dtype, (count,)) if count > 1 else (name, dtype) for name, dtype, count in zip(names, dtypes, counts)])
+        structured = np.frombuffer(raw, dtype=struct_dtype, count=number_of_points, offset=offset)
+        get_field = lambda name: structured[name] if structured[name].ndim == 1 else structured[name][:, 0]
+        return __to_xyzi__(get_field, names, number_of_points)
+    elif data_type == 'binary_compressed':
+        # header is followed by compressed and uncompressed sizes, then LZF compressed fields stored one after another (struct of arrays)
+        compressed_size, uncompressed_size = np.frombuffer(raw, dtype='<u4', count=2, offset=offset)
+        offset += 8
+        body = lzf_decompress(raw[offset:offset + int(compressed_size)], int(uncompressed_size))
+        columns = dict()
+        field_offset = 0
+        for name, dtype, count in zip(names, dtypes, counts):
+            columns[name] = np.frombuffer(body, dtype=dtype, count=number_of_points * count, offset=field_offset)[::count]
+            field_offset += number_of_points * count * dtype.itemsize
+        return __to_xyzi__(columns.__getitem__, names, number_of_points)
+    else:
+        raise NotImplementedError(f'PCD data type "{data_type}" not supported. Supported data types: ascii, binary, binary_compressed.')
+
+def read_ply(file_abs_path: str) -> np.ndarray:
+    """
+    Reads the vertices of a PLY file.
+
+    Args:
+        file_abs_path (str): Absolute path of the PLY file.
+
+    Returns:
+        np.ndarray: Nx4 float32 array of `(x, y, z, intensity)`.
+    """
+    with open(file_abs_path, 'rb') as f: raw = f.read()
+
+    # parse header
+    if not raw.startswith(b'ply'): raise ValueError(f'Invalid PLY file: {file_abs_path}')
+    header_end = raw.find(b'end_header')
+    if header_end == -1: raise ValueError(f'Invalid PLY file, end_header not found: {file_abs_path}')
+    offset = raw.find(b'\n', header_end) + 1
+    data_format = None
+    elements = [] # list of [name, count, properties], properties are (name, dtype) or (name, count_dtype, item_dtype) for lists
+    for line in raw[:header_end].decode('ascii', errors='ignore').splitlines():
+        parts = line.split()
+        if len(parts) == 0: continue
+        if parts[0] == 'format': data_format = parts[1]
+        elif parts[0] == 'element': elements.append([parts[1], int(parts[2]), []])
+        elif parts[0] == 'property':
+            if parts[1] == 'list': elements[-1][2].append((parts[4], ply_types[parts[2]], ply_types[parts[3]]))
+            else: elements[-1][2].append((parts[2], ply_types[parts[1]]))
+
+    vertex_idx = next((i for i, element in enumerate(elements) if element[0] == 'vertex'), None)
+    if vertex_idx is None: raise ValueError(f'PLY file has no vertex element: {file_abs_path}')
+    _, number_of_points, properties = elements[vertex_idx]
+    if any(len(prop) == 3 for prop in properties): raise NotImplementedError('List properties in PLY vertex element are not supported.')
+    names = [prop[0] for prop in properties]
+
+    if data_format == 'ascii':
+        lines = raw[offset:].split(b'\n')
+        # skip the lines of elements stored before the vertices
+        first_line = sum(element[1] for element in elements[:vertex_idx])
+        vertex_block = b' '.join(lines[first_line:first_line + number_of_points]).decode('ascii', errors='ignore')
+        values = np.fromstring(vertex_block, dtype=np.float64, sep=' ').reshape(number_of_points, len(names))
+        return __to_xyzi__(lambda name: values[:, names.index(name)], names, number_of_points)
+    elif data_format in ['binary_little_endian', 'binary_big_endian']:
+        byte_order = '<' if data_format == 'binary_little_endian' else '>'
+        # skip the elements stored before the vertices
+        for name, count, element_properties in elements[:vertex_idx]:
+            if any(len(prop) == 3 for prop in element_properties): raise NotImplementedError(f'PLY elements with list properties before the vertex element are not supported.')
+            offset += count * np.dtype([(prop[0], byte_order + prop[1]) for prop in element_properties]).itemsize
+        struct_dtype = np.dtype([(prop[0], byte_order + prop[1]) for prop in properties])
+        structured = np.frombuffer(raw, dtype=struct_dtype, count=number_of_points, offset=offset)
+        return __to_xyzi__(structured.__getitem__, names, number_of_points)
+    else:
+        raise NotImplementedError(f'PLY format "{data_format}" not supported. Supported formats: ascii, binary_little_endian, binary_big_endian.')
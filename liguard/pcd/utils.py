@@ -1,3 +1,4 @@
+import threading
 import open3d as o3d
 import numpy as np
 
@@ -5,6 +6,8 @@ import numpy as np
 The module utils.py contains utility functions for working with point clouds. If you think that a function can be reused in other parts of the framework, you can move it to the utils.py module.
 """
 
+__scratch_buffers__ = threading.local() # per-thread buffers reused across frames by the per-frame kernels
+
 def create_pcd(points: np.ndarray) -> o3d.geometry.PointCloud:
     """
     Create a PointCloud object from a numpy array of points.
@@ -56,4 +59,299 @@ def get_fixed_sized_point_cloud(point_cloud: np.ndarray, number_of_points: int)
     # crop if more points
     elif point_cloud.shape[0] > number_of_points:
         point_cloud = point_cloud[:number_of_points]
-    return point_cloud
\ No newline at end of file
+    return point_cloud
+
+def calc_cluster_records(labels: np.ndarray) -> tuple:
+    """
+    Calculate the compact representation of the clusters of a point cloud. Instead of a boolean mask per cluster, the points are sorted by cluster label once, and every cluster is a record of its label, its number of points, and the offset of its points in the sorted order.
+
+    Args:
+        labels (np.ndarray): Cluster label of every point with shape (N,), negative labels are noise.
+
+    Returns:
+        tuple: The argsort permutation of the labels with shape (N,), and a list of cluster records as dicts with `cluster_label`, `number_of_points`, and `offset` keys, noise excluded.
+    """
+    order = np.argsort(labels, kind='stable').astype(np.int32)
+    sorted_labels = labels[order]
+    starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]]) if len(labels) else np.empty(0, dtype=np.int64)
+    number_of_points = np.diff(np.r_[starts, len(labels)])
+    records = [{'cluster_label': int(sorted_labels[start]), 'number_of_points': int(count), 'offset': int(start)} for start, count in zip(starts, number_of_points) if sorted_labels[start] >= 0]
+    return order, records
+
+def get_cluster_point_indices(cluster_point_order: np.ndarray, lidar_cluster_dict: dict) -> np.ndarray:
+    """
+    Get the indices of the points of a cluster.
+
+    Args:
+        cluster_point_order (np.ndarray): Argsort permutation of the cluster labels, as returned by `calc_cluster_records`.
+        lidar_cluster_dict (dict): Cluster record, as returned by `calc_cluster_records`.
+
+    Returns:
+        np.ndarray: Indices of the points of the cluster, a view of `cluster_point_order`.
+    """
+    offset = lidar_cluster_dict['offset']
+    return cluster_point_order[offset:offset + lidar_cluster_dict['number_of_points']]
+
+def calc_cluster_boxes(points: np.ndarray, labels: np.ndarray, order: np.ndarray = None) -> dict:
+    """
+    Calculate the bounding boxes of all the clusters of a point cloud at once. The points are sorted by cluster label so that the per-cluster reductions are single `np.ufunc.reduceat` calls instead of one boolean mask per cluster.
+
+    The yaw of a cluster is the direction of the principal axis of its points in the xy-plane, and the oriented box is the tightest box around the points that is aligned with this axis in the xy-plane and with the z-axis vertically.
+
+    Args:
+        points (np.ndarray): Point cloud with shape (N, 3) or (N, 4).
+        labels (np.ndarray): Cluster label of every point with shape (N,), negative labels are noise.
+        order (np.ndarray): Argsort permutation of the labels, e.g. from `calc_cluster_records`, computed if None.
+
+    Returns:
+        dict: Per-cluster arrays, sorted by cluster label:
+            - cluster_labels (np.ndarray): Labels of the K clusters with shape (K,).
+            - number_of_points (np.ndarray): Number of points in each cluster with shape (K,).
+            - min_xyz (np.ndarray): Minimum bound of the axis-aligned boxes with shape (K, 3).
+            - max_xyz (np.ndarray): Maximum bound of the axis-aligned boxes with shape (K, 3).
+            - centroid (np.ndarray): Mean of the points with shape (K, 3).
+            - yaw (np.ndarray): Yaw of the oriented boxes with shape (K,).
+            - oriented_center (np.ndarray): Center of the oriented boxes with shape (K, 3).
+            - oriented_extent (np.ndarray): Extent of the oriented boxes, along and across the principal axis and vertically, with shape (K, 3).
+    """
+    # sort the points by label, each cluster is then a contiguous segment
+    if order is None: order = np.argsort(labels, kind='stable')
+    order = order[labels[order] >= 0]
+    point_labels, cluster_points = labels[order], points[order, :3].astype(np.float64)
+    starts = np.flatnonzero(np.r_[True, point_labels[1:] != point_labels[:-1]]) if len(point_labels) else np.empty(0, dtype=np.int64)
+    number_of_points = np.diff(np.r_[starts, len(point_labels)])
+    if len(starts) == 0:
+        return dict(cluster_labels=point_labels[:0], number_of_points=number_of_points, min_xyz=np.empty((0, 3)), max_xyz=np.empty((0, 3)), centroid=np.empty((0, 3)), yaw=np.empty(0), oriented_center=np.empty((0, 3)), oriented_extent=np.empty((0, 3)))
+    cluster_of_point = np.repeat(np.arange(len(starts)), number_of_points)
+
+    # axis-aligned boxes and centroids
+    min_xyz = np.minimum.reduceat(cluster_points, starts, axis=0)
+    max_xyz = np.maximum.reduceat(cluster_points, starts, axis=0)
+    centroid = np.add.reduceat(cluster_points, starts, axis=0) / number_of_points[:, None]
+
+    # yaw of the principal axis of the xy covariance
+    centered = cluster_points[:, :2] - centroid[cluster_of_point, :2]
+    sxx = np.add.reduceat(centered[:, 0] * centered[:, 0], starts)
+    syy = np.add.reduceat(centered[:, 1] * centered[:, 1], starts)
+    sxy = np.add.reduceat(centered[:, 0] * centered[:, 1], starts)
+    yaw = 0.5 * np.arctan2(2 * sxy, sxx - syy)
+
+    # bounds of the points along and across the principal axis
+    cos_yaw, sin_yaw = np.cos(yaw), np.sin(yaw)
+    along = cos_yaw[cluster_of_point] * centered[:, 0] + sin_yaw[cluster_of_point] * centered[:, 1]
+    across = -sin_yaw[cluster_of_point] * centered[:, 0] + cos_yaw[cluster_of_point] * centered[:, 1]
+    along_min, along_max = np.minimum.reduceat(along, starts), np.maximum.reduceat(along, starts)
+    across_min, across_max = np.minimum.reduceat(across, starts), np.maximum.reduceat(across, starts)
+    along_center, across_center = (along_min + along_max) / 2, (across_min + across_max) / 2
+    oriented_center = np.stack([centroid[:, 0] + cos_yaw * along_center - sin_yaw * across_center,
+                                centroid[:, 1] + sin_yaw * along_center + cos_yaw * across_center,
+                                (min_xyz[:, 2] + max_xyz[:, 2]) / 2], axis=1)
+    oriented_extent = np.stack([along_max - along_min, across_max - across_min, max_xyz[:, 2] - min_xyz[:, 2]], axis=1)
+
+    return dict(cluster_labels=point_labels[starts], number_of_points=number_of_points, min_xyz=min_xyz, max_xyz=max_xyz, centroid=centroid, yaw=yaw, oriented_center=oriented_center, oriented_extent=oriented_extent)
+
+def downsample_point_cloud(point_cloud: np.ndarray, leaf_size: float, reduction: str = 'centroid', point_colors: np.ndarray = None) -> tuple:
+    """
+    Downsample a point cloud to one point per voxel. The voxels are hashed into linear keys, so that all the points are reduced at once.
+
+    Args:
+        point_cloud (np.ndarray): Point cloud with shape (N, 3) or (N, 4), the intensity is kept.
+        leaf_size (float): Side of the voxels.
+        reduction (str): 'centroid' to average all the columns of the points in a voxel, or 'first' to keep the first point of every voxel.
+        point_colors (np.ndarray): Optional colors of the points with shape (N, 3), reduced the same way as the points.
+
+    Returns:
+        tuple: The downsampled point cloud with shape (M, 3) or (M, 4), in the order of the first point of every voxel, its colors or None, and the index map with shape (N,) holding the row of the downsampled point cloud of every point, -1 for points that aren't finite. Any per-point values of the downsampled point cloud, e.g. cluster labels, can be scattered back to the original points with `values[index_map]`.
+    """
+    index_map = np.full(len(point_cloud), -1, dtype=np.int32)
+    finite_indices = np.flatnonzero(np.all(np.isfinite(point_cloud[:, :3]), axis=1))
+    if len(finite_indices) == 0: return point_cloud[:0], None if point_colors is None else point_colors[:0], index_map
+
+    # hash the voxels into linear keys
+    voxels = np.floor(point_cloud[finite_indices, :3] / leaf_size).astype(np.int64)
+    voxels -= voxels.min(axis=0)
+    dims = voxels.max(axis=0) + 1
+    keys = (voxels[:, 0] * dims[1] + voxels[:, 1]) * dims[2] + voxels[:, 2]
+    _, first_indices, voxel_of_point = np.unique(keys, return_index=True, return_inverse=True)
+    # number the voxels in the order of their first point, which keeps the order of the points
+    voxel_order = np.argsort(first_indices)
+    voxel_rank = np.empty_like(voxel_order)
+    voxel_rank[voxel_order] = np.arange(len(voxel_order))
+    voxel_of_point = voxel_rank[voxel_of_point.ravel()]
+    index_map[finite_indices] = voxel_of_point
+
+    def reduce(values: np.ndarray) -> np.ndarray:
+        values = values[finite_indices]
+        if reduction == 'first': return values[first_indices[voxel_order]]
+        counts = np.bincount(voxel_of_point, minlength=len(voxel_order))
+        sums = np.stack([np.bincount(voxel_of_point, weights=values[:, column], minlength=len(voxel_order)) for column in range(values.shape[1])], axis=1)
+        return (sums / counts[:, None]).astype(values.dtype)
+
+    return reduce(point_cloud), None if point_colors is None else reduce(point_colors), index_map
+
+def __get_scratch_buffer__(name: str, shape: tuple, dtype) -> np.ndarray:
+    # grow the buffer of the calling thread if needed and return a view of the requested shape, the last axis is the one that varies across frames
+    buffer = getattr(__scratch_buffers__, name, None)
+    if buffer is None or buffer.dtype != dtype or buffer.shape[:-1] != shape[:-1] or buffer.shape[-1] < shape[-1]:
+        buffer = np.empty(shape, dtype=dtype)
+        setattr(__scratch_buffers__, name, buffer)
+    return buffer[..., :shape[-1]]
+
+def calc_rotation_matrix(angles: list) -> np.ndarray:
+    """
+    Calculate the rotation matrix of the `rotate` algorithm.
+
+    Args:
+        angles (list): Rotation angles about x, y, and z in degrees.
+
+    Returns:
+        np.ndarray: 3x3 float32 rotation matrix, the points are rotated with `points @ rotation_matrix.T`.
+    """
+    angles_rad = np.deg2rad(angles).astype(np.float32)
+    return np.array([[np.cos(angles_rad[1]) * np.cos(angles_rad[2]), np.cos(angles_rad[1]) * np.sin(angles_rad[2]), -np.sin(angles_rad[1])],
+                     [np.sin(angles_rad[0]) * np.sin(angles_rad[1]) * np.cos(angles_rad[2]) - np.cos(angles_rad[0]) * np.sin(angles_rad[2]), np.sin(angles_rad[0]) * np.sin(angles_rad[1]) * np.sin(angles_rad[2]) + np.cos(angles_rad[0]) * np.cos(angles_rad[2]), np.sin(angles_rad[0]) * np.cos(angles_rad[1])],
+                     [np.cos(angles_rad[0]) * np.sin(angles_rad[1]) * np.cos(angles_rad[2]) + np.sin(angles_rad[0]) * np.sin(angles_rad[2]), np.cos(angles_rad[0]) * np.sin(angles_rad[1]) * np.sin(angles_rad[2]) - np.sin(angles_rad[0]) * np.cos(angles_rad[2]), np.cos(angles_rad[0]) * np.cos(angles_rad[1])]])
+
+def transform_and_crop_point_cloud(point_cloud: np.ndarray, transform: np.ndarray, min_xyz: list, max_xyz: list) -> np.ndarray:
+    """
+    Transform a point cloud and crop it to an axis-aligned box in a single pass. The transformed coordinates and the box masks are computed in per-thread buffers that are reused across frames, so the only allocation is the cropped point cloud itself.
+
+    Args:
+        point_cloud (np.ndarray): Point cloud with shape (N, 3+), the extra columns are kept.
+        transform (np.ndarray): 4x4 rigid transform applied to the points.
+        min_xyz (list): Minimum x, y, z of the box, inclusive, in the transformed frame.
+        max_xyz (list): Maximum x, y, z of the box, inclusive, in the transformed frame.
+
+    Returns:
+        np.ndarray: The transformed points inside the box, in their original order.
+    """
+    number_of_points = len(point_cloud)
+    dtype = np.result_type(point_cloud.dtype, np.float32)
+    transform = np.asarray(transform, dtype=dtype)
+
+    # transform, one contiguous row per axis so that the crop compares contiguous coordinates
+    transformed = __get_scratch_buffer__('transformed', (3, number_of_points), dtype)
+    np.matmul(transform[:3, :3], point_cloud[:, :3].T, out=transformed)
+    if np.any(transform[:3, 3]): transformed += transform[:3, 3, None]
+
+    # crop, the limits are compared in the dtype of the points
+    min_xyz, max_xyz = np.asarray(min_xyz, dtype=dtype), np.asarray(max_xyz, dtype=dtype)
+    mask = __get_scratch_buffer__('mask', (number_of_points,), bool)
+    condition = __get_scratch_buffer__('condition', (number_of_points,), bool)
+    np.greater_equal(transformed[0], min_xyz[0], out=mask)
+    for axis in range(3):
+        if axis > 0:
+            np.greater_equal(transformed[axis], min_xyz[axis], out=condition)
+            mask &= condition
+        np.less_equal(transformed[axis], max_xyz[axis], out=condition)
+        mask &= condition
+
+    # gather the points inside straight into the output
+    indices = np.flatnonzero(mask)
+    cropped = np.empty((len(indices), point_cloud.shape[1]), dtype=dtype)
+    for axis in range(3): np.take(transformed[axis], indices, out=cropped[:, axis])
+    if point_cloud.shape[1] > 3: np.take(point_cloud[:, 3:], indices, axis=0, out=cropped[:, 3:])
+    return cropped
+
+def calc_box_rotation_matrices(xyz_euler_angles: np.ndarray) -> np.ndarray:
+    """
+    Calculate the rotation matrices of bounding boxes from their euler angles, the same as `o3d.geometry.OrientedBoundingBox.get_rotation_matrix_from_xyz` for every box.
+
+    Args:
+        xyz_euler_angles (np.ndarray): (K, 3) rotation angles about x, y, and z in radians.
+
+    Returns:
+        np.ndarray: (K, 3, 3) rotation matrices, a box's points are `center + rotation_matrix @ local point`.
+    """
+    xyz_euler_angles = np.asarray(xyz_euler_angles, dtype=np.float64).reshape(-1, 3)
+    cos, sin = np.cos(xyz_euler_angles), np.sin(xyz_euler_angles)
+    ones, zeros = np.ones(len(xyz_euler_angles)), np.zeros(len(xyz_euler_angles))
+    R_x = np.stack([ones, zeros, zeros, zeros, cos[:, 0], -sin[:, 0], zeros, sin[:, 0], cos[:, 0]], axis=1).reshape(-1, 3, 3)
+    R_y = np.stack([cos[:, 1], zeros, sin[:, 1], zeros, ones, zeros, -sin[:, 1], zeros, cos[:, 1]], axis=1).reshape(-1, 3, 3)
+    R_z = np.stack([cos[:, 2], -sin[:, 2], zeros, sin[:, 2], cos[:, 2], zeros, zeros, zeros, ones], axis=1).reshape(-1, 3, 3)
+    return R_x @ R_y @ R_z
+
+def calc_box_corners(xyz_center: np.ndarray, xyz_extent: np.ndarray, xyz_euler_angles: np.ndarray) -> np.ndarray:
+    """
+    Calculate the corners of oriented bounding boxes, for all the boxes at once.
+
+    Args:
+        xyz_center (np.ndarray): (K, 3) centers of the boxes.
+        xyz_extent (np.ndarray): (K, 3) extents of the boxes.
+        xyz_euler_angles (np.ndarray): (K, 3) euler angles of the boxes, see `calc_box_rotation_matrices`.
+
+    Returns:
+        np.ndarray: (K, 8, 3) float32 corners, the same points as `o3d.geometry.OrientedBoundingBox.get_box_points` in another order.
+    """
+    xyz_center = np.asarray(xyz_center, dtype=np.float32).reshape(-1, 3)
+    half_extent = np.asarray(xyz_extent, dtype=np.float32).reshape(-1, 3) / 2.0
+    rotation_matrices = calc_box_rotation_matrices(xyz_euler_angles).astype(np.float32)
+    # the 8 sign combinations of the half extents, in the box frames, then rotated and moved to the centers
+    corner_signs = np.array([[x, y, z] for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)], dtype=np.float32)
+    local_corners = corner_signs[None, :, :] * half_extent[:, None, :]
+    return local_corners @ rotation_matrices.transpose(0, 2, 1) + xyz_center[:, None, :]
+
+def points_in_boxes(points: np.ndarray, xyz_center: np.ndarray, xyz_extent: np.ndarray, xyz_euler_angles: np.ndarray, return_indices: bool = False):
+    """
+    Find the points inside oriented bounding boxes, for all the boxes at once.
+
+    The points are sorted once into a grid of x strips, by y within a strip, so the candidates of a box in a strip are a contiguous run found with a binary search on the axis-aligned bounds of the box. Only the candidates of all the boxes are transformed into their box frames, in one batched rotation.
+
+    Args:
+        points (np.ndarray): Point cloud with shape (N, 3+), only x, y, z are used.
+        xyz_center (np.ndarray): (K, 3) centers of the boxes.
+        xyz_extent (np.ndarray): (K, 3) extents of the boxes.
+        xyz_euler_angles (np.ndarray): (K, 3) euler angles of the boxes, see `calc_box_rotation_matrices`.
+        return_indices (bool): Return the indices of the points inside every box instead of their number.
+
+    Returns:
+        np.ndarray | list: (K,) number of points inside every box, or a list of K sorted point index arrays if `return_indices` is True. A point on the surface of a box is inside it.
+    """
+    xyz_center = np.asarray(xyz_center, dtype=np.float64).reshape(-1, 3)
+    half_extent = np.asarray(xyz_extent, dtype=np.float64).reshape(-1, 3) / 2.0
+    rotation_matrices = calc_box_rotation_matrices(xyz_euler_angles)
+    number_of_boxes = len(xyz_center)
+    # points that are not finite are in no box
+    finite_indices = np.flatnonzero(np.all(np.isfinite(points[:, :3]), axis=1))
+    if number_of_boxes == 0 or len(finite_indices) == 0:
+        return [np.zeros(0, dtype=np.int64) for _ in range(number_of_boxes)] if return_indices else np.zeros(number_of_boxes, dtype=np.int64)
+
+    # axis-aligned bounds of the boxes, with a margin so that rounding can't drop candidates
+    xy_half_range = np.einsum('kij,kj->ki', np.abs(rotation_matrices[:, :2, :]), half_extent) + 1e-4
+
+    # grid of x strips about as wide as the boxes, sorted by strip and then by y
+    x, y = points[finite_indices, 0].astype(np.float64), points[finite_indices, 1].astype(np.float64)
+    x_min, y_min = x.min(), y.min()
+    y_span = y.max() - y_min + 1.0
+    strip_width = max(float(np.median(xy_half_range[:, 0])) * 2.0, 1e-3)
+    number_of_strips = int((x.max() - x_min) // strip_width) + 1
+    keys = (x - x_min) // strip_width * y_span + (y - y_min)
+    sorting = np.argsort(keys)
+    sorted_keys = keys[sorting]
+    # indices of the sorted points in the point cloud
+    order = finite_indices[sorting]
+
+    # one run of candidates per (box, strip) pair
+    first_strips = np.clip((xyz_center[:, 0] - xy_half_range[:, 0] - x_min) // strip_width, 0, number_of_strips - 1).astype(np.int64)
+    last_strips = np.clip((xyz_center[:, 0] + xy_half_range[:, 0] - x_min) // strip_width, 0, number_of_strips - 1).astype(np.int64)
+    number_of_strips_per_box = last_strips - first_strips + 1
+    pair_box_ids = np.repeat(np.arange(number_of_boxes), number_of_strips_per_box)
+    pair_strips = np.arange(len(pair_box_ids)) - np.repeat(np.cumsum(number_of_strips_per_box) - number_of_strips_per_box - first_strips, number_of_strips_per_box)
+    y_low = np.clip(xyz_center[pair_box_ids, 1] - xy_half_range[pair_box_ids, 1] - y_min, 0.0, y_span - 0.5)
+    y_high = np.clip(xyz_center[pair_box_ids, 1] + xy_half_range[pair_box_ids, 1] - y_min, 0.0, y_span - 0.5)
+    starts = np.searchsorted(sorted_keys, pair_strips * y_span + y_low, side='left')
+    ends = np.searchsorted(sorted_keys, pair_strips * y_span + y_high, side='right')
+    number_of_candidates = ends - starts
+
+    # candidates of all the boxes, grouped by box
+    box_ids = np.repeat(pair_box_ids, number_of_candidates)
+    offsets = np.cumsum(number_of_candidates) - number_of_candidates
+    candidates = order[np.arange(len(box_ids)) - np.repeat(offsets - starts, number_of_candidates)]
+
+    # candidates in their box frames, R^T (p - c)
+    local_points = np.einsum('nij,ni->nj', rotation_matrices[box_ids], points[candidates, :3] - xyz_center[box_ids])
+    inside = np.all(np.abs(local_points) <= half_extent[box_ids], axis=1)
+
+    counts = np.bincount(box_ids[inside], minlength=number_of_boxes)
+    if not return_indices: return counts
+    return [np.sort(indices) for indices in np.split(candidates[inside], np.cumsum(counts)[:-1])]
@@ -4,7 +4,7 @@ from liguard.gui.config_gui import resolve_for_application_root, resolve_for_def
 import open3d as o3d
 import numpy as np
 
-from liguard.pcd.utils import create_pcd
+from liguard.pcd.utils import create_pcd, get_cluster_point_indices
 
 from liguard.gui.logger_gui import Logger
 
@@ -147,10 +147,16 @@ class PointCloudVisualizer:
         
         if "current_label_list" not in data_dict:
             return
+        # clusters are painted on a single copy of the point colors
+        cluster_point_colors = None
+        if self.cfg['visualization']['lidar']['draw_cluster'] and len(data_dict.get('current_point_cloud_cluster_order', [])) == len(self.point_cloud.points):
+            cluster_point_colors = np.array(self.point_cloud.colors)
+            if cluster_point_colors.shape[0] != len(self.point_cloud.points): cluster_point_colors = np.zeros_like(self.point_cloud.points)
         for lbl in data_dict['current_label_list']:
             self.__add_bbox__(lbl)
-            self.__add_cluster__(lbl)
+            if cluster_point_colors is not None: self.__add_cluster__(lbl, data_dict['current_point_cloud_cluster_order'], cluster_point_colors)
             self.__add_trajectory__(lbl)
+        if cluster_point_colors is not None: self.point_cloud.colors = o3d.utility.Vector3dVector(cluster_point_colors)
 
     def __add_bbox__(self, label_dict: dict):
         """
@@ -187,23 +193,20 @@ class PointCloudVisualizer:
             self.viz.remove_geometry(bbox, False)
         self.bboxes.clear()
 
-    def __add_cluster__(self, label_dict: dict):
+    def __add_cluster__(self, label_dict: dict, cluster_point_order: np.ndarray, colors: np.ndarray):
         """
         Adds a cluster to the visualizer.
 
         Args:
             label_dict: A dictionary containing the label information.
+            cluster_point_order: The argsort permutation of the cluster labels of the points, the cluster's points are a slice of it.
+            colors: The point colors, the cluster is painted in place.
         """
         if 'lidar_cluster' not in label_dict or not self.cfg['visualization']['lidar']['draw_cluster']:
             return
         # cluster params
-        lidar_cluster_dict = label_dict['lidar_cluster']
-        point_indices = lidar_cluster_dict['point_indices']
-        colors = np.asarray(self.point_cloud.colors)
-        if colors.shape[0] != point_indices.shape[0]:
-            colors = np.zeros_like(self.point_cloud.points)
+        point_indices = get_cluster_point_indices(cluster_point_order, label_dict['lidar_cluster'])
         colors[point_indices] = np.random.rand(3) # ToDO: use consistent color if tracking is enabled
-        self.point_cloud.colors = o3d.utility.Vector3dVector(colors)
 
     def __add_trajectory__(self, label_dict: dict):
         """
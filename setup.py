@@ -47,6 +47,10 @@ setup(
         "scipy",
         "tqdm",
     ],
+    extras_require={
+        # fast decompression of binary_compressed PCD files
+        "lzf": ["python-lzf"],
+    },
     packages=find_packages(),
     include_package_data=True,
     entry_points={
@@ -111,4 +111,58 @@ def test_project_point_cloud_points():
     # check the number of non-black pixels
     pixel_that_are_not_black_indices = np.where(np.any(data_dict['current_image_numpy'] != 0, axis=-1))
     number_of_non_black_pixels = len(pixel_that_are_not_black_indices[0])
-    assert number_of_non_black_pixels == 0, f'Expected 0 non-black pixels, got {number_of_non_black_pixels}'
\ No newline at end of file
+    assert number_of_non_black_pixels == 0, f'Expected 0 non-black pixels, got {number_of_non_black_pixels}'
+
+def test_UltralyticsYOLOv5():
+    # create dummy configuration
+    import os, yaml
+    example_config_path = os.path.join('liguard', 'examples', 'simple_pipeline', 'base_config.yml')
+    with open(example_config_path, 'r') as f: cfg_dict = yaml.safe_load(f)
+    cfg_dict['data']['pipeline_dir'] = os.path.join('liguard', 'examples', 'simple_pipeline')
+    cfg_dict['proc']['camera']['UltralyticsYOLOv5'] = {'enabled': True, 'priority': 2, 'model': 'yolov5s', 'class_colors': {'Person': [1, 0, 0], 'Car': [0, 0, 1]}, 'score_threshold': 0.5}
+
+    # create a logger object as it is required by some algorithms
+    logger = Logger()
+    logger.reset(cfg_dict)
+
+    from liguard.algo.camera import UltralyticsYOLOv5
+    from liguard.algo.models import model_specs
+    from liguard.model_registry import model_registry, make_model_key
+
+    # stand-in for the YOLOv5 model, it detects a car whose x is the pixel value of the image, a dog, and a person below the score threshold
+    class Result:
+        def __init__(self, array): self.array = array
+        def detach(self): return self
+        def cpu(self): return self
+        def numpy(self): return self.array
+    class Detections:
+        def __init__(self, xywh): self.xywh = xywh
+    calls = []
+    class Model:
+        names = {0: 'person', 1: 'bicycle', 2: 'car', 3: 'dog'}
+        def __call__(self, images):
+            calls.append(len(images))
+            return Detections([Result(np.array([[image[0, 0, 0], 20, 4, 2, 0.9, 2], [5, 5, 2, 2, 0.9, 3], [5, 5, 2, 2, 0.1, 0]], dtype=np.float32)) for image in images])
+
+    key = make_model_key('UltralyticsYOLOv5', 'stub', 'cpu', {})
+    original_model_spec = model_specs['UltralyticsYOLOv5']
+    model_specs['UltralyticsYOLOv5'] = (original_model_spec[0], lambda cfg_dict, params: (key, Model))
+    try:
+        # a single frame, it's processed on the call that loads the model
+        data_dict = {'current_image_numpy': np.full((32, 32, 3), 7, dtype=np.uint8)}
+        UltralyticsYOLOv5(data_dict, cfg_dict, logger)
+        assert len(data_dict['current_label_list']) == 1
+        label = data_dict['current_label_list'][0]
+        assert label['class'] == 'Car' and np.array_equal(label['bbox_2d']['xy_center'], [7, 20]) and np.array_equal(label['bbox_2d']['xy_extent'], [4, 2])
+        assert np.allclose(label['bbox_2d']['confidence'], 0.9) and label['bbox_2d']['added_by'] == 'UltralyticsYOLOv5'
+
+        # a batch of frames in a single call, every frame gets its own detections
+        data_dicts = [{'current_image_numpy': np.full((32, 32, 3), i + 1, dtype=np.uint8)} for i in range(3)]
+        UltralyticsYOLOv5(data_dicts, cfg_dict, logger)
+        assert calls == [1, 3]
+        for i, data_dict in enumerate(data_dicts):
+            assert len(data_dict['current_label_list']) == 1
+            assert np.array_equal(data_dict['current_label_list'][0]['bbox_2d']['xy_center'], [i + 1, 20])
+    finally:
+        model_specs['UltralyticsYOLOv5'] = original_model_spec
+        model_registry.clear()
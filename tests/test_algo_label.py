@@ -51,3 +51,51 @@ def test_remove_out_of_bound_labels():
     # check if the label list is updated
     assert len(data_dict['current_label_list']) == 3, f'Expected 3 labels, got {len(data_dict["current_label_list"])}'
 
+def test_remove_out_of_bound_labels_table():
+    # create dummy configuration and data dictionaries
+    import os, yaml
+    import numpy as np
+    example_config_path = os.path.join('liguard', 'examples', 'simple_pipeline', 'base_config.yml')
+    with open(example_config_path, 'r') as f: cfg_dict = yaml.safe_load(f)
+    cfg_dict['data']['pipeline_dir'] = os.path.join('liguard', 'examples', 'simple_pipeline')
+    data_dict = {}
+
+    # create a logger object as it is required by some algorithms
+    logger = Logger()
+    logger.reset(cfg_dict)
+
+    # import the function
+    func = __import__('liguard.algo.label', fromlist=['remove_out_of_bound_labels']).remove_out_of_bound_labels
+    from liguard.lbl.label_table import LabelTable
+    from liguard.algo.utils import get_crop_bounds
+
+    # crop bound
+    cfg_dict['proc']['lidar']['crop']['enabled'] = True
+    cfg_dict['proc']['lidar']['crop']['max_xyz'] = [10, 10, 10]
+    cfg_dict['proc']['lidar']['crop']['min_xyz'] = [0, 0, 0]
+
+    # enable, with 2D bounding boxes checked against the image size
+    cfg_dict['proc']['label']['remove_out_of_bound_labels']['enabled'] = True
+    cfg_dict['proc']['label']['remove_out_of_bound_labels']['use_lidar_range'] = True
+    cfg_dict['proc']['label']['remove_out_of_bound_labels']['use_image_size'] = True
+
+    # labels in a table, rows with columns and rows with label dicts
+    data_dict['current_image_numpy'] = np.zeros((100, 200, 3), dtype=np.uint8)
+    data_dict['current_label_list'] = LabelTable.concat([
+        LabelTable(['Car'], [0, 0, 0], [[5, 5, 5], [11, 5, 5], [1, 2, 3]]),
+        [{'class': 'Car', 'bbox_2d': {'xy_center': np.array([100, 50]), 'xy_extent': np.array([20, 20])}},
+         {'class': 'Car', 'bbox_2d': {'xy_center': np.array([195, 50]), 'xy_extent': np.array([20, 20])}},
+         {'class': 'Car', 'bbox_3d': {'xyz_center': [1, 1, 1]}, 'bbox_2d': {'xy_center': np.array([5, 50]), 'xy_extent': np.array([20, 20])}}],
+    ])
+
+    # run the function
+    func(data_dict, cfg_dict, logger)
+
+    # check if the label table is updated
+    labels = data_dict['current_label_list']
+    assert len(labels) == 3, f'Expected 3 labels, got {len(labels)}'
+    assert np.allclose(labels.get_column('xyz_center')[[0, 1]], [[5, 5, 5], [1, 2, 3]])
+    assert np.array_equal(labels[2]['bbox_2d']['xy_center'], [100, 50])
+
+    # the crop bounds are converted once
+    assert get_crop_bounds(cfg_dict)[0] is get_crop_bounds(cfg_dict)[0]
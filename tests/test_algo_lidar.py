@@ -43,6 +43,42 @@ def test_crop():
     # check if the point cloud is updated
     assert data_dict['current_point_cloud_numpy'].shape[0] == 3, f'Expected 3 points, got {data_dict["current_point_cloud_numpy"].shape[0]}'
 
+def test_rotate_and_crop():
+    # create dummy configuration and data dictionaries
+    import os, yaml
+    example_config_path = os.path.join('liguard', 'examples', 'simple_pipeline', 'base_config.yml')
+    with open(example_config_path, 'r') as f: cfg_dict = yaml.safe_load(f)
+    cfg_dict['data']['pipeline_dir'] = os.path.join('liguard', 'examples', 'simple_pipeline')
+
+    # create a logger object as it is required by some algorithms
+    logger = Logger()
+    logger.reset(cfg_dict)
+
+    # import the functions
+    lidar = __import__('liguard.algo.lidar', fromlist=['*'])
+    from liguard.algo.utils import fuse_processes
+
+    # the pipelines fuse rotate followed by crop
+    assert fuse_processes([lidar.rotate, lidar.crop, lidar.Cluster2Object], lidar.__dict__) == [lidar.rotate_and_crop, lidar.Cluster2Object]
+    assert fuse_processes([lidar.crop, lidar.rotate], lidar.__dict__) == [lidar.crop, lidar.rotate]
+    assert fuse_processes([lidar.rotate, lidar.voxel_downsample, lidar.crop], lidar.__dict__) == [lidar.rotate, lidar.voxel_downsample, lidar.crop]
+
+    # same point cloud as rotate followed by crop, for float32 and float64 point clouds
+    cfg_dict['proc'] = {'lidar': {'rotate': {'angles': [5.0, -10.0, 30.0]}, 'crop': {'min_xyz': [-10.0, -5.0, -1.5], 'max_xyz': [10.0, 5.0, 1.5]}}}
+    rng = np.random.default_rng(0)
+    for dtype in [np.float32, np.float64]:
+        point_cloud = rng.uniform(-15, 15, (10000, 4)).astype(dtype)
+        # twice, so that the reused buffers of the second frame are larger than needed
+        for number_of_points in [10000, 5000]:
+            expected = {'current_point_cloud_numpy': point_cloud[:number_of_points]}
+            lidar.rotate(expected, cfg_dict, logger)
+            lidar.crop(expected, cfg_dict, logger)
+            fused = {'current_point_cloud_numpy': point_cloud[:number_of_points]}
+            lidar.rotate_and_crop(fused, cfg_dict, logger)
+            assert fused['current_point_cloud_numpy'].dtype == expected['current_point_cloud_numpy'].dtype
+            assert np.allclose(fused['current_point_cloud_numpy'], expected['current_point_cloud_numpy'], atol=1e-5)
+            assert np.array_equal(fused['current_point_cloud_point_colors'], expected['current_point_cloud_point_colors'])
+
 def test_project_image_pixel_colors():
     # create dummy configuration and data dictionaries
     import os, yaml
@@ -116,3 +152,127 @@ def test_project_image_pixel_colors():
     assert number_of_green_points == 81, f'Expected 81 green points, got {number_of_green_points}'
 
 
+
+def test_bg_filters_accumulation(tmp_path):
+    # create dummy configuration and data dictionaries
+    import os, yaml
+    example_config_path = os.path.join('liguard', 'examples', 'simple_pipeline', 'base_config.yml')
+    with open(example_config_path, 'r') as f: cfg_dict = yaml.safe_load(f)
+    cfg_dict['data']['pipeline_dir'] = os.path.join('liguard', 'examples', 'simple_pipeline')
+
+    # create a logger object as it is required by some algorithms
+    logger = Logger()
+    logger.reset(cfg_dict)
+
+    cfg_dict['data']['outputs_dir'] = str(tmp_path)
+    common_params = dict(number_of_frame_gather_iters=2, number_of_frames_in_each_gather_iter=3, number_of_skip_frames_after_each_iter=1, number_of_points_per_frame=100, lidar_range_in_unit_length=10, bins_per_unit_length=2, background_density_threshold=0.5, load_filter=False, decay_factor=0.9, continuous_learning=True)
+    cfg_dict['proc'] = {'lidar': {'BGFilterDHistDPP': dict(common_params, filter_file='bg_filter_dhist_dpp'), 'BGFilterSTDF': dict(common_params, filter_file='bg_filter_stdf')}}
+
+    lidar = __import__('liguard.algo.lidar', fromlist=['BGFilterDHistDPP', 'BGFilterSTDF'])
+    for func in [lidar.BGFilterDHistDPP, lidar.BGFilterSTDF]:
+        data_dict = {'logger': logger}
+        # static background, and a foreground object that appears after the filter is generated
+        background = np.random.default_rng(0).uniform(-5, 5, (100, 4)).astype(np.float32)
+        for i in range(12):
+            data_dict['current_frame_index'] = i
+            data_dict['current_point_cloud_numpy'] = background.copy()
+            if i >= 8: data_dict['current_point_cloud_numpy'][:10, :3] = [[7.5, k - 4.5, 0.5] for k in range(10)]
+            func(data_dict, cfg_dict, logger)
+            if i < 4: assert len(data_dict['current_point_cloud_numpy']) == 100, 'no filtering while accumulating'
+            # the background is removed and the new foreground is kept
+            if i == 8: assert len(data_dict['current_point_cloud_numpy']) == 10
+
+        # only the counts are kept in memory, not the gathered frames
+        algo_name = func.__name__
+        assert f'{algo_name}_accumulator' in data_dict
+        assert not any(isinstance(v, list) and len(v) and isinstance(v[0], np.ndarray) for v in data_dict.values())
+        # with decay, the effective number of frames stays bounded while learning continuously
+        assert data_dict[f'{algo_name}_accumulator'].number_of_frames < 10
+
+        # the saved filter is loaded instead of being generated again
+        cfg_dict['proc']['lidar'][algo_name]['load_filter'] = True
+        data_dict = {'logger': logger, 'current_frame_index': 0, 'current_point_cloud_numpy': background.copy()}
+        data_dict['current_point_cloud_numpy'][:10, :3] = [[7.5, k - 4.5, 0.5] for k in range(10)]
+        func(data_dict, cfg_dict, logger)
+        assert data_dict[f'{algo_name}_filter_loaded']
+        assert len(data_dict['current_point_cloud_numpy']) == 10
+
+def test_Cluster2Object():
+    # create dummy configuration and data dictionaries
+    import os, yaml
+    example_config_path = os.path.join('liguard', 'examples', 'simple_pipeline', 'base_config.yml')
+    with open(example_config_path, 'r') as f: cfg_dict = yaml.safe_load(f)
+    cfg_dict['data']['pipeline_dir'] = os.path.join('liguard', 'examples', 'simple_pipeline')
+
+    # create a logger object as it is required by some algorithms
+    logger = Logger()
+    logger.reset(cfg_dict)
+
+    func = __import__('liguard.algo.lidar', fromlist=['Cluster2Object']).Cluster2Object
+    cfg_dict['proc'] = {'lidar': {'Cluster2Object': {'ground_level': -3.2, 'max_foot_level': 1.4, 'min_height': 0.6, 'classes_require_orientation': ['Car'],
+                                                     'size_constraints': {'Pedestrian': {'base_length': [0.35, 1.5], 'height': [1.0, 1.8]}, 'Car': {'base_length': [4.0, 4.8], 'height': [1.6, 1.8]}},
+                                                     'class_colors': {'Pedestrian': [1, 0, 0], 'Car': [0, 1, 0]}}}}
+
+    # a pedestrian, a car along the y-axis, a too short cluster, and an unclassifiable cluster
+    rng = np.random.default_rng(0)
+    clusters = [rng.uniform(-0.5, 0.5, (1000, 3)) * [0.6, 0.5, 1.7] + [5, 5, -2],
+                rng.uniform(-0.5, 0.5, (1000, 3)) * [1.8, 4.4, 1.6] + [10, 0, -2],
+                rng.uniform(-0.5, 0.5, (1000, 3)) * [1.0, 1.0, 0.2] + [-5, 0, -3],
+                rng.uniform(-0.5, 0.5, (1000, 3)) * [3.0, 3.0, 1.5] + [0, -10, -2]]
+    from liguard.pcd.utils import calc_cluster_records
+    data_dict = {'current_point_cloud_numpy': np.vstack(clusters).astype(np.float32)}
+    data_dict['current_point_cloud_cluster_labels'] = np.repeat(np.arange(len(clusters), dtype=np.int32), 1000)
+    data_dict['current_point_cloud_cluster_order'], records = calc_cluster_records(data_dict['current_point_cloud_cluster_labels'])
+    data_dict['current_label_list'] = [{'lidar_cluster': record} for record in records]
+    func(data_dict, cfg_dict, logger)
+
+    objects = [label for label in data_dict['current_label_list'] if 'bbox_3d' in label]
+    assert [label['class'] for label in objects] == ['Pedestrian', 'Car']
+    assert np.allclose(objects[0]['bbox_3d']['xyz_center'], [5, 5, -2], atol=0.05)
+    assert np.array_equal(objects[0]['bbox_3d']['xyz_euler_angles'], [0, 0, 0])
+    # the car is oriented along its length
+    assert np.isclose(np.abs(np.cos(objects[1]['bbox_3d']['xyz_euler_angles'][2])), 0, atol=0.1)
+    assert np.allclose(objects[1]['bbox_3d']['xyz_extent'], [4.4, 1.8, 1.6], atol=0.2)
+    # it only depends on the current frame, so it runs in the pool with the clusterers
+    assert func.stateless
+
+def test_gen_bbox_2d():
+    import os, yaml
+    import open3d as o3d
+    from liguard.lbl.label_table import LabelTable
+    example_config_path = os.path.join('liguard', 'examples', 'simple_pipeline', 'base_config.yml')
+    with open(example_config_path, 'r') as f: cfg_dict = yaml.safe_load(f)
+    cfg_dict['data']['pipeline_dir'] = os.path.join('liguard', 'examples', 'simple_pipeline')
+    cfg_dict['proc']['lidar']['gen_bbox_2d'] = {'enabled': True, 'priority': 8, 'visualize': True}
+    logger = Logger()
+    logger.reset(cfg_dict)
+    func = __import__('liguard.algo.lidar', fromlist=['gen_bbox_2d']).gen_bbox_2d
+
+    # boxes in front of a camera that looks along the lidar's x axis
+    rng = np.random.default_rng(0)
+    P2 = np.array([[700, 0, 600, 0], [0, 700, 180, 0], [0, 0, 1, 0]], dtype=np.float32)
+    Tr_velo_to_cam = np.array([[0, -1, 0, 0], [0, 0, -1, 0], [1, 0, 0, 0], [0, 0, 0, 1]], dtype=np.float32)
+    data_dict = {'current_calib_data': {'P2': P2, 'R0_rect': np.eye(4, dtype=np.float32), 'Tr_velo_to_cam': Tr_velo_to_cam}}
+    xyz_center = rng.uniform([10, -10, -1], [40, 10, 1], (20, 3))
+    xyz_extent = rng.uniform(1, 4, (20, 3))
+    xyz_euler_angles = np.zeros((20, 3))
+    xyz_euler_angles[:, 2] = rng.uniform(-np.pi, np.pi, 20)
+    labels = LabelTable(['Car'], np.zeros(20), xyz_center, xyz_extent, xyz_euler_angles, predicted=np.ones(20), sources=['PointPillarDetection'], source_ids=np.zeros(20))
+    # a label that already has a 2D bounding box is left as it is
+    labels.append({'class': 'Car', 'bbox_3d': labels[0]['bbox_3d'], 'bbox_2d': {'added_by': 'YOLOv5'}})
+    data_dict['current_label_list'] = labels
+    func(data_dict, cfg_dict, logger)
+
+    # same as projecting the corners of one Open3D OrientedBoundingBox per label
+    for label in data_dict['current_label_list'][:20]:
+        bbox_3d = label['bbox_3d']
+        rotation_matrix = o3d.geometry.OrientedBoundingBox.get_rotation_matrix_from_xyz(bbox_3d['xyz_euler_angles'])
+        corners_3d = np.asarray(o3d.geometry.OrientedBoundingBox(bbox_3d['xyz_center'], rotation_matrix, bbox_3d['xyz_extent']).get_box_points())
+        corners_2d = (P2 @ Tr_velo_to_cam @ np.c_[corners_3d, np.ones(8)].T)
+        corners_2d = (corners_2d[:2] / corners_2d[2]).T
+        min_xy, max_xy = corners_2d.min(axis=0), corners_2d.max(axis=0)
+        assert np.allclose(label['bbox_2d']['xy_center'], (min_xy + max_xy) / 2, atol=1e-2)
+        assert np.allclose(label['bbox_2d']['xy_extent'], max_xy - min_xy, atol=1e-2)
+        assert np.isclose(label['bbox_2d']['depth'], np.linalg.norm(bbox_3d['xyz_center']))
+        assert label['bbox_2d']['added_by'] == 'PointPillarDetection_2d' and label['bbox_2d']['predicted']
+    assert data_dict['current_label_list'][20]['bbox_2d'] == {'added_by': 'YOLOv5'}
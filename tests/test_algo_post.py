@@ -98,4 +98,29 @@ def test_create_pcdet_dataset():
     assert len(label_files) == 10 # each point cloud has one label file containing 3 labels
     
     # delete the output directories
-    shutil.rmtree(os.path.join(cfg_dict['data']['pipeline_dir'], cfg_dict['data']['outputs_dir']))
\ No newline at end of file
+    shutil.rmtree(os.path.join(cfg_dict['data']['pipeline_dir'], cfg_dict['data']['outputs_dir']))
+
+def test_GenerateKDTreePastTrajectory():
+    import yaml
+    from liguard.lbl.label_table import LabelTable
+    example_config_path = os.path.join('liguard', 'examples', 'simple_pipeline', 'base_config.yml')
+    with open(example_config_path, 'r') as f: cfg_dict = yaml.safe_load(f)
+    cfg_dict['data']['pipeline_dir'] = os.path.join('liguard', 'examples', 'simple_pipeline')
+    cfg_dict['proc']['post']['GenerateKDTreePastTrajectory'] = {'enabled': True, 'priority': 2, 'max_match_distance': 4.0, 'history_size': 10}
+    logger = Logger()
+    logger.reset(cfg_dict)
+    func = __import__('liguard.algo.post', fromlist=['GenerateKDTreePastTrajectory']).GenerateKDTreePastTrajectory
+
+    # two objects moving along x, a label table and a 2D-only label dict in every frame
+    data_dict = {}
+    for frame in range(4):
+        data_dict['current_frame_index'] = frame
+        table = LabelTable(['Car'], [0, 0], [[frame, 0, 0], [20 - frame, 10, 0]], predicted=[True, True])
+        data_dict['current_label_list'] = LabelTable.concat([table, [{'class': 'Car', 'bbox_2d': {}}]])
+        func(data_dict, cfg_dict, logger)
+
+    labels = data_dict['current_label_list']
+    assert 'bbox_3d' not in labels[2]
+    assert np.allclose(labels[0]['bbox_3d']['past_trajectory'], [[0, 0, 0], [1, 0, 0], [2, 0, 0]])
+    assert np.allclose(labels[1]['bbox_3d']['past_trajectory'], [[20, 10, 0], [19, 10, 0], [18, 10, 0]])
+    assert labels[0]['text_info'] == 'traj-: 3'
@@ -11,4 +11,50 @@ def test_handler_validity():
             # check if the handler has a calib_file_extension attribute
             assert handler_calib_file_extension[0] == '.', f"calib_file_extension is not a valid file extension"
             # check if the handler is callable
-            assert callable(handler), f"{handler} is not callable"
\ No newline at end of file
+            assert callable(handler), f"{handler} is not callable"
+
+def test_lidar_to_image_projection(tmp_path):
+    import numpy as np
+    from liguard.calib.handler_kitti import Handler
+    from liguard.calib.utils import get_lidar_to_image, project_points_to_image
+
+    # a KITTI calibration file
+    calib_path = tmp_path / '000000.txt'
+    calib_path.write_text('P2: 7.215377e+02 0.000000e+00 6.095593e+02 4.485728e+01 0.000000e+00 7.215377e+02 1.728540e+02 2.163791e-01 0.000000e+00 0.000000e+00 1.000000e+00 2.745884e-03\n'
+                          'R0_rect: 9.999239e-01 9.837760e-03 -7.445048e-03 -9.869795e-03 9.999421e-01 -4.278459e-03 7.402527e-03 4.351614e-03 9.999631e-01\n'
+                          'Tr_velo_to_cam: 7.533745e-03 -9.999714e-01 -6.166020e-04 -4.069766e-03 1.480249e-02 7.280733e-04 -9.998902e-01 -7.631618e-02 9.998621e-01 7.523790e-03 1.480755e-02 -2.717806e-01\n')
+    calib = Handler(str(calib_path))
+
+    # composed once and cached in the calibration
+    lidar_to_image = get_lidar_to_image(calib)
+    assert lidar_to_image.shape == (3, 4) and lidar_to_image.dtype == np.float32
+    assert get_lidar_to_image(calib) is lidar_to_image
+
+    # same pixel coordinates as the homogeneous projection
+    points = np.random.default_rng(0).uniform([2, -20, -2, 0], [50, 20, 2, 1], (1000, 4)).astype(np.float32)
+    expected = calib['P2'] @ calib['R0_rect'] @ calib['Tr_velo_to_cam'] @ np.hstack((points[:, :3], np.ones((len(points), 1)))).T
+    pixel_coords = project_points_to_image(points, lidar_to_image)
+    assert pixel_coords.shape == (1000, 3)
+    assert np.allclose(pixel_coords[:, :2] / pixel_coords[:, 2:], (expected[:2] / expected[2]).T, atol=1e-2)
+
+def test_calib_interning():
+    import yaml
+    from liguard.calib.file_io import FileIO
+    example_config_path = os.path.join('liguard', 'examples', 'simple_pipeline', 'base_config.yml')
+    with open(example_config_path, 'r') as f: cfg_dict = yaml.safe_load(f)
+    cfg_dict['data']['pipeline_dir'] = os.path.join('liguard', 'examples', 'simple_pipeline')
+
+    # the example calibration files are identical, they share one calibration with the projection and the inverse precomputed
+    reader = FileIO(cfg_dict)
+    frames = [reader[idx] for idx in range(len(reader))]
+    assert len(set(path for path, _ in frames)) == len(reader)
+    assert all(calib is frames[0][1] for _, calib in frames)
+    assert 'lidar_to_image' in frames[0][1] and 'Tr_velo_to_cam_inv' in frames[0][1]
+    reader.close()
+
+    # a static calibration is read once and used for every frame
+    cfg_dict['data']['calib']['static'] = True
+    reader = FileIO(cfg_dict)
+    assert reader.cache is None and len(reader) == cfg_dict['data']['count']
+    assert reader[3] is reader[0] and reader[0][1] is not frames[0][1]
+    reader.close()
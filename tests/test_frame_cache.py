@@ -0,0 +1,37 @@
+import time
+
+import numpy as np
+
+def test_frame_cache_bounded_window():
+    from liguard.frame_cache import FrameCache
+
+    # dummy reader, each frame is 1 KB
+    reads = []
+    def read_fn(idx):
+        reads.append(idx)
+        return (f'{idx}.bin', np.full((64, 4), idx, dtype=np.float32))
+
+    cfg = {'data': {'cache': {'max_frames': 8, 'max_megabytes': 0, 'prefetch_ahead': 4, 'prefetch_behind': 2}}, 'threads': {'io_sleep': 0.0}}
+    cache = FrameCache(read_fn, 1000, cfg)
+
+    # play through the dataset, the cache must never hold more frames than the budget
+    for idx in range(0, 200):
+        path, frame = cache[idx]
+        assert path == f'{idx}.bin'
+        assert np.all(frame == idx)
+        assert len(cache.frames) <= 8
+
+    # frames ahead of the current index are prefetched in background
+    time.sleep(0.5)
+    for idx in range(199, 204): assert idx in cache, f'frame {idx} not prefetched'
+    # frames far behind the current index are evicted
+    assert 0 not in cache
+
+    # stepping back within the window doesn't trigger a read
+    num_reads = len(reads)
+    cache[198]
+    cache[197]
+    assert len(reads) == num_reads
+
+    cache.close()
+    assert len(cache.frames) == 0
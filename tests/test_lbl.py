@@ -15,4 +15,86 @@ def test_handler_validity():
             # label_file_extension must start with a period
             assert handler.label_file_extension[0] == '.', f"{handler.label_file_extension} is not a valid file extension"
             # check if the handler is callable
-            assert callable(handler.Handler), f"{handler.Handler} is not callable"
\ No newline at end of file
+            assert callable(handler.Handler), f"{handler.Handler} is not callable"
+
+def test_vectorized_label_handlers(tmp_path):
+    import numpy as np
+    from liguard.calib.handler_kitti import Handler as CalibHandler
+    from liguard.lbl.handler_kitti import Handler as KITTIHandler
+    from liguard.lbl.handler_openpcdet import Handler as OpenPCDetHandler
+    from liguard.lbl.label_table import LabelTable
+
+    calib = CalibHandler(os.path.join('liguard', 'examples', 'simple_pipeline', 'dataset', 'calibs', '000000.txt'))
+    label_path = tmp_path / 'kitti.txt'
+    # the optional score column of the second label is cut, empty lines are skipped
+    label_path.write_text('Car 0.0 0 0.5 10 20 110 80 1.5 1.8 4.2 2.0 1.6 15.0 0.3 \n\nPedestrian 0.2 1 -0.1 300 40 330 120 1.7 0.6 0.8 -3.0 1.7 8.0 -1.2 0.9\n')
+    labels = KITTIHandler(str(label_path), calib)
+    assert isinstance(labels, LabelTable) and len(labels) == 2
+
+    # same values as parsing every label on its own
+    inverse = np.linalg.inv(calib['Tr_velo_to_cam'])
+    for label, (obj_class, xyz, hwl, ry) in zip(labels, [('Car', [2.0, 1.6, 15.0], [1.5, 1.8, 4.2], 0.3), ('Pedestrian', [-3.0, 1.7, 8.0], [1.7, 0.6, 0.8], -1.2)]):
+        xyz_center = (inverse @ np.array([*xyz, 1.0]))[:3]
+        xyz_center[2] += hwl[0] / 2.0
+        assert label['class'] == obj_class
+        assert np.allclose(label['bbox_3d']['xyz_center'], xyz_center, atol=1e-4)
+        assert np.allclose(label['bbox_3d']['xyz_extent'], [hwl[1], hwl[2], hwl[0]])
+        assert np.allclose(label['bbox_3d']['xyz_euler_angles'], [0, 0, -ry])
+        assert label['bbox_3d']['predicted'] is False
+    assert labels[1]['occlusion'] == 1 and np.allclose(labels[1]['image_0_bbox2d'], [300, 40, 330, 120])
+    assert np.allclose(labels[0]['bbox_3d']['rgb_color'], [0, 1, 0])
+
+    # the label dicts are built once, changes to them are kept like in a list
+    labels[0]['bbox_3d']['rgb_color'] = np.array([1, 0, 0])
+    assert labels[0] is labels[0] and np.allclose(labels[0]['bbox_3d']['rgb_color'], [1, 0, 0])
+    labels.append({'class': 'Car', 'bbox_3d': {}})
+    del labels[1]
+    assert [label['class'] for label in labels] == ['Car', 'Car'] and len(labels[:1]) == 1
+
+    # empty files give empty tables
+    (tmp_path / 'empty.txt').write_text('\n')
+    assert len(KITTIHandler(str(tmp_path / 'empty.txt'), calib)) == 0
+
+    label_path = tmp_path / 'openpcdet.txt'
+    label_path.write_text('1.0 2.0 -1.0 4.0 2.0 1.5 0.3 Car\n5.0 -2.0 -0.5 0.8 0.6 1.7 1.1 Pedestrian\n')
+    labels = OpenPCDetHandler(str(label_path), None)
+    assert [label['class'] for label in labels] == ['Car', 'Pedestrian']
+    assert np.allclose(labels[1]['bbox_3d']['xyz_center'], [5.0, -2.0, -0.5]) and np.allclose(labels[1]['bbox_3d']['xyz_euler_angles'], [0, 0, 1.1])
+    assert np.isclose(labels[0]['heading_angle'], 0.3) and np.allclose(labels[0]['bbox_3d']['rgb_color'], [0, 1, 0])
+
+def test_label_table_operations():
+    import numpy as np
+    from liguard.lbl.label_table import LabelTable
+
+    ground_truth = LabelTable(['Car', 'Pedestrian'], [0, 1, 0], [[1, 0, 0], [2, 0, 0], [3, 0, 0]], fields={'truncation': np.array([0.0, 0.1, 0.2])})
+    detections = LabelTable(['Car'], [0], [[4, 0, 0]], predicted=[True], score=[0.9], sources=['PointPillarDetection'], source_ids=[0])
+    custom = [{'class': 'Cyclist', 'bbox_3d': {'xyz_center': np.array([5.0, 0, 0]), 'xyz_euler_angles': np.zeros(3)}}, {'class': 'Car', 'bbox_2d': {}}]
+
+    # concat keeps the labels columnar, fields and scores only show up in the dicts of the labels that have them
+    labels = LabelTable.concat([ground_truth, detections, custom])
+    assert labels.class_list == ['Car', 'Pedestrian', 'Car', 'Car', 'Cyclist', 'Car']
+    assert not any(isinstance(row, dict) for row in labels.rows[:4])
+    assert np.array_equal(labels.has_bbox_3d, [True, True, True, True, True, False])
+    assert np.allclose(labels.get_column('xyz_center')[:5, 0], [1, 2, 3, 4, 5])
+    assert labels[1]['truncation'] == np.float64(0.1) and 'truncation' not in labels[3]
+    assert labels[3]['bbox_3d']['confidence'] == np.float32(0.9) and labels[3]['bbox_3d']['added_by'] == 'PointPillarDetection'
+    assert labels[4] is custom[0]
+
+    # mask and transform work on columns and dicts alike, without changing the original columns
+    moved = labels.mask(labels.has_bbox_3d)
+    transformation_matrix = np.eye(4)
+    transformation_matrix[:3, :3] = [[0, -1, 0], [1, 0, 0], [0, 0, 1]]
+    transformation_matrix[:3, 3] = [0, 0, 1]
+    moved.transform(transformation_matrix)
+    assert len(moved) == 5
+    assert np.allclose(moved.get_column('xyz_center'), [[0, x, 1] for x in [1, 2, 3, 4, 5]])
+    assert np.allclose(moved.get_column('xyz_euler_angles')[:, 2], np.pi / 2)
+    assert np.allclose(custom[0]['bbox_3d']['xyz_center'], [0, 5, 1])
+    assert np.allclose(ground_truth[0]['bbox_3d']['xyz_center'], [1, 0, 0])
+
+    # projection of the centers
+    lidar_to_image = np.array([[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 1]], dtype=np.float32)
+    assert np.allclose(moved.project(lidar_to_image), [[0, x, 2] for x in [1, 2, 3, 4, 5]])
+
+    # lists are wrapped without copying the dicts
+    assert LabelTable.from_list(custom)[0] is custom[0] and LabelTable.from_list(labels) is labels
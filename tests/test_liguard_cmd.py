@@ -0,0 +1,247 @@
+import open3d.visualization.gui as gui
+from liguard.gui.logger_gui import Logger
+
+import numpy as np
+
+def test_start_stage(tmp_path):
+    # create dummy configuration
+    import os, sys, yaml, multiprocessing
+    from queue import Queue
+    from concurrent.futures import ProcessPoolExecutor
+    example_config_path = os.path.join('liguard', 'examples', 'simple_pipeline', 'base_config.yml')
+    with open(example_config_path, 'r') as f: cfg_dict = yaml.safe_load(f)
+    cfg_dict['data']['pipeline_dir'] = os.path.join('liguard', 'examples', 'simple_pipeline')
+    cfg_dict['data']['outputs_dir'] = str(tmp_path / 'outputs')
+    cfg_dict['logging']['logs_dir'] = str(tmp_path / 'logs')
+    cfg_dict['proc'] = {'pre': {'remove_nan_inf_allzero_from_pcd': {}}}
+
+    # create a logger object as it is required by some algorithms
+    logger = Logger()
+    logger.reset(cfg_dict)
+
+    from liguard.liguard_cmd import start_stage, __init_worker__
+    from liguard.frame_transport import SlotPool
+    from liguard.algo.utils import algo_func, make_key
+    from liguard.algo.pre import remove_nan_inf_allzero_from_pcd
+
+    # stateful process counting the frames it has seen
+    @algo_func(required_data=[])
+    def count_frames(data_dict, cfg_dict, logger):
+        key = make_key('count_frames', 'count')
+        data_dict[key] = data_dict.get(key, 0) + 1
+        data_dict['current_count'] = data_dict[key]
+
+    pool = ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context('spawn'), initializer=__init_worker__, initargs=(cfg_dict, logger, list(sys.path)))
+    slot_pool = SlotPool()
+    source_queue, target_queue = Queue(), Queue()
+    threads = start_stage(source_queue, cfg_dict, logger, [remove_nan_inf_allzero_from_pcd, count_frames], target_queue, None, pool, slot_pool, 2, 4)
+    # one pool segment for the stateless process and one thread for the stateful one
+    assert len(threads) == 2
+
+    for i in range(10):
+        point_cloud = np.full((i + 2, 4), i + 1, dtype=np.float32)
+        point_cloud[0] = np.nan
+        source_queue.put({'current_frame_index': i, 'current_point_cloud_numpy': point_cloud})
+    source_queue.put(None)
+
+    # frames come out in order, processed, and the state of the stateful process is carried over from frame to frame
+    for i in range(10):
+        data_dict = target_queue.get()
+        assert data_dict['current_frame_index'] == i
+        assert data_dict['current_point_cloud_numpy'].shape == (i + 1, 4)
+        assert np.all(data_dict['current_point_cloud_numpy'] == i + 1)
+        assert data_dict['current_count'] == i + 1
+        assert make_key('count_frames', 'count') not in data_dict
+        slot_pool.recycle_frame(data_dict)
+    assert target_queue.get() is None
+    # all the slots are released once the frames are recycled
+    assert len(slot_pool.free) == len(slot_pool.slots)
+
+    for thread in threads: thread.join()
+    pool.shutdown()
+    slot_pool.close()
+
+def test_batched_stage(tmp_path):
+    # create dummy configuration
+    import os, yaml
+    from queue import Queue
+    example_config_path = os.path.join('liguard', 'examples', 'simple_pipeline', 'base_config.yml')
+    with open(example_config_path, 'r') as f: cfg_dict = yaml.safe_load(f)
+    cfg_dict['data']['pipeline_dir'] = os.path.join('liguard', 'examples', 'simple_pipeline')
+    cfg_dict['data']['outputs_dir'] = str(tmp_path / 'outputs')
+    cfg_dict['logging']['logs_dir'] = str(tmp_path / 'logs')
+
+    logger = Logger()
+    logger.reset(cfg_dict)
+
+    from liguard.liguard_cmd import start_stage
+    from liguard.algo.utils import algo_func, make_key
+
+    # stateful batchable process, it sees all the frames of a batch at once and keeps its state in the first data dict
+    batch_sizes = []
+    @algo_func(required_data=[], batchable=True)
+    def sum_batch(data_dict, cfg_dict, logger):
+        data_dicts = data_dict if isinstance(data_dict, list) else [data_dict]
+        batch_sizes.append(len(data_dicts))
+        key = make_key('sum_batch', 'total')
+        total = data_dicts[0].get(key, 0)
+        for d in data_dicts:
+            total += d['current_frame_index']
+            d['current_total'] = total
+        data_dicts[0][key] = total
+
+    # stateful process run one frame at a time after it
+    @algo_func(required_data=[])
+    def count_frames(data_dict, cfg_dict, logger):
+        key = make_key('count_frames', 'count')
+        data_dict[key] = data_dict.get(key, 0) + 1
+        data_dict['current_count'] = data_dict[key]
+
+    source_queue, target_queue = Queue(), Queue()
+    threads = start_stage(source_queue, cfg_dict, logger, [sum_batch, count_frames], target_queue, None, None, None, 1, 4, batch_size=4)
+    for i in range(10): source_queue.put({'current_frame_index': i})
+    source_queue.put(None)
+
+    # frames come out in order, and the state is carried over across the batches
+    for i in range(10):
+        data_dict = target_queue.get()
+        assert data_dict['current_frame_index'] == i
+        assert data_dict['current_total'] == sum(range(i + 1))
+        assert data_dict['current_count'] == i + 1
+        assert make_key('sum_batch', 'total') not in data_dict and 'logger' not in data_dict
+    assert target_queue.get() is None
+    # the last batch is partial
+    assert batch_sizes == [4, 4, 2]
+    for thread in threads: thread.join()
+
+def test_stage_state_removal(tmp_path):
+    # create dummy configuration
+    import os, yaml
+    from queue import Queue
+    example_config_path = os.path.join('liguard', 'examples', 'simple_pipeline', 'base_config.yml')
+    with open(example_config_path, 'r') as f: cfg_dict = yaml.safe_load(f)
+    cfg_dict['data']['pipeline_dir'] = os.path.join('liguard', 'examples', 'simple_pipeline')
+    cfg_dict['data']['outputs_dir'] = str(tmp_path / 'outputs')
+    cfg_dict['logging']['logs_dir'] = str(tmp_path / 'logs')
+
+    logger = Logger()
+    logger.reset(cfg_dict)
+
+    from liguard.liguard_cmd import start_stage
+    from liguard.algo.utils import algo_func, make_key
+
+    # stateful process that removes its own key every other frame, e.g. a closed socket
+    @algo_func(required_data=[])
+    def toggle(data_dict, cfg_dict, logger):
+        key = make_key('toggle', 'open')
+        data_dict['current_found'] = key in data_dict
+        if key in data_dict: data_dict.pop(key)
+        else: data_dict[key] = True
+
+    @algo_func(required_data=[], batchable=True)
+    def noop_batch(data_dict, cfg_dict, logger): pass
+
+    # the removed key must not come back, one frame at a time and in batches
+    for processes, batch_size in [([toggle], 1), ([noop_batch, toggle], 3)]:
+        source_queue, target_queue = Queue(), Queue()
+        threads = start_stage(source_queue, cfg_dict, logger, processes, target_queue, None, None, None, 1, 4, batch_size=batch_size)
+        for i in range(6): source_queue.put({'current_frame_index': i})
+        source_queue.put(None)
+        found = [target_queue.get()['current_found'] for _ in range(6)]
+        assert found == [False, True, False, True, False, True]
+        assert target_queue.get() is None
+        for thread in threads: thread.join()
+
+def test_bulk_process_twice(tmp_path):
+    import os, argparse, signal, yaml
+    from liguard import liguard_cmd
+    sigint_handler = signal.getsignal(signal.SIGINT)
+
+    # count the frames that go through the whole pipeline
+    recycled = []
+    frames2recycle = liguard_cmd.frames2recycle
+    def counting_frames2recycle(source_queue, slot_pool):
+        def get():
+            data = source_queue_get()
+            if data is not None: recycled.append(data['current_frame_index'])
+            return data
+        source_queue_get, source_queue.get = source_queue.get, get
+        frames2recycle(source_queue, slot_pool)
+    liguard_cmd.frames2recycle = counting_frames2recycle
+
+    # pipeline reading the example dataset, with its outputs and logs in tmp_path
+    example_pipeline_dir = os.path.join('liguard', 'examples', 'simple_pipeline')
+    with open(os.path.join(example_pipeline_dir, 'base_config.yml'), 'r') as f: cfg_dict = yaml.safe_load(f)
+    cfg_dict['data']['main_dir'] = os.path.abspath(os.path.join(example_pipeline_dir, cfg_dict['data']['main_dir']))
+    with open(tmp_path / 'base_config.yml', 'w') as f: yaml.safe_dump(cfg_dict, f)
+
+    # the end of the first run must not stop the readers of the second one
+    args = argparse.Namespace(pipeline_dir=str(tmp_path), max_queue_size=10, workers=1, io_workers=1, batch_size=1)
+    try:
+        liguard_cmd.bulk_process(args)
+        number_of_frames = len(recycled)
+        assert number_of_frames > 0
+        liguard_cmd.bulk_process(args)
+        assert len(recycled) == 2 * number_of_frames
+    finally:
+        liguard_cmd.frames2recycle = frames2recycle
+        signal.signal(signal.SIGINT, sigint_handler)
+
+def test_frame_transport():
+    from liguard.frame_transport import SlotPool, SharedArray, attach_frame, detach_frame, materialize_frame, attached_slots, close_attached_slots
+
+    slot_pool = SlotPool()
+    point_cloud = np.arange(40, dtype=np.float32).reshape(10, 4)
+    data_dict = {'current_point_cloud_numpy': point_cloud.copy(), 'current_label_list': []}
+    slot_pool.share_frame(data_dict)
+    assert isinstance(data_dict['current_point_cloud_numpy'], SharedArray)
+    assert len(data_dict['shared_memory_slots']) == 1
+
+    # views are zero-copy, in-place changes are visible through the handle
+    attached = attach_frame(data_dict)
+    data_dict['current_point_cloud_numpy'][:, 3] = 0
+    detach_frame(data_dict, attached)
+    assert isinstance(data_dict['current_point_cloud_numpy'], SharedArray)
+
+    # new arrays that fit are written back to the slot
+    attached = attach_frame(data_dict)
+    data_dict['current_point_cloud_numpy'] = data_dict['current_point_cloud_numpy'][5:, :3]
+    detach_frame(data_dict, attached)
+    assert data_dict['current_point_cloud_numpy'].shape == (5, 3)
+
+    # new arrays that don't fit are kept as is
+    attached = attach_frame(data_dict)
+    data_dict['current_point_cloud_numpy'] = np.zeros((1000, 4), dtype=np.float32)
+    detach_frame(data_dict, attached)
+    assert isinstance(data_dict['current_point_cloud_numpy'], np.ndarray)
+    data_dict['current_point_cloud_numpy'] = SharedArray(data_dict['shared_memory_slots'][0], (5, 3), '<f4')
+
+    materialize_frame(data_dict)
+    assert np.array_equal(data_dict['current_point_cloud_numpy'], point_cloud[5:, :3])
+
+    # recycled slots are reused
+    slot_pool.recycle_frame(data_dict)
+    name = slot_pool.free[0]
+    other_data_dict = {'current_point_cloud_numpy': np.ones((8, 4), dtype=np.float32)}
+    slot_pool.share_frame(other_data_dict)
+    assert other_data_dict['current_point_cloud_numpy'].name == name
+
+    # a frame shared again, e.g. after a stateful segment, reuses its own slots
+    slot_names, number_of_slots = list(other_data_dict['shared_memory_slots']), len(slot_pool.slots)
+    other_data_dict['current_image_numpy'] = np.zeros((4, 4, 3), dtype=np.uint8)
+    for _ in range(3):
+        materialize_frame(other_data_dict)
+        slot_pool.share_frame(other_data_dict)
+        slot_pool.share_frame(other_data_dict)
+        assert len(other_data_dict['shared_memory_slots']) == 2 and other_data_dict['shared_memory_slots'][0] == slot_names[0]
+        assert len(slot_pool.slots) == number_of_slots + 1
+    materialize_frame(other_data_dict)
+    assert np.array_equal(other_data_dict['current_point_cloud_numpy'], np.ones((8, 4), dtype=np.float32))
+
+    # the slots attached by a worker are closed when it exits
+    slot_pool.share_frame(other_data_dict)
+    detach_frame(other_data_dict, attach_frame(other_data_dict))
+    assert len(attached_slots) > 0
+    close_attached_slots()
+    assert len(attached_slots) == 0
+    slot_pool.close()
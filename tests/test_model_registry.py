@@ -0,0 +1,57 @@
+import time
+
+import numpy as np
+
+def test_model_registry():
+    from liguard.model_registry import ModelRegistry, make_model_key
+
+    # dummy models, each one is 1 MB
+    loads = []
+    def make_load_fn(name, delay=0.0):
+        def load_fn():
+            loads.append(name)
+            time.sleep(delay)
+            return np.zeros(1024 * 1024, dtype=np.uint8)
+        return load_fn
+
+    registry = ModelRegistry(max_megabytes=2.5)
+    key_a = make_model_key('algo', 'a.pth', 'cpu', {'x': 1})
+    key_b = make_model_key('algo', 'b.pth', 'cpu', {'x': 1})
+    key_c = make_model_key('algo', 'a.pth', 'cpu', {'x': 2})
+    # the parameters are hashed independently of their order
+    assert make_model_key('algo', 'a.pth', 'cpu', {'x': 1, 'y': 2}) == make_model_key('algo', 'a.pth', 'cpu', {'y': 2, 'x': 1})
+    assert key_a != key_c
+
+    # a model requested while it's preloaded is waited for instead of being loaded twice
+    thread = registry.preload(key_a, make_load_fn('a', delay=0.2))
+    model_a = registry.get(key_a, make_load_fn('a'))
+    thread.join()
+    assert loads == ['a']
+    assert registry.get(key_a, make_load_fn('a')) is model_a
+    assert loads == ['a']
+
+    # the least recently used model is unloaded once the budget is exceeded
+    registry.get(key_b, make_load_fn('b'))
+    registry.get(key_a, make_load_fn('a'))
+    registry.get(key_c, make_load_fn('c'))
+    assert loads == ['a', 'b', 'c']
+    assert key_a in registry and key_c in registry and key_b not in registry
+    assert registry.nbytes <= registry.max_bytes
+
+    # a failed load isn't cached, the error is given to the caller
+    def failing_load_fn(): raise RuntimeError('missing checkpoint')
+    key_d = make_model_key('algo', 'd.pth', 'cpu', {})
+    errors = []
+    registry.preload(key_d, failing_load_fn, errors.append).join()
+    assert len(errors) == 1 and key_d not in registry
+    try:
+        registry.get(key_d, failing_load_fn)
+        assert False, 'the error must be raised'
+    except RuntimeError: pass
+
+    # a smaller budget from the configuration unloads the models over it
+    registry.configure({'models': {'max_megabytes': 1}})
+    assert len(registry) == 1 and key_c in registry
+
+    registry.clear()
+    assert len(registry) == 0 and registry.nbytes == 0
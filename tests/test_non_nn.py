@@ -0,0 +1,112 @@
+import numpy as np
+
+def test_DHistDPP_histograms():
+    from liguard.algo.non_nn.DHistDPP import calc_histograms_per_point
+
+    # distances of 500 rays in 30 frames, including bin edges and out-of-range distances
+    rng = np.random.default_rng(0)
+    lidar_range, bins_per_point = 100, 200
+    distances = (rng.random((500, 30)) * lidar_range * 1.2).astype(np.float32)
+    distances[0, :4] = [0, lidar_range, -1, np.nan]
+    distances[1, :30] = np.linspace(0, lidar_range, bins_per_point + 1, dtype=np.float32)[:30]
+
+    # must match a per-ray np.histogram exactly
+    histograms = calc_histograms_per_point(distances, bins_per_point, lidar_range)
+    expected = np.apply_along_axis(lambda x: np.histogram(x, bins_per_point, range=(0, lidar_range))[0], axis=1, arr=distances)
+    assert np.array_equal(histograms, expected)
+
+def test_STDF_sparse_histogram(tmp_path):
+    from liguard.algo.non_nn.STDF import calc_STDF_params, make_STDF_filter, save_STDF_params, load_STDF_params
+    from liguard.algo.non_nn.filter_file import find_mismatched_metadata
+
+    # gathered frames, including points on the range boundary and out of the range
+    rng = np.random.default_rng(0)
+    lidar_range, bins_per_unit_length = 10, 2
+    frames = [np.hstack([rng.normal(0, 3, (1000, 3)), np.ones((1000, 1))]).astype(np.float32) for _ in range(10)]
+    frames[0][:3, :3] = [[lidar_range] * 3, [-lidar_range] * 3, [lidar_range + 1, 0, 0]]
+    filter_params = calc_STDF_params(frames, lidar_range, bins_per_unit_length)
+
+    # must match the dense histogram
+    bins_per_side = lidar_range * bins_per_unit_length
+    bins = np.linspace(-lidar_range, lidar_range, bins_per_side + 1)
+    histogram_3d, _ = np.histogramdd(np.vstack(frames)[:, :3], bins=(bins, bins, bins))
+    normalized_histogram_3d = histogram_3d / len(frames)
+    query = np.vstack([frames[1], rng.uniform(-15, 15, (1000, 4)).astype(np.float32)])
+    voxel_indices = np.clip(np.digitize(query[:, :3], bins) - 1, 0, bins_per_side - 1)
+    for threshold in [0.1, 0.5, 1.0]:
+        expected = normalized_histogram_3d[voxel_indices[:, 0], voxel_indices[:, 1], voxel_indices[:, 2]] < threshold
+        assert np.array_equal(make_STDF_filter(query, threshold, **filter_params), expected)
+
+    # save and load, the densities are quantized but none of them is near the threshold
+    filename = save_STDF_params(filter_params, str(tmp_path / 'bg_filter_stdf'))
+    # the file records the params the filter was made with
+    assert find_mismatched_metadata(filename, dict(lidar_range_in_unit_length=lidar_range, bins_per_unit_length=bins_per_unit_length)) == dict()
+    loaded_params = load_STDF_params(filename)
+    assert loaded_params['voxel_densities'].dtype == np.uint8
+    assert np.array_equal(make_STDF_filter(query, 0.55, **loaded_params), make_STDF_filter(query, 0.55, **filter_params))
+
+def test_accumulators():
+    from liguard.algo.non_nn.DHistDPP import calc_DHistDPP_params, DHistDPPAccumulator
+    from liguard.algo.non_nn.STDF import calc_STDF_params, STDFAccumulator
+
+    rng = np.random.default_rng(0)
+    frames = [np.hstack([rng.normal(0, 4, (500, 3)), np.ones((500, 1))]).astype(np.float32) for _ in range(20)]
+
+    # without decay, accumulating frame by frame gives the same params as computing them at once
+    dhist_accumulator, stdf_accumulator = DHistDPPAccumulator(500, 10, 2), STDFAccumulator(10, 2)
+    for frame in frames:
+        dhist_accumulator.update(frame)
+        stdf_accumulator.update(frame)
+    for params, expected in [(dhist_accumulator.params(), calc_DHistDPP_params(frames, 500, 10, 2)), (stdf_accumulator.params(), calc_STDF_params(frames, 10, 2))]:
+        for key in expected: assert np.array_equal(params[key], expected[key]), key
+
+    # with decay, old frames fade out
+    stdf_accumulator = STDFAccumulator(10, 2, decay_factor=0.5)
+    for frame in frames: stdf_accumulator.update(frame)
+    assert stdf_accumulator.number_of_frames < 2
+
+def test_filter_file(tmp_path):
+    from liguard.algo.non_nn.filter_file import read_header, find_mismatched_metadata, format_version
+    from liguard.algo.non_nn.DHistDPP import calc_DHistDPP_params, make_DHistDPP_filter, save_DHistDPP_params, load_DHistDPP_params
+
+    rng = np.random.default_rng(0)
+    frames = [np.hstack([rng.normal(0, 4, (500, 3)), np.ones((500, 1))]).astype(np.float32) for _ in range(20)]
+    filter_params = calc_DHistDPP_params(frames, 500, 10, 2)
+
+    # versioned header with the params the filter was made with
+    filename = save_DHistDPP_params(filter_params, str(tmp_path / 'bg_filter_dhist_dpp'))
+    assert filename.endswith('.lgbf')
+    header = read_header(filename)
+    assert header['version'] == format_version and header['algorithm'] == 'DHistDPP'
+    assert find_mismatched_metadata(filename, dict(number_of_points_per_frame=500, lidar_range_in_unit_length=10, bins_per_unit_length=2)) == dict()
+    assert find_mismatched_metadata(filename, dict(number_of_points_per_frame=500, lidar_range_in_unit_length=20)) == dict(lidar_range_in_unit_length=(10, 20))
+
+    # the histograms are memory-mapped uint8, the densities are multiples of 1/20 so thresholds between them give the same filter
+    loaded_params = load_DHistDPP_params(filename)
+    assert isinstance(loaded_params['normalized_histogram_per_point'], np.memmap)
+    assert loaded_params['normalized_histogram_per_point'].dtype == np.uint8
+    for threshold in [0.0, 0.025, 0.125, 0.525, 1.0]:
+        assert np.array_equal(make_DHistDPP_filter(frames[0], threshold, **loaded_params), make_DHistDPP_filter(frames[0], threshold, **filter_params))
+
+def test_voxel_dbscan():
+    import open3d as o3d
+    from liguard.algo.non_nn.VoxelDBSCAN import voxel_dbscan
+
+    # a ground plane, some objects, scattered points, and a point that is not finite
+    rng = np.random.default_rng(0)
+    ground = np.c_[rng.uniform(-10, 10, (3000, 2)), rng.normal(-2, 0.05, 3000)]
+    objects = np.vstack([rng.normal(0, [1.5, 0.8, 0.6], (100, 3)) + [*rng.uniform(-8, 8, 2), -1] for _ in range(10)])
+    scattered = rng.uniform(-10, 10, (1000, 3))
+    point_cloud = np.vstack([ground, objects, scattered]).astype(np.float32)[rng.permutation(5000)]
+
+    # same labels as Open3D
+    pcd = o3d.geometry.PointCloud()
+    pcd.points = o3d.utility.Vector3dVector(point_cloud)
+    for eps, min_samples in [(0.5, 5), (0.3, 3), (1.0, 20)]:
+        expected = np.array(pcd.cluster_dbscan(eps=eps, min_points=min_samples, print_progress=False))
+        assert np.array_equal(voxel_dbscan(point_cloud, eps, min_samples), expected)
+        assert np.array_equal(voxel_dbscan(point_cloud, eps, min_samples, workers=2), expected)
+
+    point_cloud[0] = np.nan
+    assert voxel_dbscan(point_cloud, 0.5, 5)[0] == -1
+    assert len(voxel_dbscan(point_cloud[:0], 0.5, 5)) == 0
@@ -9,4 +9,67 @@ def test_handler_validity():
             # handler must be a class not a function
             assert isinstance(handler, type), f"{handler} is not a class"
             # handler must have a close method
-            assert hasattr(handler, 'close'), f"{handler} does not have a close method"
\ No newline at end of file
+            assert hasattr(handler, 'close'), f"{handler} does not have a close method"
+
+def test_mmap_readers():
+    import yaml
+    import numpy as np
+    from liguard.pcd.file_io import FileIO
+    example_config_path = os.path.join('liguard', 'examples', 'simple_pipeline', 'base_config.yml')
+    with open(example_config_path, 'r') as f: cfg_dict = yaml.safe_load(f)
+    cfg_dict['data']['pipeline_dir'] = os.path.join('liguard', 'examples', 'simple_pipeline')
+    cfg_dict['data']['lidar']['mmap'] = True
+
+    reader = FileIO(cfg_dict)
+    assert reader.mmap, 'mmap mode should be enabled for .bin files'
+    path, points = reader[0]
+    # memory-mapped data must match the data read into memory
+    assert np.array_equal(points, np.fromfile(path, dtype=np.float32).reshape(-1, 4))
+    # in-place changes must not leak into the file or the next request of the same frame
+    points[:] = 0
+    assert not np.all(reader[0][1] == 0)
+    reader.close()
+
+
+def test_pcd_ply_parsers(tmp_path):
+    import numpy as np
+    import open3d as o3d
+    from liguard.pcd.parsers import read_pcd, read_ply
+    points = np.random.rand(1000, 4).astype(np.float32)
+
+    # files written by open3d have no intensity, only xyz must match
+    pcd = o3d.geometry.PointCloud()
+    pcd.points = o3d.utility.Vector3dVector(points[:, :3].astype(np.float64))
+    for file_name, kwargs in [('ascii.pcd', {'write_ascii': True}), ('binary.pcd', {}), ('compressed.pcd', {'compressed': True}), ('ascii.ply', {'write_ascii': True}), ('binary.ply', {})]:
+        file_path = str(tmp_path / file_name)
+        o3d.io.write_point_cloud(file_path, pcd, **kwargs)
+        parsed = read_pcd(file_path) if file_name.endswith('.pcd') else read_ply(file_path)
+        assert parsed.shape == (1000, 4) and parsed.dtype == np.float32, f'{file_name}: wrong shape or dtype'
+        assert np.allclose(parsed[:, :3], points[:, :3], atol=1e-4), f'{file_name}: xyz mismatch'
+        assert np.all(parsed[:, 3] == 1.0), f'{file_name}: missing intensity must be 1.0'
+
+    # intensity must be kept
+    header = f'VERSION 0.7\nFIELDS x y z intensity\nSIZE 4 4 4 4\nTYPE F F F F\nCOUNT 1 1 1 1\nWIDTH 1000\nHEIGHT 1\nPOINTS 1000\nDATA binary\n'
+    with open(tmp_path / 'intensity.pcd', 'wb') as f: f.write(header.encode('ascii') + points.tobytes())
+    assert np.array_equal(read_pcd(str(tmp_path / 'intensity.pcd')), points)
+
+def test_lzf_fallback(tmp_path, monkeypatch):
+    import warnings
+    import numpy as np
+    import open3d as o3d
+    import pytest
+    from liguard.pcd import parsers
+    points = np.random.rand(1000, 3)
+    pcd = o3d.geometry.PointCloud()
+    pcd.points = o3d.utility.Vector3dVector(points)
+    file_path = str(tmp_path / 'compressed.pcd')
+    o3d.io.write_point_cloud(file_path, pcd, compressed=True)
+
+    # the default decoder, the lzf module if installed, and the pure-Python one must agree, the slow one warns with an install hint
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        expected = parsers.read_pcd(file_path)
+    monkeypatch.setattr(parsers, 'lzf', None)
+    with pytest.warns(RuntimeWarning, match='LiGuard\\[lzf\\]'): parsed = parsers.read_pcd(file_path)
+    assert np.array_equal(parsed, expected)
+    assert np.allclose(parsed[:, :3], points, atol=1e-4)
@@ -63,4 +63,117 @@ def test_get_fixed_sized_point_cloud():
     number_of_points = 2
     fixed_sized_point_cloud = get_fixed_sized_point_cloud(point_cloud, number_of_points)
     assert fixed_sized_point_cloud.shape == (number_of_points, 3)
-    assert np.allclose(fixed_sized_point_cloud, point_cloud[:number_of_points])
\ No newline at end of file
+    assert np.allclose(fixed_sized_point_cloud, point_cloud[:number_of_points])
+
+def test_calc_cluster_boxes():
+    from liguard.pcd.utils import calc_cluster_boxes
+    rng = np.random.default_rng(0)
+
+    # rectangular clusters of known size and yaw, and noise points
+    sizes, yaws, centers = [[4.0, 1.8, 1.5], [0.6, 0.3, 1.7], [10.0, 2.5, 3.0]], [0.3, -1.0, 1.2], [[10, 5, -1], [-3, 2, -1], [0, -20, 0]]
+    clusters = []
+    for size, yaw, center in zip(sizes, yaws, centers):
+        local = rng.uniform(-0.5, 0.5, (2000, 3)) * size
+        local[:4, :2] = [[-0.5, -0.5], [0.5, 0.5], [-0.5, 0.5], [0.5, -0.5]] * np.array(size[:2])
+        rotation = np.array([[np.cos(yaw), -np.sin(yaw)], [np.sin(yaw), np.cos(yaw)]])
+        local[:, :2] = local[:, :2] @ rotation.T
+        clusters.append(local + center)
+    points = np.vstack(clusters + [rng.uniform(-30, 30, (100, 3))])
+    labels = np.concatenate([np.full(2000, 7), np.full(2000, 2), np.full(2000, 5), np.full(100, -1)])
+    order = rng.permutation(len(points))
+    points, labels = points[order], labels[order]
+
+    boxes = calc_cluster_boxes(points, labels)
+    assert np.array_equal(boxes['cluster_labels'], [2, 5, 7])
+    assert np.array_equal(boxes['number_of_points'], [2000, 2000, 2000])
+    for i, label in enumerate([2, 5, 7]):
+        cluster = points[labels == label]
+        assert np.allclose(boxes['min_xyz'][i], cluster.min(axis=0))
+        assert np.allclose(boxes['max_xyz'][i], cluster.max(axis=0))
+        assert np.allclose(boxes['centroid'][i], cluster.mean(axis=0))
+    # the oriented boxes recover the rectangles, the yaw is up to the direction of the principal axis
+    for i, cluster_index in enumerate([1, 2, 0]):
+        assert np.isclose(np.mod(boxes['yaw'][i] - yaws[cluster_index], np.pi), 0, atol=0.05) or np.isclose(np.mod(boxes['yaw'][i] - yaws[cluster_index], np.pi), np.pi, atol=0.05)
+        assert np.allclose(boxes['oriented_extent'][i], sizes[cluster_index], atol=0.2)
+        assert np.allclose(boxes['oriented_center'][i], centers[cluster_index], atol=0.1)
+
+    # no clusters
+    boxes = calc_cluster_boxes(points, np.full(len(points), -1))
+    assert len(boxes['cluster_labels']) == 0 and boxes['min_xyz'].shape == (0, 3)
+
+def test_calc_cluster_records():
+    from liguard.pcd.utils import calc_cluster_records, get_cluster_point_indices
+    labels = np.array([3, -1, 0, 3, 0, -1, 7, 3], dtype=np.int32)
+    order, records = calc_cluster_records(labels)
+    assert [record['cluster_label'] for record in records] == [0, 3, 7]
+    assert [record['number_of_points'] for record in records] == [2, 3, 1]
+    for record in records:
+        assert np.array_equal(np.sort(get_cluster_point_indices(order, record)), np.flatnonzero(labels == record['cluster_label']))
+
+    # only noise, or no points
+    assert calc_cluster_records(np.full(5, -1, dtype=np.int32))[1] == []
+    assert calc_cluster_records(np.empty(0, dtype=np.int32))[1] == []
+
+def test_downsample_point_cloud():
+    from liguard.pcd.utils import downsample_point_cloud
+    rng = np.random.default_rng(0)
+    point_cloud = np.hstack([rng.uniform(-5, 5, (2000, 3)), rng.random((2000, 1))]).astype(np.float32)
+    point_cloud[7] = np.nan
+    point_colors = rng.random((2000, 3)).astype(np.float32)
+    leaf_size = 1.0
+
+    voxel_keys = [tuple(np.floor(point[:3] / leaf_size).astype(int)) if np.all(np.isfinite(point[:3])) else None for point in point_cloud]
+    unique_keys = list(dict.fromkeys(key for key in voxel_keys if key is not None))
+
+    # centroids of the voxels, in the order of their first points, with intensity
+    downsampled, downsampled_colors, index_map = downsample_point_cloud(point_cloud, leaf_size, 'centroid', point_colors)
+    assert downsampled.shape == (len(unique_keys), 4) and downsampled.dtype == np.float32
+    for row, key in enumerate(unique_keys):
+        members = [i for i, voxel_key in enumerate(voxel_keys) if voxel_key == key]
+        assert np.allclose(downsampled[row], point_cloud[members].mean(axis=0), atol=1e-5)
+        assert np.allclose(downsampled_colors[row], point_colors[members].mean(axis=0), atol=1e-5)
+        assert np.all(index_map[members] == row)
+    assert index_map[7] == -1
+
+    # first points of the voxels
+    downsampled, downsampled_colors, index_map = downsample_point_cloud(point_cloud, leaf_size, 'first')
+    first_points = [voxel_keys.index(key) for key in unique_keys]
+    assert np.array_equal(downsampled, point_cloud[first_points])
+    assert downsampled_colors is None
+
+    # per-point values of the downsampled point cloud scatter back to the original points
+    voxel_values = np.arange(len(downsampled))
+    assert np.array_equal(voxel_values[index_map[first_points]], np.arange(len(first_points)))
+
+def test_points_in_boxes():
+    import open3d as o3d
+    from liguard.pcd.utils import points_in_boxes, calc_box_rotation_matrices
+    rng = np.random.default_rng(0)
+    point_cloud = np.c_[rng.uniform(-20, 20, (20000, 3)), np.ones(20000)].astype(np.float32)
+    xyz_center = rng.uniform(-18, 18, (30, 3))
+    xyz_extent = rng.uniform(1, 6, (30, 3))
+    xyz_euler_angles = rng.uniform(-np.pi, np.pi, (30, 3))
+    xyz_euler_angles[10:, :2] = 0
+
+    # same rotations and points as one Open3D OrientedBoundingBox per box
+    rotation_matrices = calc_box_rotation_matrices(xyz_euler_angles)
+    indices = points_in_boxes(point_cloud, xyz_center, xyz_extent, xyz_euler_angles, return_indices=True)
+    for center, extent, euler_angles, rotation_matrix, box_indices in zip(xyz_center, xyz_extent, xyz_euler_angles, rotation_matrices, indices):
+        R = o3d.geometry.OrientedBoundingBox.get_rotation_matrix_from_xyz(euler_angles)
+        assert np.allclose(rotation_matrix, R)
+        rotated_bbox = o3d.geometry.OrientedBoundingBox(center, R, extent)
+        expected = np.sort(rotated_bbox.get_point_indices_within_bounding_box(o3d.utility.Vector3dVector(point_cloud[:, :3].astype(np.float64))))
+        assert np.array_equal(box_indices, expected)
+    assert np.array_equal(points_in_boxes(point_cloud, xyz_center, xyz_extent, xyz_euler_angles), [len(box_indices) for box_indices in indices])
+
+    # points that are not finite are in no box, the indices of the other points don't change
+    nan_point_cloud = point_cloud.copy()
+    nan_point_cloud[[0, 100]] = np.nan
+    nan_point_cloud[200, 0] = np.inf
+    nan_indices = points_in_boxes(nan_point_cloud, xyz_center, xyz_extent, xyz_euler_angles, return_indices=True)
+    for box_indices, expected in zip(nan_indices, indices): assert np.array_equal(box_indices, np.setdiff1d(expected, [0, 100, 200]))
+    assert np.array_equal(points_in_boxes(np.full((10, 4), np.nan, dtype=np.float32), xyz_center, xyz_extent, xyz_euler_angles), np.zeros(30))
+
+    # no boxes, and no points
+    assert len(points_in_boxes(point_cloud, np.zeros((0, 3)), np.zeros((0, 3)), np.zeros((0, 3)))) == 0
+    assert np.array_equal(points_in_boxes(point_cloud[:0], xyz_center, xyz_extent, xyz_euler_angles), np.zeros(30))